@@ -0,0 +1,42 @@
+"""
+Import-time benchmarks: the compute modules must not load matplotlib.
+
+timeraw_* benchmarks return code that is timed in a fresh interpreter
+(asv semantics). Every snippet also fails if a compute module pulls in
+matplotlib.pyplot, astropy or scipy.signal at import.
+"""
+
+
+COMPUTE_MODULES = [
+    "functions",
+    "functions.spectrum",
+    "functions.units",
+    "functions.parallel",
+    "functions.montecarlo",
+    "functions.stacking",
+]
+
+# módulos que só podem ser carregados no primeiro uso
+HEAVY = ("matplotlib.pyplot", "astropy.io.fits", "scipy.signal")
+
+
+class ImportTime:
+    params = COMPUTE_MODULES
+    param_names = ["module"]
+
+    def timeraw_import(self, module):
+        return (
+            f"import sys\n"
+            f"import {module}\n"
+            f"heavy = [m for m in {HEAVY!r} if m in sys.modules]\n"
+            f"assert not heavy, f'{module} imports {{heavy}}'\n"
+        )
+
+
+class ImportPlot:
+    def timeraw_import_plot(self):
+        return "import functions.plot\n"
+
+    def timeraw_first_plot_attribute(self):
+        # carrega plot.py através do __getattr__ do pacote
+        return "import functions\nfunctions.make_spectrum_panel\n"
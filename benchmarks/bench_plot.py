@@ -0,0 +1,42 @@
+"""
+End-to-end panel rendering benchmarks (make_spectrum_panel + savefig).
+"""
+
+import os
+import shutil
+import tempfile
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from functions.plot import make_spectrum_panel
+
+from .common import fake_sample
+
+
+class SpectrumPanel:
+    params = ([8, 64], ["prism", "grating"])
+    param_names = ["n_spectra", "kind"]
+
+    def setup(self, n, kind):
+        self.folder, self.spec_info = fake_sample(n, kind)
+        self.out = tempfile.mkdtemp(prefix="lrd_bench_panels_")
+
+    def teardown(self, n, kind):
+        shutil.rmtree(self.out, ignore_errors=True)
+
+    def time_make_spectrum_panel(self, n, kind):
+        for start in range(0, len(self.spec_info), 8):
+            fig = make_spectrum_panel(
+                self.spec_info,
+                start=start,
+                base_path=self.folder,
+                ylim=(-0.5, 15),
+                xlim=(0, 1.2),
+                loader_kwargs=dict(restframe=True, normalize=(kind == "prism")),
+            )
+            fig.savefig(os.path.join(self.out, f"panel_{start // 8:03d}.pdf"))
+            plt.close(fig)
+
+    peakmem_make_spectrum_panel = time_make_spectrum_panel
@@ -0,0 +1,116 @@
+"""
+Benchmarks of the spectrum loading, normalization and stacking hot paths.
+
+Written in asv style (setup / time_* / peakmem_* with params); run them
+with asv or standalone with ``python -m benchmarks.run``.
+"""
+
+import os
+import numpy as np
+
+from functions.spectrum import (
+    read_spectrum_fits,
+    load_spectrum,
+    normalize_spectrum,
+    compute_error_stats,
+    compute_mean_spectrum,
+)
+
+from .common import fake_sample
+
+
+SCALES = [10, 100, 1000, 10000]
+
+LOADER_KWARGS = dict(
+    input_flux_unit="uJy",
+    wave_unit="um",
+    restframe=True,
+    normalize=True,
+)
+
+
+def _load_all(folder, spec_info):
+    return [
+        load_spectrum(os.path.join(folder, fname), z=z, **LOADER_KWARGS)
+        for fname, z in spec_info
+    ]
+
+
+class ReadSpectrumFits:
+    params = (SCALES, ["prism", "grating"])
+    param_names = ["n_spectra", "kind"]
+
+    def setup(self, n, kind):
+        self.folder, self.spec_info = fake_sample(n, kind)
+
+    def time_read_spectrum_fits(self, n, kind):
+        for fname, _ in self.spec_info:
+            read_spectrum_fits(os.path.join(self.folder, fname))
+
+    peakmem_read_spectrum_fits = time_read_spectrum_fits
+
+
+class LoadSpectrum:
+    params = (SCALES, ["prism", "grating"])
+    param_names = ["n_spectra", "kind"]
+
+    def setup(self, n, kind):
+        self.folder, self.spec_info = fake_sample(n, kind)
+
+    def time_load_spectrum(self, n, kind):
+        _load_all(self.folder, self.spec_info)
+
+    peakmem_load_spectrum = time_load_spectrum
+
+
+class InMemory:
+    """
+    Stages that work on spectra already in memory.
+    """
+
+    params = (SCALES,)
+    param_names = ["n_spectra"]
+
+    def setup(self, n):
+        folder, spec_info = fake_sample(n, "prism")
+        self.spectra = _load_all(folder, spec_info)
+        self.wave_grid = np.arange(0.1, 1.2, 0.002)
+
+    def time_normalize_spectrum(self, n):
+        for s in self.spectra:
+            try:
+                normalize_spectrum(s["wave"], s["flux"], err=s["err"])
+            except ValueError:
+                pass
+
+    def time_compute_error_stats(self, n):
+        for s in self.spectra:
+            compute_error_stats(
+                s["wave"], s["flux"], s["err"],
+                window=(0.5400, 0.5600),
+                normalized=s["normalized"],
+            )
+
+    def time_compute_mean_spectrum(self, n):
+        compute_mean_spectrum(self.spectra, wave_grid=self.wave_grid)
+
+    def time_compute_mean_spectrum_resolution(self, n):
+        compute_mean_spectrum(
+            self.spectra, wave_grid=self.wave_grid, target_resolution=50
+        )
+
+    peakmem_normalize_spectrum = time_normalize_spectrum
+    peakmem_compute_error_stats = time_compute_error_stats
+    peakmem_compute_mean_spectrum = time_compute_mean_spectrum
+    peakmem_compute_mean_spectrum_resolution = time_compute_mean_spectrum_resolution
+
+
+class SyntheticSpectra:
+    params = ([1000, 10000, 100000],)
+    param_names = ["n_spectra"]
+
+    def time_generate_batch(self, n):
+        from functions.synthetic import generate_batch
+        generate_batch(n)
+
+    peakmem_generate_batch = time_generate_batch
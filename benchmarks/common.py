@@ -0,0 +1,42 @@
+"""
+Synthetic spectra used by the benchmarks (see functions.synthetic).
+"""
+
+import atexit
+import shutil
+import tempfile
+
+from functions.synthetic import write_synthetic_sample
+
+
+_FOLDERS = {}
+
+
+def fake_sample(n, kind="prism"):
+    """
+    Folder with n synthetic spectra, written once per session.
+
+    Returns
+    -------
+    folder, spec_info
+    """
+
+    key = (n, kind)
+
+    if key not in _FOLDERS:
+        folder = tempfile.mkdtemp(prefix=f"lrd_bench_{kind}_{n}_")
+        _FOLDERS[key] = (folder, write_synthetic_sample(folder, n, kind=kind))
+
+    return _FOLDERS[key]
+
+
+@atexit.register
+def clear_fake_samples():
+    """
+    Delete the folders written by fake_sample() (also run at exit).
+    """
+
+    for folder, _ in _FOLDERS.values():
+        shutil.rmtree(folder, ignore_errors=True)
+
+    _FOLDERS.clear()
@@ -0,0 +1,145 @@
+"""
+Standalone runner for the asv-style benchmarks in this folder.
+
+Usage (from the repository root):
+
+    python -m benchmarks.run
+    python -m benchmarks.run --filter mean --max-n 1000 --repeat 3
+
+For every benchmark and parameter combination it reports, as asv does,
+the best wall time over the repeats of time_* benchmarks and the peak
+Python memory (tracemalloc) of peakmem_* benchmarks. timeraw_*
+benchmarks return code that is timed in a fresh interpreter.
+Synthetic spectra are written to temporary folders that are deleted
+at exit.
+"""
+
+import sys
+import argparse
+import inspect
+import itertools
+import subprocess
+import time
+import tracemalloc
+
+from . import bench_spectrum, bench_plot, bench_import
+
+
+MODULES = [bench_spectrum, bench_plot, bench_import]
+
+
+def iter_benchmarks(name_filter=None):
+    for module in MODULES:
+        for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+
+            for meth in sorted(vars(cls)):
+                if not meth.startswith(("time_", "timeraw_", "peakmem_")):
+                    continue
+
+                full = f"{module.__name__.split('.')[-1]}.{cls_name}.{meth}"
+                if name_filter and name_filter not in full:
+                    continue
+
+                yield full, cls, meth
+
+
+def run_raw(code, repeat=1):
+    """
+    Best time of `code` run in a fresh interpreter (asv timeraw_*).
+    """
+
+    wrapped = (
+        "import time\n"
+        "_t0 = time.perf_counter()\n"
+        f"{code}\n"
+        "print(time.perf_counter() - _t0)\n"
+    )
+
+    best = float("inf")
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", wrapped],
+            capture_output=True, text=True, check=True,
+        )
+        best = min(best, float(out.stdout.split()[-1]))
+
+    return best
+
+
+def run_one(cls, meth, params, repeat=1):
+    """
+    Run one benchmark.
+
+    Returns
+    -------
+    best, peak : float
+        Best time [s] (time_*, timeraw_*) and peak memory [bytes]
+        (peakmem_*); the one not measured is NaN
+    """
+
+    bench = cls()
+
+    if meth.startswith("timeraw_"):
+        return run_raw(getattr(bench, meth)(*params), repeat=repeat), float("nan")
+
+    if hasattr(bench, "setup"):
+        bench.setup(*params)
+
+    func = getattr(bench, meth)
+
+    try:
+        if meth.startswith("peakmem_"):
+            tracemalloc.start()
+            try:
+                func(*params)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+            return float("nan"), peak
+
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            func(*params)
+            best = min(best, time.perf_counter() - t0)
+
+        return best, float("nan")
+
+    finally:
+        if hasattr(bench, "teardown"):
+            bench.teardown(*params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filter", default=None,
+                        help="only run benchmarks whose name contains this")
+    parser.add_argument("--max-n", type=int, default=1000,
+                        help="largest number of spectra to run")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{'benchmark':<60} {'params':<20} {'time [s]':>10} {'peak [MB]':>10}")
+
+    for full, cls, meth in iter_benchmarks(args.filter):
+        params = getattr(cls, "params", ())
+        if params and not isinstance(params[0], (list, tuple)):
+            params = (params,)
+
+        for combo in itertools.product(*params):
+            if combo and isinstance(combo[0], int) and combo[0] > args.max_n:
+                continue
+
+            best, peak = run_one(cls, meth, combo, repeat=args.repeat)
+
+            print(
+                f"{full:<60} {str(combo):<20} {best:>10.4f} "
+                f"{peak / 1e6:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,34 @@
 from .spectrum import load_spectrum, compute_error_stats, compute_mean_spectrum
-from .plot import plot_spectrum_ax, make_spectrum_panel, plot_overlaid_spectra, plot_spectrum_presentation, plot_spectrum_shaded_lines, plot_mean_spectrum, plot_overlaid_mean_spectra, plot_stacked_spectra_with_mean
+
+# plot.py importa matplotlib.pyplot (lento); só é carregado no primeiro uso,
+# assim workers que só empilham/medem não pagam esse custo
+_PLOT_FUNCTIONS = (
+    "plot_spectrum_ax",
+    "make_spectrum_panel",
+    "plot_overlaid_spectra",
+    "plot_spectrum_presentation",
+    "plot_spectrum_shaded_lines",
+    "plot_mean_spectrum",
+    "plot_overlaid_mean_spectra",
+    "plot_stacked_spectra_with_mean",
+)
+
+__all__ = [
+    "load_spectrum",
+    "compute_error_stats",
+    "compute_mean_spectrum",
+    *_PLOT_FUNCTIONS,
+]
+
+
+def __getattr__(name):
+    if name in _PLOT_FUNCTIONS:
+        from . import plot
+
+        return getattr(plot, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
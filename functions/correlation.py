@@ -0,0 +1,441 @@
+import warnings
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from .profiling import stage, count, timed
+
+
+# blocks of permutations / bootstrap draws processed at once
+_CHUNK = 128
+
+
+def censored_sign_matrix(x, censor=None):
+    """
+    Pairwise ordering of a variable with censored values.
+
+    Each value is an interval: a detection is [x, x], an upper limit
+    (-inf, x] and a lower limit [x, inf). S[i, j] = +1 if x_i is
+    certainly larger than x_j, -1 if certainly smaller and 0 when the
+    order cannot be told (ties, or overlapping limits), as in the
+    generalized Kendall tau of Isobe, Feigelson & Nelson (1986).
+
+    Parameters
+    ----------
+    x : array_like, shape (n,)
+    censor : array_like or None
+        0 = detection, -1 = upper limit, +1 = lower limit
+        (booleans are read as upper limits)
+
+    Returns
+    -------
+    S : ndarray, shape (n, n)
+    """
+
+    x = np.asarray(x, dtype=float)
+
+    lo = x.copy()
+    hi = x.copy()
+
+    if censor is not None:
+        censor = np.asarray(censor)
+        if censor.dtype == bool:
+            censor = -censor.astype(int)
+        lo[censor < 0] = -np.inf
+        hi[censor > 0] = np.inf
+
+    S = (lo[:, None] > hi[None, :]).astype(float)
+    S -= hi[:, None] < lo[None, :]
+
+    return S
+
+
+def midranks(S, weights=None):
+    """
+    Ranks from a sign matrix (average ranks for undetermined pairs).
+
+    Without censoring this is the usual average rank of the data.
+
+    Parameters
+    ----------
+    S : ndarray, shape (n, n)
+    weights : ndarray, shape (m, n) or None
+        Multiplicity of every point, e.g. bootstrap counts
+
+    Returns
+    -------
+    ndarray, shape (n,) or (m, n)
+    """
+
+    if weights is None:
+        n = S.shape[0]
+        return 0.5 * (n + 1 + S.sum(axis=1))
+
+    n = weights.sum(axis=1, keepdims=True)
+    # S antissimétrica: (W @ S.T) = -(W @ S)
+    return 0.5 * (n + 1 - weights @ S)
+
+
+def _bootstrap_weights(rng, n_boot, n):
+    idx = rng.integers(0, n, size=(n_boot, n))
+    idx += n * np.arange(n_boot)[:, None]
+    return np.bincount(idx.ravel(), minlength=n_boot * n).reshape(n_boot, n).astype(float)
+
+
+def _standardize(r, weights=None):
+    """
+    (r - mean) / std along the point axis (weighted if weights given).
+    """
+
+    if weights is None:
+        mean = r.mean(axis=-2, keepdims=True)
+        std = r.std(axis=-2, keepdims=True)
+    else:
+        w = weights[..., None]
+        n = w.sum(axis=-2, keepdims=True)
+        mean = (w * r).sum(axis=-2, keepdims=True) / n
+        std = np.sqrt((w * (r - mean) ** 2).sum(axis=-2, keepdims=True) / n)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (r - mean) / std
+
+
+def _interval(boot, ci):
+    # pares constantes dão só NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanpercentile(boot, ci, axis=0)
+
+
+def _p_value(coef, perm):
+    """
+    Two-sided permutation p-value, (1 + #|perm| >= |coef|) / (1 + n_perm).
+    """
+
+    exceed = (np.abs(perm) >= np.abs(coef) - 1e-12).sum(axis=0)
+    return (1.0 + exceed) / (1.0 + perm.shape[0])
+
+
+# -------------------------
+# Spearman
+# -------------------------
+
+def _spearman_block(S, pairs, n_perm, n_boot, ci, rng):
+    """
+    Spearman rho of all pairs of one block (same rows for every column).
+
+    S : ndarray (k, n, n), pairs : (A, B) index arrays into k
+    """
+
+    k, n, _ = S.shape
+    A, B = pairs
+
+    R = np.stack([midranks(s) for s in S], axis=1)          # (n, k)
+    Z = _standardize(R)
+    coef = (Z.T @ Z / n)[A, B]
+
+    out = {"coef": coef}
+
+    # ---- permutações: mesmas permutações para todos os pares ----
+    if n_perm:
+        perm = np.empty((n_perm, len(A)))
+        ZB = Z[:, B]
+        for start in range(0, n_perm, _CHUNK):
+            c = min(_CHUNK, n_perm - start)
+            P = rng.permuted(np.tile(np.arange(n), (c, 1)), axis=1)
+            ZA = Z[P][:, :, A]                                  # (c, n, pairs)
+            perm[start:start + c] = np.einsum("cnp,np->cp", ZA, ZB) / n
+        out["p_value"] = _p_value(coef, perm)
+
+    # ---- bootstrap: reamostragem como pesos (re-ranqueia cada amostra) ----
+    if n_boot:
+        boot = np.empty((n_boot, len(A)))
+        for start in range(0, n_boot, _CHUNK):
+            c = min(_CHUNK, n_boot - start)
+            W = _bootstrap_weights(rng, c, n)
+            Rb = np.stack([midranks(s, W) for s in S], axis=2)  # (c, n, k)
+            Zb = _standardize(Rb, W)
+            boot[start:start + c] = np.einsum(
+                "cn,cnp,cnp->cp", W, Zb[:, :, A], Zb[:, :, B]
+            ) / n
+        out["ci"] = _interval(boot, ci)
+
+    return out
+
+
+# -------------------------
+# Kendall
+# -------------------------
+
+def _kendall_block(S, pairs, n_perm, n_boot, ci, rng):
+    """
+    Kendall tau_b of all pairs of one block (generalized for censoring).
+    """
+
+    k, n, _ = S.shape
+    A, B = pairs
+
+    F = S.reshape(k, n * n)
+    norm = np.sqrt((F**2).sum(axis=1))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        coef = (F[A] * F[B]).sum(axis=1) / (norm[A] * norm[B])
+
+    out = {"coef": coef}
+
+    if n_perm:
+        perm = np.empty((n_perm, len(A)))
+        for start in range(0, n_perm, _CHUNK):
+            c = min(_CHUNK, n_perm - start)
+            P = rng.permuted(np.tile(np.arange(n), (c, 1)), axis=1)
+            flat = (P[:, :, None] * n + P[:, None, :]).reshape(c, n * n)
+            for a in np.unique(A):
+                sel = A == a
+                Fa = F[a][flat]                                  # (c, n*n)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    perm[start:start + c, sel] = (
+                        Fa @ F[B[sel]].T / (norm[a] * norm[B[sel]])
+                    )
+        out["p_value"] = _p_value(coef, perm)
+
+    if n_boot:
+        boot = np.empty((n_boot, len(A)))
+        for start in range(0, n_boot, _CHUNK):
+            c = min(_CHUNK, n_boot - start)
+            W = _bootstrap_weights(rng, c, n)
+            # w^T M w para M = Sa*Sb, Sa^2, Sb^2
+            quad = lambda M: ((W @ M) * W).sum(axis=1)
+            sq = [quad(np.abs(s)) for s in S]
+            for p, (a, b) in enumerate(zip(A, B)):
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    boot[start:start + c, p] = (
+                        quad(S[a] * S[b]) / np.sqrt(sq[a] * sq[b])
+                    )
+        out["ci"] = _interval(boot, ci)
+
+    return out
+
+
+_METHODS = {
+    "spearman": _spearman_block,
+    "kendall": _kendall_block,
+}
+
+
+# -------------------------
+# Tabela
+# -------------------------
+
+def _censor_array(table, censored, col):
+    if censored is None or col not in censored:
+        return None
+
+    c = censored[col]
+    if isinstance(c, str):
+        c = table[c]
+
+    c = np.asarray(c)
+    if c.dtype == bool:
+        c = -c.astype(int)
+
+    return c
+
+
+@timed("correlation.table")
+def correlation_table(
+    table,
+    columns,
+    others=None,
+    method="spearman",
+    censored=None,
+    n_perm=1000,
+    n_boot=1000,
+    ci=(16, 84),
+    seed=42,
+    min_points=8,
+    n_jobs=1,
+):
+    """
+    Rank correlations with permutation p-values and bootstrap intervals.
+
+    Pairs are grouped by their common rows (both values finite) and every
+    group is evaluated at once: ranks are stacked into a matrix, the same
+    permutations are applied to all pairs with one tensor contraction,
+    and the bootstrap re-ranks each resample through its point
+    multiplicities, so censored values are handled the same way.
+
+    Example
+    -------
+    >>> df = pd.read_csv("tabela_merged.csv")
+    >>> res = correlation_table(df, ["median_flux_5500A", "median_flux_1900A",
+    ...                              "logL_5100_2", "Balmer_dec_total_2"])
+    >>> res.pivot(index="x", columns="y", values="coef")
+
+    Parameters
+    ----------
+    table : DataFrame
+        e.g. tabela_merged.csv
+    columns : list of str
+    others : list of str or None
+        If given, correlate every column of `columns` with every column of
+        `others`; otherwise all pairs within `columns`
+    method : {'spearman', 'kendall'}
+        Kendall costs O(n²) per pair and permutation; prefer Spearman for
+        all-pairs runs over many columns
+    censored : dict or None
+        {column: flags}, flags being an array or the name of a column of
+        `table` with 0 = detection, -1 = upper limit, +1 = lower limit
+        (booleans are read as upper limits)
+    n_perm : int
+        Permutations for the p-value (0 to skip)
+    n_boot : int
+        Bootstrap resamples for the interval (0 to skip)
+    ci : tuple
+        Percentiles of the bootstrap distribution (default 16–84%)
+    seed : int
+    min_points : int
+        Pairs with fewer common rows give NaN
+    n_jobs : int
+        Threads evaluating the groups in parallel
+
+    Returns
+    -------
+    DataFrame with x, y, method, n, n_censored, coef, coef_low, coef_high,
+    p_value
+    """
+
+    if method not in _METHODS:
+        raise ValueError("method must be 'spearman' or 'kendall'")
+
+    block_func = _METHODS[method]
+
+    if others is None:
+        cols = list(columns)
+        pairs = [(i, j) for i in range(len(cols)) for j in range(i + 1, len(cols))]
+    else:
+        cols = list(columns) + [c for c in others if c not in columns]
+        pairs = [
+            (cols.index(a), cols.index(b))
+            for a in columns for b in others if a != b
+        ]
+
+    values = np.column_stack([
+        pd.to_numeric(table[c], errors="coerce").to_numpy(dtype=float)
+        for c in cols
+    ])
+    censors = [_censor_array(table, censored, c) for c in cols]
+
+    finite = np.isfinite(values)
+
+    # -------------------------
+    # pares agrupados pelas linhas em comum
+    # -------------------------
+    groups = {}
+    for i, j in pairs:
+        rows = finite[:, i] & finite[:, j]
+        groups.setdefault(rows.tobytes(), (rows, []))[1].append((i, j))
+
+    count("correlation_pairs", len(pairs))
+    count("correlation_groups", len(groups))
+
+    def run_group(g, rows, group_pairs):
+        idx = np.flatnonzero(rows)
+        n = len(idx)
+
+        res = {
+            "n": np.full(len(group_pairs), n),
+            "n_censored": np.zeros(len(group_pairs), dtype=int),
+            "coef": np.full(len(group_pairs), np.nan),
+            "coef_low": np.full(len(group_pairs), np.nan),
+            "coef_high": np.full(len(group_pairs), np.nan),
+            "p_value": np.full(len(group_pairs), np.nan),
+        }
+
+        if n < min_points:
+            return group_pairs, res
+
+        used = sorted({c for pair in group_pairs for c in pair})
+        local = {c: k for k, c in enumerate(used)}
+
+        S = np.stack([
+            censored_sign_matrix(
+                values[idx, c],
+                None if censors[c] is None else censors[c][idx],
+            )
+            for c in used
+        ])
+
+        n_cens = np.array([
+            0 if censors[c] is None else int((censors[c][idx] != 0).sum())
+            for c in used
+        ])
+
+        A = np.array([local[i] for i, _ in group_pairs])
+        B = np.array([local[j] for _, j in group_pairs])
+
+        with stage(f"correlation.{method}"):
+            out = block_func(
+                S, (A, B), n_perm, n_boot, ci,
+                np.random.default_rng((seed, g)),
+            )
+
+        res["n_censored"] = n_cens[A] + n_cens[B]
+        res["coef"] = out["coef"]
+        if "ci" in out:
+            res["coef_low"], res["coef_high"] = out["ci"]
+        if "p_value" in out:
+            res["p_value"] = out["p_value"]
+
+        return group_pairs, res
+
+    jobs = [
+        (g, rows, group_pairs)
+        for g, (rows, group_pairs) in enumerate(groups.values())
+    ]
+
+    if n_jobs > 1:
+        with ThreadPoolExecutor(n_jobs) as pool:
+            results = list(pool.map(lambda job: run_group(*job), jobs))
+    else:
+        results = [run_group(*job) for job in jobs]
+
+    rows = []
+    for group_pairs, res in results:
+        for p, (i, j) in enumerate(group_pairs):
+            row = {"x": cols[i], "y": cols[j], "method": method}
+            row.update({k: v[p] for k, v in res.items()})
+            rows.append(row)
+
+    # mesma ordem dos pares pedidos
+    order = {(cols[i], cols[j]): k for k, (i, j) in enumerate(pairs)}
+    rows.sort(key=lambda r: order[(r["x"], r["y"])])
+
+    return pd.DataFrame(rows)
+
+
+def correlate(x, y, method="spearman", x_censor=None, y_censor=None, **kwargs):
+    """
+    Correlation of two arrays (see correlation_table()).
+
+    Returns
+    -------
+    dict with n, n_censored, coef, coef_low, coef_high, p_value
+    """
+
+    table = pd.DataFrame({"x": np.asarray(x, dtype=float), "y": np.asarray(y, dtype=float)})
+
+    censored = {}
+    if x_censor is not None:
+        censored["x"] = x_censor
+    if y_censor is not None:
+        censored["y"] = y_censor
+
+    res = correlation_table(
+        table, ["x", "y"], method=method, censored=censored, **kwargs
+    )
+
+    row = res.iloc[0].to_dict()
+    for key in ("x", "y", "method"):
+        row.pop(key)
+
+    return row
@@ -0,0 +1,484 @@
+import os
+import json
+import inspect
+import warnings
+import numpy as np
+import pandas as pd
+from collections.abc import Sequence
+
+from .spectrum import load_spectrum, compute_mean_spectrum, window_slices
+from .resolution import rebin_spectrum, oversampling_factor
+from .prefetch import iter_spectra
+from .profiling import stage, count, timed
+
+
+CUBE_FILES = (
+    "wave.npy", "flux.npy", "err.npy", "mask.npy", "oversampling.npy",
+    "index.csv", "meta.json",
+)
+
+# opções de load_spectrum() que não mudam o espectro carregado
+_LOADER_IGNORED = ("fits_path", "z", "storage")
+
+_LOADER_DEFAULTS = {
+    k: p.default
+    for k, p in inspect.signature(load_spectrum).parameters.items()
+    if k not in _LOADER_IGNORED
+}
+
+
+def log_wave_grid(wmin=0.08, wmax=1.6, dlnlam=0.0015):
+    """
+    Rest-frame grid with constant step in ln(lambda).
+
+    The default (0.08–1.6 μm, Δlnλ = 0.0015, ≈2000 px) samples the
+    PRISM at or above its native pixel scale at every wavelength.
+    """
+
+    n = int(np.ceil(np.log(wmax / wmin) / dlnlam)) + 1
+    return wmin * np.exp(dlnlam * np.arange(n))
+
+
+# -------------------------
+# construção
+# -------------------------
+
+@timed("cube.build")
+def build_cube(
+    spec_info,
+    path,
+    base_path="DeGraaff_espectros",
+    loader_kwargs=None,
+    wave_grid=None,
+    method="interp",
+    dtype=np.float32,
+    workers=4,
+):
+    """
+    Resample a whole sample once onto a rest-frame grid.
+
+    Writes <path>/ with memory-mapped (N_obj × N_pix) flux, err and mask
+    arrays (.npy), the number of grid pixels per native pixel of every
+    row (oversampling.npy, for error propagation), the grid, a row index
+    keyed by file (index.csv) and the build parameters (meta.json). Spectra are read with a
+    prefetching loader.
+
+    Parameters
+    ----------
+    spec_info : list of (filename, z)
+    loader_kwargs : dict
+        Passed to load_spectrum() (rest frame is forced)
+    wave_grid : array_like or None
+        Rest-frame grid [μm] (default: log_wave_grid())
+    method : {'interp', 'rebin'}
+        'interp' is the linear interpolation of compute_mean_spectrum();
+        'rebin' is flux-conserving (resolution.rebin_spectrum())
+    dtype : numpy dtype
+        Storage type of flux/err (float32 halves the disk and page cache
+        footprint; use float64 to reproduce the FITS path bit by bit)
+
+    Returns
+    -------
+    SpectrumCube
+    """
+
+    if loader_kwargs is None:
+        loader_kwargs = {}
+
+    loader_kwargs = dict(loader_kwargs)
+    loader_kwargs["restframe"] = True
+
+    if method not in ("interp", "rebin"):
+        raise ValueError("method must be 'interp' or 'rebin'")
+
+    wave = log_wave_grid() if wave_grid is None else np.asarray(wave_grid, dtype=float)
+
+    spec_info = list(spec_info)
+    n_obj, n_pix = len(spec_info), len(wave)
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "wave.npy"), wave)
+
+    def open_new(name, dt):
+        return np.lib.format.open_memmap(
+            os.path.join(path, name), mode="w+", dtype=dt, shape=(n_obj, n_pix)
+        )
+
+    flux_mm = open_new("flux.npy", dtype)
+    err_mm = open_new("err.npy", dtype)
+    mask_mm = open_new("mask.npy", bool)
+    over_mm = open_new("oversampling.npy", np.float32)
+
+    rows = []
+
+    stream = iter_spectra(
+        spec_info, base_path=base_path, loader_kwargs=loader_kwargs, workers=workers
+    )
+
+    for row, (fname, z, spec) in enumerate(stream):
+        entry = {
+            "row": row,
+            "file": str(fname),
+            "z": z,
+            "loaded": False,
+            "normalized": False,
+            "norm_factor": np.nan,
+            "norm_error": None,
+            "pix_start": 0,
+            "pix_end": 0,
+        }
+
+        if isinstance(spec, Exception):
+            print(f"Skipping {fname} → {spec}")
+            entry["norm_error"] = str(spec)
+            flux_mm[row] = np.nan
+            err_mm[row] = np.nan
+            over_mm[row] = 1.0
+            rows.append(entry)
+            continue
+
+        with stage("cube.resample"):
+            if method == "interp":
+                f = np.interp(wave, spec["wave"], spec["flux"], left=np.nan, right=np.nan)
+                e = np.interp(wave, spec["wave"], spec["err"], left=np.nan, right=np.nan)
+            else:
+                f, e = rebin_spectrum(spec["wave"], spec["flux"], wave, err=spec["err"])
+
+        good = np.isfinite(f)
+
+        flux_mm[row] = f
+        err_mm[row] = e
+        mask_mm[row] = good
+        over_mm[row] = oversampling_factor(spec["wave"], wave)
+
+        covered = np.flatnonzero(good)
+
+        entry.update({
+            "loaded": True,
+            "normalized": bool(spec["normalized"]),
+            "norm_factor": spec["norm_factor"] if spec["norm_factor"] is not None else np.nan,
+            "norm_error": spec["norm_error"],
+            "pix_start": int(covered[0]) if len(covered) else 0,
+            "pix_end": int(covered[-1]) + 1 if len(covered) else 0,
+        })
+        rows.append(entry)
+
+    count("cube_rows_written", n_obj)
+
+    for mm in (flux_mm, err_mm, mask_mm, over_mm):
+        mm.flush()
+    del flux_mm, err_mm, mask_mm, over_mm
+
+    pd.DataFrame(rows).to_csv(os.path.join(path, "index.csv"), index=False)
+
+    meta = {
+        "base_path": base_path,
+        "loader_kwargs": {k: repr(v) if k == "storage" else v for k, v in loader_kwargs.items()},
+        "method": method,
+        "dtype": np.dtype(dtype).name,
+        "n_obj": n_obj,
+        "n_pix": n_pix,
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1, default=repr)
+
+    return SpectrumCube(path)
+
+
+# -------------------------
+# leitura
+# -------------------------
+
+def _canonical(value):
+    """
+    Loader option in a comparable form: sequences (lists from meta.json,
+    tuples, arrays) become tuples and numpy scalars Python scalars.
+    """
+
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(_canonical(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _effective_loader_kwargs(loader_kwargs):
+    """
+    Every load_spectrum() option with its defaults applied, canonical.
+    """
+
+    options = dict(_LOADER_DEFAULTS)
+    for k, v in loader_kwargs.items():
+        if k not in _LOADER_IGNORED:
+            options[k] = v
+
+    return {k: _canonical(v) for k, v in options.items()}
+
+
+def _same_redshift(z, z_row):
+    if z is None or z_row is None or not np.isfinite(z_row):
+        return False
+    return bool(np.isclose(float(z), float(z_row), rtol=0, atol=1e-9))
+
+
+class SpectrumCube:
+    """
+    Memory-mapped rest-frame datacube written by build_cube().
+
+    Attributes
+    ----------
+    wave : ndarray (N_pix,)
+    flux, err : memmap (N_obj, N_pix)
+    mask : memmap (N_obj, N_pix), True where the spectrum has data
+    oversampling : memmap (N_obj, N_pix) or None
+        Grid pixels per native pixel (None for cubes built before it)
+    index : DataFrame
+        One row per object (file, z, normalized, norm_factor, ...)
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+
+        self.wave = np.load(os.path.join(path, "wave.npy"))
+        self.flux = np.load(os.path.join(path, "flux.npy"), mmap_mode=mode)
+        self.err = np.load(os.path.join(path, "err.npy"), mmap_mode=mode)
+        self.mask = np.load(os.path.join(path, "mask.npy"), mmap_mode=mode)
+
+        # cubos anteriores não têm a amostragem nativa
+        over_path = os.path.join(path, "oversampling.npy")
+        self.oversampling = (
+            np.load(over_path, mmap_mode=mode) if os.path.exists(over_path) else None
+        )
+
+        self.index = pd.read_csv(os.path.join(path, "index.csv"))
+
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+
+        # chave: nome do arquivo e caminho base_path/arquivo
+        base = self.meta.get("base_path", "")
+        self._row_of = {}
+        for row, fname in zip(self.index["row"], self.index["file"]):
+            self._row_of[fname] = row
+            self._row_of[os.path.normpath(os.path.join(base, fname))] = row
+
+        self._built_kwargs = _effective_loader_kwargs(self.meta.get("loader_kwargs", {}))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return f"SpectrumCube({self.path!r}, n_obj={len(self)}, n_pix={len(self.wave)})"
+
+    def row(self, fname):
+        """
+        Row of a file (filename as in spec_info, or base_path/filename).
+        """
+
+        key = str(fname)
+        if key in self._row_of:
+            return self._row_of[key]
+
+        key = os.path.normpath(key)
+        if key in self._row_of:
+            return self._row_of[key]
+
+        row = self._row_of.get(os.path.basename(key))
+        if row is None:
+            raise KeyError(f"{fname} is not in {self}")
+        return row
+
+    def rows(self, files=None, where=None):
+        """
+        Row numbers of a list of files and/or of index rows satisfying
+        a condition (boolean Series or query string on self.index).
+        """
+
+        if files is not None:
+            rows = np.array([self.row(f) for f in files], dtype=np.int64)
+        else:
+            rows = self.index["row"].to_numpy()
+
+        if where is not None:
+            if isinstance(where, str):
+                keep = set(self.index.query(where)["row"])
+            else:
+                keep = set(self.index["row"][np.asarray(where)])
+            rows = np.array([r for r in rows if r in keep], dtype=np.int64)
+
+        return rows
+
+    def spectrum(self, row):
+        """
+        One object as a load_spectrum()-like dict (views into the cube,
+        trimmed to the covered pixels).
+        """
+
+        info = self.index.iloc[row]
+        sl = slice(int(info["pix_start"]), int(info["pix_end"]))
+
+        norm_factor = info["norm_factor"]
+        normalized = bool(info["normalized"])
+        loader_kwargs = self.meta.get("loader_kwargs", {})
+
+        return {
+            "wave": self.wave[sl],
+            "flux": self.flux[row, sl],
+            "err": self.err[row, sl],
+            "z": info["z"],
+            "file": info["file"],
+            "restframe": True,
+            "normalized": normalized,
+            "norm_window": _canonical(loader_kwargs.get("norm_window")) if normalized else None,
+            "norm_factor": norm_factor if normalized else None,
+            "norm_error": info["norm_error"] if isinstance(info["norm_error"], str) else None,
+            "output_flux_scale": loader_kwargs.get("output_flux_scale"),
+            "cube_row": int(row),
+        }
+
+    def select(self, files=None, rows=None, where=None):
+        """
+        Selection of objects, usable wherever a list of spectra is
+        (compute_mean_spectrum() stacks it without resampling).
+        """
+
+        if rows is None:
+            rows = self.rows(files=files, where=where)
+
+        return CubeSelection(self, rows)
+
+    def window_stats(self, window, rows=None, min_points=3):
+        """
+        compute_error_stats() for many objects at once.
+
+        Parameters
+        ----------
+        window : tuple
+            (lambda_min, lambda_max) [μm, rest frame]
+        rows : array_like or None
+            Rows (default: all)
+
+        Returns
+        -------
+        DataFrame with file, n_points, flux_mean, flux_median, err_mean,
+        err_median, err_rms, snr (NaN for objects not normalized or
+        with fewer than min_points valid pixels)
+        """
+
+        if rows is None:
+            rows = self.index["row"].to_numpy()
+        rows = np.asarray(rows)
+
+        sl = window_slices(self.wave, window)
+
+        with stage("cube.window_stats"):
+            f = np.asarray(self.flux[rows, sl], dtype=float)
+            e = np.asarray(self.err[rows, sl], dtype=float)
+            n = np.isfinite(f).sum(axis=1)
+
+            # janelas sem dados dão NaN (sem aviso)
+            with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                stats = {
+                    "flux_mean": np.nanmean(f, axis=1),
+                    "flux_median": np.nanmedian(f, axis=1),
+                    "err_mean": np.nanmean(e, axis=1),
+                    "err_median": np.nanmedian(e, axis=1),
+                    "err_rms": np.sqrt(np.nanmean(e**2, axis=1)),
+                }
+                stats["snr"] = np.where(
+                    stats["err_rms"] > 0, stats["flux_mean"] / stats["err_rms"], np.nan
+                )
+
+        bad = (n < min_points) | ~self.index["normalized"].to_numpy()[rows].astype(bool)
+        for v in stats.values():
+            v[bad] = np.nan
+
+        out = pd.DataFrame({"file": self.index["file"].to_numpy()[rows], "n_points": n})
+        for k, v in stats.items():
+            out[k] = v
+
+        return out
+
+    def loader(self, path, z=None, **loader_kwargs):
+        """
+        load_spectrum() replacement serving cube rows (pass as loader=
+        to the plot functions). Files outside the cube, a different z, or
+        loader options whose effective values (defaults included) differ
+        from the build options fall back to reading the FITS file.
+        """
+
+        try:
+            row = self.row(path)
+        except KeyError:
+            row = None
+
+        if (
+            row is None
+            or not self.index["loaded"].iloc[row]
+            or not _same_redshift(z, self.index["z"].iloc[row])
+            or _effective_loader_kwargs(loader_kwargs) != self._built_kwargs
+        ):
+            return load_spectrum(path, z=z, **loader_kwargs)
+
+        count("cube_rows_served")
+        return self.spectrum(row)
+
+    def mean_spectrum(self, files=None, rows=None, where=None, **kwargs):
+        """
+        compute_mean_spectrum() of a selection (kwargs passed through).
+        """
+
+        return compute_mean_spectrum(self.select(files, rows, where), **kwargs)
+
+
+class CubeSelection(Sequence):
+    """
+    Rows of a SpectrumCube behaving as a list of spectrum dicts.
+    """
+
+    def __init__(self, cube, rows):
+        self.cube = cube
+        self.rows = np.asarray(rows, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return CubeSelection(self.cube, self.rows[i])
+        return self.cube.spectrum(self.rows[i])
+
+    @property
+    def wave(self):
+        return self.cube.wave
+
+    @property
+    def files(self):
+        return list(self.cube.index["file"].to_numpy()[self.rows])
+
+    def stack(self, return_error=True):
+        """
+        (N_sel, N_pix) flux and err arrays of the selection.
+        """
+
+        with stage("cube.gather"):
+            flux = np.asarray(self.cube.flux[self.rows], dtype=float)
+            err = np.asarray(self.cube.err[self.rows], dtype=float) if return_error else None
+
+        return flux, err
+
+    def oversampling(self):
+        """
+        (N_sel, N_pix) grid pixels per native pixel of the selection
+        (1 with a warning for cubes built without it).
+        """
+
+        if self.cube.oversampling is None:
+            warnings.warn(
+                f"{self.cube} has no oversampling.npy; errors of sums over "
+                "pixels will be too small (rebuild the cube)"
+            )
+            return np.ones((len(self.rows), len(self.cube.wave)))
+
+        return np.asarray(self.cube.oversampling[self.rows], dtype=float)
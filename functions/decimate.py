@@ -0,0 +1,209 @@
+import weakref
+import numpy as np
+from collections import OrderedDict
+
+
+# cache of decimated spectra, keyed by spectrum and view
+_DECIMATION_CACHE = OrderedDict()
+_DECIMATION_CACHE_SIZE = 512
+
+
+def decimate_minmax(wave, flux, xlim=None, n_columns=1000):
+    """
+    Reduce a spectrum to its min/max envelope per display column.
+
+    The wavelength range in view is split into n_columns bins (one per
+    pixel column of the axis) and each bin is replaced by its minimum
+    and maximum, in the order they occur. Narrow lines and spikes are
+    therefore preserved at display resolution.
+
+    Parameters
+    ----------
+    wave : array_like
+        Wavelength array (sorted)
+    flux : array_like
+        Flux array
+    xlim : tuple or None
+        (xmin, xmax) of the view. If None, the full range is used
+    n_columns : int
+        Number of pixel columns of the axis
+
+    Returns
+    -------
+    wave_dec, flux_dec : ndarray
+        Decimated spectrum. Returned unchanged if the view already has
+        fewer than 2*n_columns points.
+    """
+
+    wave = np.asarray(wave)
+    flux = np.asarray(flux)
+
+    n_columns = int(n_columns)
+
+    if xlim is None:
+        xmin, xmax = np.nanmin(wave), np.nanmax(wave)
+    else:
+        xmin, xmax = min(xlim), max(xlim)
+
+    # índices dentro da janela, mais um vizinho de cada lado
+    i0 = max(np.searchsorted(wave, xmin, side="left") - 1, 0)
+    i1 = min(np.searchsorted(wave, xmax, side="right") + 1, len(wave))
+
+    wave = wave[i0:i1]
+    flux = flux[i0:i1]
+
+    n = len(wave)
+
+    if n_columns < 1 or n <= 2 * n_columns or xmax <= xmin:
+        return wave, flux
+
+    # -------------------------
+    # coluna de cada ponto
+    # -------------------------
+    col = np.floor((wave - xmin) / (xmax - xmin) * n_columns).astype(np.int64)
+    col = np.clip(col, -1, n_columns)
+
+    # wave is sorted → columns are contiguous blocks
+    starts = np.flatnonzero(np.r_[True, col[1:] != col[:-1]])
+    ends = np.r_[starts[1:], n]
+    group = np.repeat(np.arange(len(starts)), ends - starts)
+
+    # -------------------------
+    # argmin / argmax por coluna (NaN ignorado)
+    # -------------------------
+    nan = np.isnan(flux)
+
+    key_min = np.where(nan, np.inf, flux)
+    key_max = np.where(nan, np.inf, -flux)
+
+    order_min = np.lexsort((key_min, group))
+    order_max = np.lexsort((key_max, group))
+
+    imin = order_min[starts]
+    imax = order_max[starts]
+
+    # columns with only NaN keep a gap in the curve
+    all_nan = np.logical_and.reduceat(nan, starts)
+    imin[all_nan] = starts[all_nan]
+    imax[all_nan] = ends[all_nan] - 1
+
+    # -------------------------
+    # ordenar min/max como aparecem
+    # -------------------------
+    first = np.minimum(imin, imax)
+    second = np.maximum(imin, imax)
+
+    idx = np.column_stack([first, second]).ravel()
+
+    # single-point columns would be duplicated
+    keep = np.ones(len(idx), dtype=bool)
+    keep[1::2] = first != second
+    idx = idx[keep]
+
+    return wave[idx], flux[idx]
+
+
+def _spectrum_key(spectrum, flux_key="flux", version=None):
+    """
+    Identify the arrays of a spectrum without reading them.
+
+    The key is the identity and shape of the wave and flux arrays plus
+    a version given by the caller, so a lookup costs the same for any
+    spectrum length. Spectra loaded in other units are different arrays
+    and never share an entry; arrays edited in place need a new version.
+    """
+
+    wave = spectrum["wave"]
+    flux = spectrum[flux_key]
+
+    return (id(wave), id(flux), np.shape(wave), np.shape(flux), version)
+
+
+def _same_arrays(refs, spectrum, flux_key):
+    """
+    True if the cached weak references still point to these arrays
+    (an id can be reused once the original array is freed).
+    """
+
+    return refs[0]() is spectrum["wave"] and refs[1]() is spectrum[flux_key]
+
+
+def _weak(a):
+    try:
+        return weakref.ref(a)
+    except TypeError:
+        # listas não aceitam weakref → nunca reaproveitadas
+        return lambda: None
+
+
+def decimate_spectrum(
+    spectrum,
+    xlim=None,
+    n_columns=1000,
+    flux_key="flux",
+    version=None,
+):
+    """
+    Cached decimate_minmax() for a load_spectrum() output.
+
+    Results are cached per spectrum and view (xlim, n_columns), so
+    redrawing the same panel does not decimate again. Spectra are
+    identified by their wave/flux array objects, not their content;
+    only the decimated copy is kept, never the full arrays.
+
+    Parameters
+    ----------
+    spectrum : dict
+        Output of load_spectrum()
+    xlim : tuple or None
+        (xmin, xmax) of the view
+    n_columns : int
+        Number of pixel columns of the axis
+    flux_key : str
+        Key of the flux array to decimate
+    version : hashable
+        Change it after editing the arrays in place, so the cached
+        envelope is not reused
+
+    Returns
+    -------
+    wave_dec, flux_dec : ndarray
+    """
+
+    if xlim is not None:
+        xlim = (float(xlim[0]), float(xlim[1]))
+
+    key = (_spectrum_key(spectrum, flux_key, version), xlim, int(n_columns))
+
+    if key in _DECIMATION_CACHE:
+        refs, result = _DECIMATION_CACHE[key]
+        if _same_arrays(refs, spectrum, flux_key):
+            _DECIMATION_CACHE.move_to_end(key)
+            return result
+        del _DECIMATION_CACHE[key]
+
+    wave_dec, flux_dec = decimate_minmax(
+        spectrum["wave"],
+        spectrum[flux_key],
+        xlim=xlim,
+        n_columns=n_columns,
+    )
+
+    # cópias: fatias do espectro manteriam o array inteiro na memória
+    result = (np.array(wave_dec), np.array(flux_dec))
+
+    refs = (_weak(spectrum["wave"]), _weak(spectrum[flux_key]))
+    _DECIMATION_CACHE[key] = (refs, result)
+
+    if len(_DECIMATION_CACHE) > _DECIMATION_CACHE_SIZE:
+        _DECIMATION_CACHE.popitem(last=False)
+
+    return result
+
+
+def clear_decimation_cache():
+    """
+    Empty the cache used by decimate_spectrum().
+    """
+
+    _DECIMATION_CACHE.clear()
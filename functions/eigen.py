@@ -0,0 +1,297 @@
+import json
+import numpy as np
+
+from .spectrum import spectra_on_grid
+from .cube import log_wave_grid
+from .profiling import stage, count, timed
+
+
+class EigenSpectra:
+    """
+    Weighted gappy PCA of a sample of spectra, updatable in place.
+
+    Spectra at different redshifts cover different rest-frame ranges,
+    so the covariance is estimated pairwise: every pair of pixels uses
+    the spectra observed at both (Connolly & Szalay 1999). The model
+    keeps only the sufficient statistics of that estimate,
+
+        A = Σ u uᵀ,   B = Σ (u x) uᵀ,   D = Σ (u x)(u x)ᵀ
+
+    (u = sqrt(weight), 0 on missing pixels), so partial_fit() with new
+    spectra adds a few matrix products and never revisits the spectra
+    already seen; the eigenspectra are recomputed from the statistics
+    (top n_components only) when next needed.
+
+    Example
+    -------
+    >>> pca = EigenSpectra(log_wave_grid(0.15, 0.7), n_components=5)
+    >>> pca.partial_fit(spectra)           # load_spectrum(normalize=True)
+    >>> pca.partial_fit(new_spectra)       # archive grew
+    >>> proj = pca.project(load_spectrum(path, z, normalize=True))
+    >>> pca.save("eigenspectra.npz")
+
+    Parameters
+    ----------
+    wave_grid : array_like or None
+        Rest-frame grid (default: cube.log_wave_grid())
+    n_components : int
+    """
+
+    def __init__(self, wave_grid=None, n_components=5):
+        if wave_grid is None:
+            wave_grid = log_wave_grid()
+
+        self.wave = np.asarray(wave_grid, dtype=float)
+        self.n_components = n_components
+
+        n_pix = len(self.wave)
+        self.A = np.zeros((n_pix, n_pix))
+        self.B = np.zeros((n_pix, n_pix))
+        self.D = np.zeros((n_pix, n_pix))
+        self.n_spectra = 0
+        self.files = []
+
+        self._basis = None
+
+    def __repr__(self):
+        return (
+            f"EigenSpectra({self.n_spectra} spectra, {len(self.wave)} px, "
+            f"{self.n_components} components)"
+        )
+
+    # -------------------------
+    # atualização
+    # -------------------------
+    @timed("eigen.partial_fit")
+    def partial_fit(self, spectra, weights=None):
+        """
+        Add spectra to the statistics.
+
+        Parameters
+        ----------
+        spectra : list of dict or CubeSelection
+            load_spectrum() outputs (normalized) or a cube selection on
+            the same grid
+        weights : array_like or None
+            Per-spectrum weights (e.g. S/N²); default 1
+
+        Returns
+        -------
+        self
+        """
+
+        _, flux, _, files = spectra_on_grid(spectra, self.wave, return_error=False)
+        return self.partial_fit_arrays(flux, weights=weights, files=files)
+
+    def partial_fit_arrays(self, flux, weights=None, files=None):
+        """
+        partial_fit() for a (n_spectra, n_pix) flux matrix on self.wave
+        (NaN = missing).
+        """
+
+        flux = np.atleast_2d(np.asarray(flux, dtype=float))
+
+        good = np.isfinite(flux)
+        u = good.astype(float)
+        if weights is not None:
+            u *= np.sqrt(np.asarray(weights, dtype=float))[:, None]
+
+        ux = np.where(good, flux, 0.0) * u
+
+        with stage("eigen.update"):
+            self.A += u.T @ u
+            self.B += ux.T @ u
+            self.D += ux.T @ ux
+
+        self.n_spectra += len(flux)
+        if files is not None:
+            self.files.extend(files)
+
+        self._basis = None
+        count("eigen_spectra_added", len(flux))
+
+        return self
+
+    # -------------------------
+    # base
+    # -------------------------
+    @property
+    def n_contrib(self):
+        """
+        Summed weight per pixel (number of spectra with unit weights).
+        """
+
+        return np.diag(self.A).copy()
+
+    @property
+    def mean(self):
+        """
+        Weighted mean spectrum (NaN where no spectrum has data).
+        """
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.diag(self.B) / np.diag(self.A)
+
+    def covariance(self):
+        """
+        Pairwise (gappy) covariance matrix; 0 for pixel pairs never
+        observed together.
+        """
+
+        mu = np.nan_to_num(self.mean)
+
+        # Σ uu (x_p - μ_p)(x_q - μ_q) / Σ uu
+        S = self.D - mu[None, :] * self.B - mu[:, None] * self.B.T + np.outer(mu, mu) * self.A
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            C = np.where(self.A > 0, S / self.A, 0.0)
+
+        return 0.5 * (C + C.T)
+
+    def _compute_basis(self):
+        from scipy.linalg import eigh
+
+        if self.n_spectra == 0:
+            raise ValueError("no spectra added yet")
+
+        with stage("eigen.eigh"):
+            C = self.covariance()
+            n_pix = len(C)
+            k = min(self.n_components, n_pix)
+
+            values, vectors = eigh(C, subset_by_index=[n_pix - k, n_pix - 1])
+
+        order = np.argsort(values)[::-1]
+        values = values[order]
+        vectors = vectors[:, order].T
+
+        # sinal fixo: maior componente positiva (bases comparáveis entre updates)
+        flip = vectors[np.arange(k), np.argmax(np.abs(vectors), axis=1)] < 0
+        vectors[flip] *= -1
+
+        self._basis = {
+            "components": vectors,
+            "variance": values,
+            "total_variance": float(np.trace(C)),
+        }
+        count("eigen_decompositions")
+
+    @property
+    def components(self):
+        """
+        Eigenspectra, (n_components, n_pix), unit norm.
+        """
+
+        if self._basis is None:
+            self._compute_basis()
+        return self._basis["components"]
+
+    @property
+    def explained_variance(self):
+        if self._basis is None:
+            self._compute_basis()
+        return self._basis["variance"]
+
+    @property
+    def explained_variance_ratio(self):
+        if self._basis is None:
+            self._compute_basis()
+        return self._basis["variance"] / self._basis["total_variance"]
+
+    # -------------------------
+    # projeção
+    # -------------------------
+    @timed("eigen.project")
+    def project(self, spectra, n_components=None, weighted=True):
+        """
+        Coefficients of spectra on the eigenbasis, fitted only on their
+        observed pixels (gappy projection), and the reconstruction that
+        fills the gaps.
+
+        Parameters
+        ----------
+        spectra : dict, list of dict or CubeSelection
+            load_spectrum() output(s)
+        n_components : int or None
+            Leading components used (default: all)
+        weighted : bool
+            Weight pixels by 1/err²
+
+        Returns
+        -------
+        dict with coef (n_spectra, k), reconstruction (n_spectra, n_pix),
+        chi2, n_pix, files
+        """
+
+        if isinstance(spectra, dict):
+            spectra = [spectra]
+
+        _, flux, err, files = spectra_on_grid(spectra, self.wave, return_error=weighted)
+
+        E = self.components[:n_components]
+        mu = self.mean
+
+        valid = np.isfinite(flux) & np.isfinite(mu)[None, :]
+        if weighted:
+            valid &= np.isfinite(err) & (err > 0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                w = np.where(valid, 1.0 / err**2, 0.0)
+        else:
+            w = valid.astype(float)
+
+        r = np.where(valid, flux - np.nan_to_num(mu), 0.0)
+
+        # equações normais de todos os espectros de uma vez
+        with stage("eigen.normal_equations"):
+            wE = w[:, None, :] * E[None, :, :]          # (n_spec, k, n_pix)
+            G = wE @ E.T                                # (n_spec, k, k)
+            b = np.einsum("skp,sp->sk", wE, r)
+            coef = (np.linalg.pinv(G) @ b[:, :, None])[:, :, 0]
+
+        recon = mu[None, :] + coef @ E
+        chi2 = np.sum(w * np.where(valid, flux - recon, 0.0) ** 2, axis=1)
+
+        return {
+            "coef": coef,
+            "reconstruction": recon,
+            "chi2": chi2,
+            "n_pix": valid.sum(axis=1),
+            "files": files,
+        }
+
+    # -------------------------
+    # persistência
+    # -------------------------
+    def save(self, path):
+        """
+        Write the statistics (not the spectra) to a .npz file, so the
+        basis can be refreshed later with new spectra only.
+        """
+
+        np.savez(
+            path,
+            wave=self.wave,
+            A=self.A,
+            B=self.B,
+            D=self.D,
+            meta=json.dumps({
+                "n_components": self.n_components,
+                "n_spectra": self.n_spectra,
+                "files": [str(f) for f in self.files],
+            }),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+
+            pca = cls(data["wave"], n_components=meta["n_components"])
+            pca.A = data["A"].copy()
+            pca.B = data["B"].copy()
+            pca.D = data["D"].copy()
+
+        pca.n_spectra = meta["n_spectra"]
+        pca.files = meta["files"]
+
+        return pca
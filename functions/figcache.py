@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import inspect
+import numpy as np
+
+from .profiling import stage, count
+
+
+MANIFEST_NAME = ".figure_manifest.json"
+
+
+# -------------------------
+# hash das entradas
+# -------------------------
+
+def _canonical(obj):
+    """
+    JSON-friendly, order-independent description of a plot argument.
+    Arrays are replaced by the digest of their content.
+    """
+
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items(), key=lambda x: str(x[0]))}
+    if isinstance(obj, (list, tuple, range)):
+        return [_canonical(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        a = np.ascontiguousarray(obj)
+        return {
+            "array": hashlib.sha1(a.view(np.uint8)).hexdigest(),
+            "dtype": str(a.dtype),
+            "shape": list(a.shape),
+        }
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, float):
+        return repr(obj)
+    if obj is None or isinstance(obj, (str, int, bool)):
+        return obj
+    if callable(obj):
+        return f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', repr(obj))}"
+    return repr(obj)
+
+
+def _source_digest(func):
+    """
+    Digest of the source of the plot function: every module of its
+    package (plot.py, but also spectrum.py, decimate.py, ... which change
+    what is drawn), or its own file outside a package.
+    """
+
+    module = sys.modules.get(getattr(func, "__module__", None))
+    path = getattr(module, "__file__", None)
+
+    if path is None or not os.path.exists(path):
+        return None
+
+    package = getattr(module, "__package__", None)
+    if package:
+        folder = os.path.dirname(path)
+        paths = sorted(
+            os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".py")
+        )
+    else:
+        paths = [path]
+
+    h = hashlib.sha1()
+    for p in paths:
+        h.update(os.path.basename(p).encode())
+        with open(p, "rb") as f:
+            h.update(f.read())
+
+    return h.hexdigest()
+
+
+def _file_state(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def input_files(arguments):
+    """
+    FITS files read by a plot call, from its bound arguments.
+
+    Uses spec_info (restricted to indices / start:start+nrows*ncols when
+    given) or fname, joined with base_path. Every file is tracked by
+    size/mtime, or by Storage.state() when a storage backend (folder,
+    archive or Storage) is given in loader_kwargs.
+    """
+
+    from .storage import open_storage
+
+    base_path = arguments.get("base_path", "")
+    loader_kwargs = arguments.get("loader_kwargs") or {}
+
+    names = []
+
+    if "spec_info" in arguments:
+        spec_info = list(arguments["spec_info"])
+
+        if arguments.get("indices") is not None:
+            spec_info = [spec_info[i] for i in arguments["indices"]]
+        elif "start" in arguments:
+            n = arguments.get("nrows", 1) * arguments.get("ncols", 1)
+            spec_info = spec_info[arguments["start"]:arguments["start"] + n]
+
+        names = [fname for fname, _ in spec_info]
+
+    elif "fname" in arguments:
+        names = [arguments["fname"]]
+
+    paths = [os.path.join(base_path, str(fname)) for fname in names]
+
+    storage = loader_kwargs.get("storage")
+    if storage is None:
+        return {path: _file_state(path) for path in paths}
+
+    storage = open_storage(storage)
+
+    files = {}
+    for path in paths:
+        try:
+            files[f"{storage!r}:{path}"] = storage.state(path)
+        except (OSError, KeyError):
+            files[f"{storage!r}:{path}"] = None
+
+    return files
+
+
+def figure_inputs(plot_func, *args, **kwargs):
+    """
+    Everything a plot call depends on.
+
+    Returns
+    -------
+    dict
+        function, source digest, arguments (canonical form) and the
+        size/mtime of the input FITS files
+    """
+
+    sig = inspect.signature(plot_func)
+    bound = sig.bind(*args, **kwargs)
+    bound.apply_defaults()
+
+    arguments = dict(bound.arguments)
+
+    # **kwargs de funções como make_spectrum_panel
+    for name, p in sig.parameters.items():
+        if p.kind == p.VAR_KEYWORD and name in arguments:
+            arguments.update(arguments.pop(name))
+
+    return {
+        "function": f"{plot_func.__module__}.{plot_func.__qualname__}",
+        "source": _source_digest(plot_func),
+        "arguments": _canonical(arguments),
+        "files": input_files(arguments),
+    }
+
+
+def figure_hash(inputs):
+    payload = json.dumps(inputs, sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# -------------------------
+# manifesto
+# -------------------------
+
+def load_manifest(folder):
+    """
+    {figure filename: entry} of the figures rendered into a folder.
+    """
+
+    path = os.path.join(folder, MANIFEST_NAME)
+
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Skipping {path} → {e}")
+        return {}
+
+
+def _write_manifest(folder, manifest):
+    path = os.path.join(folder, MANIFEST_NAME)
+    tmp = path + ".tmp"
+
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+    os.replace(tmp, path)
+
+
+# -------------------------
+# API
+# -------------------------
+
+def cached_figure(
+    output,
+    plot_func,
+    *args,
+    force=False,
+    savefig_kwargs=None,
+    **kwargs
+):
+    """
+    Render plot_func(*args, **kwargs) to output unless nothing changed.
+
+    The inputs (arguments, source of the plotting package and state of
+    every FITS file read) are hashed; when the hash matches the manifest
+    entry of an existing output the call is skipped without loading any
+    spectrum. Otherwise the figure is drawn, saved, closed and recorded
+    in <folder>/.figure_manifest.json.
+
+    Example
+    -------
+    >>> for start in range(0, len(g1_zip_zsorted), 8):
+    ...     cached_figure(
+    ...         f"Grupos/G1/plots/spectra_panel_g1_{start//8:02d}.pdf",
+    ...         make_spectrum_panel, g1_zip_zsorted, start=start,
+    ...         loader_kwargs=kw, xlim=(0.1, 1.0),
+    ...     )
+
+    Parameters
+    ----------
+    output : str
+        Figure path (any format supported by savefig)
+    plot_func : callable
+        Plot function returning a Figure (or a (fig, ax) tuple)
+    force : bool
+        Render even if the hash matches
+    savefig_kwargs : dict
+        Passed to fig.savefig()
+
+    Returns
+    -------
+    bool
+        True if the figure was rendered, False if it was up to date
+    """
+
+    import matplotlib.pyplot as plt
+
+    if savefig_kwargs is None:
+        savefig_kwargs = {}
+
+    with stage("figcache.hash"):
+        inputs = figure_inputs(plot_func, *args, **kwargs)
+        inputs["savefig"] = _canonical(savefig_kwargs)
+        digest = figure_hash(inputs)
+
+    folder = os.path.dirname(os.path.abspath(output))
+    manifest = load_manifest(folder)
+    name = os.path.basename(output)
+
+    entry = manifest.get(name)
+    if (
+        not force
+        and entry is not None
+        and entry.get("hash") == digest
+        and os.path.exists(output)
+    ):
+        count("figures_skipped")
+        return False
+
+    fig = plot_func(*args, **kwargs)
+
+    # algumas funções devolvem (fig, ax)
+    if isinstance(fig, tuple):
+        fig = fig[0]
+
+    os.makedirs(folder, exist_ok=True)
+    with stage("savefig"):
+        fig.savefig(output, **savefig_kwargs)
+    plt.close(fig)
+
+    count("figures_rendered")
+
+    # relê: outra chamada pode ter escrito no mesmo manifesto
+    manifest = load_manifest(folder)
+    manifest[name] = {
+        "hash": digest,
+        "rendered": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **inputs,
+    }
+    _write_manifest(folder, manifest)
+
+    return True
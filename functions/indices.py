@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+
+from .spectrum import window_slices, spectra_on_grid, oversampling_on_grid
+from .cube import log_wave_grid
+from .profiling import stage, count, timed
+
+
+# -------------------------
+# definições (rest-frame, μm)
+# -------------------------
+#   ratio : <F>_red / <F>_blue, in F_nu ("fnu") or F_lambda ("flambda")
+#   ew    : equivalent width [Å] of the central band over the straight
+#           line through the blue and red pseudo-continua (F_lambda),
+#           Δλ (1 - <F>_central / F_cont(λ_central)); the flux is averaged
+#           over the band before dividing by the (linear) continuum
+INDEX_DEFINITIONS = {
+    # Bruzual (1983)
+    "D4000": {
+        "kind": "ratio", "flux": "fnu",
+        "blue": (0.3750, 0.3950), "red": (0.4050, 0.4250),
+    },
+    # Balogh et al. (1999)
+    "Dn4000": {
+        "kind": "ratio", "flux": "fnu",
+        "blue": (0.3850, 0.3950), "red": (0.4000, 0.4100),
+    },
+    # continuum just below the Balmer limit (3646 Å) vs above it,
+    # avoiding [O II], [Ne III] and the high-order Balmer lines
+    "balmer_break": {
+        "kind": "ratio", "flux": "fnu",
+        "blue": (0.3500, 0.3630), "red": (0.4000, 0.4080),
+    },
+    # Worthey & Ottaviani (1997)
+    "HdeltaA": {
+        "kind": "ew",
+        "blue": (0.404160, 0.407975),
+        "central": (0.408350, 0.412225),
+        "red": (0.412850, 0.416100),
+    },
+    "HgammaA": {
+        "kind": "ew",
+        "blue": (0.428350, 0.431975),
+        "central": (0.431975, 0.436350),
+        "red": (0.436725, 0.441975),
+    },
+}
+
+
+def _bands(definition):
+    if definition["kind"] == "ratio":
+        return ("blue", "red")
+    if definition["kind"] == "ew":
+        return ("blue", "central", "red")
+    raise ValueError(f"unknown index kind {definition['kind']!r} (use 'ratio' or 'ew')")
+
+
+# -------------------------
+# médias em bandas
+# -------------------------
+
+def _prefix_sums(a):
+    """
+    Cumulative sums along the pixels with a leading zero column, so the
+    sum over pixels [lo, hi) is S[:, hi] - S[:, lo].
+    """
+
+    S = np.zeros((a.shape[0], a.shape[1] + 1))
+    np.cumsum(a, axis=1, out=S[:, 1:])
+    return S
+
+
+def band_means(flux, err, wave, windows, min_coverage=0.8, oversampling=None):
+    """
+    Mean flux (and its error) of every spectrum in every window.
+
+    One prefix-sum pass over the (n_spectra, n_pix) matrix serves all
+    windows: each band mean is a difference of two columns of the
+    cumulative sums, with the window bounds from window_slices().
+
+    Parameters
+    ----------
+    flux, err : ndarray (n_spectra, n_pix)
+        err may be None
+    wave : ndarray (n_pix,)
+        Sorted grid
+    windows : list of (wmin, wmax)
+    min_coverage : float
+        Minimum fraction of finite pixels in a window (NaN otherwise)
+    oversampling : ndarray (n_spectra, n_pix) or None
+        Grid pixels per native pixel (spectrum.oversampling_on_grid());
+        the variance of each pixel is multiplied by it, as interpolated
+        pixels are not independent. None: independent pixels
+
+    Returns
+    -------
+    mean, mean_err : ndarray (n_spectra, n_windows)
+    """
+
+    slices = window_slices(wave, list(windows))
+    lo = np.array([s.start for s in slices])
+    hi = np.array([s.stop for s in slices])
+
+    good = np.isfinite(flux)
+
+    with stage("indices.prefix_sums"):
+        S = _prefix_sums(np.where(good, flux, 0.0))
+        N = _prefix_sums(good.astype(float))
+        if err is not None:
+            eg = good & np.isfinite(err)
+            e2 = err * err if oversampling is None else err * err * oversampling
+            E = _prefix_sums(np.where(eg, e2, 0.0))
+
+    n = N[:, hi] - N[:, lo]
+    n_grid = (hi - lo)[None, :]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (S[:, hi] - S[:, lo]) / n
+        mean_err = np.sqrt(E[:, hi] - E[:, lo]) / n if err is not None else None
+
+        low = (n_grid == 0) | (n / n_grid < min_coverage)
+
+    mean[low] = np.nan
+    if mean_err is not None:
+        mean_err[low] = np.nan
+
+    return mean, mean_err
+
+
+# -------------------------
+# índices
+# -------------------------
+
+@timed("measure_indices")
+def measure_indices(
+    spectra,
+    indices=None,
+    wave_grid=None,
+    min_coverage=0.8,
+):
+    """
+    Balmer-break, D4000-style and user-defined indices of many spectra.
+
+    The spectra are resampled once into a matrix; the windows of all
+    indices are collected and measured in a single band_means() pass
+    (one for F_lambda and, if needed, one for F_nu ∝ F_lambda λ²), so
+    thousands of indices cost one pass over the data. Errors are scaled
+    for the grid being finer than the native pixels.
+
+    Example
+    -------
+    >>> my = {"uv_slope": {"kind": "ratio", "flux": "flambda",
+    ...                    "blue": (0.145, 0.155), "red": (0.245, 0.255)}}
+    >>> tab = measure_indices(spectra, {**INDEX_DEFINITIONS, **my})
+
+    Parameters
+    ----------
+    spectra : list of dict or CubeSelection
+        Rest-frame load_spectrum() outputs (F_lambda; normalization
+        cancels in every index) or a cube selection
+    indices : dict or None
+        {name: definition} in the format of INDEX_DEFINITIONS (default:
+        all of them); wavelengths in μm
+    wave_grid : array_like or None
+        Grid for a list of spectra (default: cube.log_wave_grid())
+    min_coverage : float
+        Minimum fraction of finite pixels in each band
+
+    Returns
+    -------
+    DataFrame
+        file, then <name> and <name>_err for every index (ratios are
+        dimensionless, equivalent widths in Å, positive in absorption)
+    """
+
+    if indices is None:
+        indices = INDEX_DEFINITIONS
+
+    if wave_grid is None and getattr(spectra, "stack", None) is None:
+        wave_grid = log_wave_grid()
+
+    wave, flux, err, files = spectra_on_grid(spectra, wave_grid)
+
+    # a grade (log, Δlnλ = 0.0015) é mais fina que os pixels do PRISM
+    oversampling = oversampling_on_grid(spectra, wave_grid) if err is not None else None
+
+    # -------------------------
+    # todas as janelas, uma passada por tipo de fluxo
+    # -------------------------
+    windows = {"flambda": [], "fnu": []}
+    for name, d in indices.items():
+        kind = d.get("flux", "flambda") if d["kind"] == "ratio" else "flambda"
+        if kind not in windows:
+            raise ValueError(f"{name}: flux must be 'fnu' or 'flambda'")
+        for band in _bands(d):
+            windows[kind].append(tuple(d[band]))
+
+    means = {}
+    for kind, wins in windows.items():
+        if not wins:
+            continue
+
+        wins = list(dict.fromkeys(wins))
+
+        if kind == "fnu":
+            # F_nu ∝ F_lambda λ² (a constante se cancela nas razões)
+            f = flux * wave**2
+            e = None if err is None else err * wave**2
+        else:
+            f, e = flux, err
+
+        m, me = band_means(
+            f, e, wave, wins, min_coverage=min_coverage, oversampling=oversampling
+        )
+        for j, w in enumerate(wins):
+            means[kind, w] = (m[:, j], None if me is None else me[:, j])
+
+    count("indices_measured", len(indices) * len(files))
+
+    # -------------------------
+    # combinar bandas
+    # -------------------------
+    table = {"file": files}
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for name, d in indices.items():
+
+            if d["kind"] == "ratio":
+                kind = d.get("flux", "flambda")
+                fb, eb = means[kind, tuple(d["blue"])]
+                fr, er = means[kind, tuple(d["red"])]
+
+                value = fr / fb
+                error = (
+                    None if eb is None
+                    else np.abs(value) * np.sqrt((er / fr) ** 2 + (eb / fb) ** 2)
+                )
+
+            else:
+                fb, eb = means["flambda", tuple(d["blue"])]
+                fc, ec = means["flambda", tuple(d["central"])]
+                fr, er = means["flambda", tuple(d["red"])]
+
+                lb, lc, lr = (np.mean(d[b]) for b in ("blue", "central", "red"))
+                width = (d["central"][1] - d["central"][0]) * 1e4   # Å
+
+                # contínuo linear avaliado no centro da banda central
+                t = (lc - lb) / (lr - lb)
+                cont = fb * (1 - t) + fr * t
+
+                value = width * (1 - fc / cont)
+                if eb is None:
+                    error = None
+                else:
+                    cont_err = np.sqrt(((1 - t) * eb) ** 2 + (t * er) ** 2)
+                    error = width * np.abs(fc / cont) * np.sqrt(
+                        (ec / fc) ** 2 + (cont_err / cont) ** 2
+                    )
+
+            table[name] = value
+            table[f"{name}_err"] = error if error is not None else np.full(len(files), np.nan)
+
+    return pd.DataFrame(table)
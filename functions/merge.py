@@ -0,0 +1,368 @@
+import os
+import re
+import numpy as np
+
+from .spectrum import load_spectrum, normalize_spectrum
+from .resolution import (
+    resolving_power,
+    lsf_sigma,
+    lsf_kernel_matrix,
+    apply_kernel,
+)
+
+
+# <root>-v<version>_<grating>-<filter>_<pid>_<srcid>.spec.fits
+_FILENAME_RE = re.compile(
+    r"^(?P<root>.+)-v(?P<version>\d+)_"
+    r"(?P<grating>[a-z0-9]+)-(?P<filter>[a-z0-9]+)_"
+    r"(?P<pid>\d+)_(?P<srcid>[^_]+)\.spec\.fits$"
+)
+
+
+def parse_spectrum_filename(fname):
+    """
+    Split a msaexp spectrum filename into its fields.
+
+    rubies-egs61-v4_g395m-f290lp_4233_55604.spec.fits →
+    {'root': 'rubies-egs61', 'version': '4', 'grating': 'g395m',
+     'filter': 'f290lp', 'pid': '4233', 'srcid': '55604'}
+
+    Returns
+    -------
+    dict or None if the name does not follow the msaexp pattern
+    """
+
+    m = _FILENAME_RE.match(os.path.basename(str(fname)))
+
+    if m is None:
+        return None
+
+    return m.groupdict()
+
+
+def build_spectrum_index(*folders, recursive=True):
+    """
+    Index the spectra of one or more folders by (program, source id).
+
+    Parameters
+    ----------
+    folders : str
+        Folders with .spec.fits files
+    recursive : bool
+        Also index sub-folders (e.g. Gradings/68797/)
+
+    Returns
+    -------
+    dict
+        {(pid, srcid): {"prism": [path, ...], "grating": [path, ...]}}
+    """
+
+    index = {}
+
+    for folder in folders:
+        if recursive:
+            walker = os.walk(folder)
+        else:
+            walker = [(folder, [], os.listdir(folder))]
+
+        for dirpath, _, filenames in walker:
+            for fname in sorted(filenames):
+                info = parse_spectrum_filename(fname)
+                if info is None:
+                    continue
+
+                kind = "prism" if info["grating"] == "prism" else "grating"
+
+                entry = index.setdefault(
+                    (info["pid"], info["srcid"]),
+                    {"prism": [], "grating": []},
+                )
+                entry[kind].append(os.path.join(dirpath, fname))
+
+    return index
+
+
+def match_prism_grating(
+    prism_folder="DeGraaff_espectros",
+    grating_folder="Gradings",
+):
+    """
+    Cross-match PRISM and grating spectra of the same object.
+
+    Returns
+    -------
+    dict
+        {prism_path: [grating_path, ...]} for the objects that have both
+    """
+
+    index = build_spectrum_index(prism_folder, grating_folder)
+
+    matches = {}
+    for entry in index.values():
+        if not entry["prism"] or not entry["grating"]:
+            continue
+        for prism_path in entry["prism"]:
+            matches[prism_path] = list(entry["grating"])
+
+    return matches
+
+
+def _disperser(path):
+    info = parse_spectrum_filename(path)
+    return "prism" if info is None else info["grating"]
+
+
+def _combine_gratings(gratings):
+    """
+    Join several grating spectra, the first one taking priority where
+    they overlap.
+
+    Returns
+    -------
+    wave, flux, err, res : ndarray
+    intervals : list of (wmin, wmax)
+        Range of the finite pixels of every grating kept
+    """
+
+    wave = np.empty(0)
+    flux = np.empty(0)
+    err = np.empty(0)
+    res = np.empty(0)
+    intervals = []
+
+    for spec, r in gratings:
+        good = np.isfinite(spec["flux"])
+        if not good.any():
+            continue
+
+        w = spec["wave"]
+
+        # cada intervalo já coberto separadamente (gratings com buracos entre si)
+        keep = ~_inside(w, intervals)
+        if not keep.any():
+            continue
+
+        wave = np.concatenate([wave, w[keep]])
+        flux = np.concatenate([flux, spec["flux"][keep]])
+        err = np.concatenate([err, spec["err"][keep]])
+        res = np.concatenate([res, r[keep]])
+
+        intervals.append((np.min(w[good]), np.max(w[good])))
+
+    order = np.argsort(wave)
+
+    return wave[order], flux[order], err[order], res[order], intervals
+
+
+def _inside(wave, intervals):
+    """
+    True where wave falls in any of the intervals.
+    """
+
+    inside = np.zeros(len(wave), dtype=bool)
+    for wmin, wmax in intervals:
+        inside |= (wave >= wmin) & (wave <= wmax)
+
+    return inside
+
+
+def merge_prism_grating(
+    prism_path,
+    grating_paths,
+    z,
+    mode="native",
+    loader_kwargs=None,
+    normalize=False,
+    norm_window=(0.3446, 0.3646),
+    norm_statistic="median",
+):
+    """
+    Merge a PRISM spectrum with the grating spectra of the same object.
+
+    Both are moved to the rest frame and put on a joint grid. Inside the
+    wavelength ranges covered by the gratings the grating pixels take
+    priority; the PRISM fills the rest, including the range between
+    gratings that do not overlap, and any grating gaps.
+
+    Parameters
+    ----------
+    prism_path : str
+    grating_paths : list of str
+        Listed in order of priority
+    z : float
+        Redshift
+    mode : {'native', 'prism'}
+        'native' keeps the grating pixels at full resolution (joint grid
+        = PRISM pixels outside + grating pixels inside the grating ranges).
+        'prism' convolves the gratings with a variable-width Gaussian to
+        the PRISM resolution and resamples them onto the PRISM grid.
+    loader_kwargs : dict
+        Passed to load_spectrum() (normalization is done after merging)
+    normalize : bool
+        Normalize the merged spectrum (see normalize_spectrum())
+
+    Returns
+    -------
+    dict with:
+        wave, flux, err
+        source (0 = prism, 1 = grating, per pixel)
+        z, file, grating_files
+        normalized, norm_factor, norm_window, norm_error
+    """
+
+    if loader_kwargs is None:
+        loader_kwargs = {}
+
+    loader_kwargs = dict(loader_kwargs)
+    loader_kwargs["normalize"] = False
+    loader_kwargs.setdefault("restframe", True)
+
+    z1 = 1.0 + z if loader_kwargs["restframe"] else 1.0
+
+    prism = load_spectrum(prism_path, z=z, **loader_kwargs)
+    p_wave = prism["wave"]
+    p_res = resolving_power("prism", p_wave * z1)
+
+    gratings = []
+    for path in grating_paths:
+        spec = load_spectrum(path, z=z, **loader_kwargs)
+        gratings.append((spec, resolving_power(_disperser(path), spec["wave"] * z1)))
+
+    # gratings que não se sobrepõem deixam um intervalo para o prisma
+    g_wave, g_flux, g_err, g_res, intervals = _combine_gratings(gratings)
+
+    good = np.isfinite(g_flux)
+
+    if not good.any():
+        wave, flux, err = p_wave, prism["flux"], prism["err"]
+        source = np.zeros(len(wave), dtype=np.int8)
+
+    elif mode == "prism":
+        # -------------------------
+        # grating → resolução do prisma
+        # -------------------------
+        sigma = lsf_sigma(
+            p_wave,
+            p_res,
+            np.interp(p_wave, g_wave, g_res),
+        )
+        kernel = lsf_kernel_matrix(g_wave, p_wave, sigma)
+        g_conv, g_conv_err = apply_kernel(kernel, g_flux, g_err)
+
+        use_grating = _inside(p_wave, intervals) & np.isfinite(g_conv)
+
+        wave = p_wave
+        flux = np.where(use_grating, g_conv, prism["flux"])
+        err = np.where(use_grating, g_conv_err, prism["err"])
+        source = use_grating.astype(np.int8)
+
+    elif mode == "native":
+        # -------------------------
+        # grade conjunta
+        # -------------------------
+        outside = ~_inside(p_wave, intervals)
+        inside_g = _inside(g_wave, intervals)
+
+        wave = np.concatenate([p_wave[outside], g_wave[inside_g]])
+        flux = np.concatenate([prism["flux"][outside], g_flux[inside_g]])
+        err = np.concatenate([prism["err"][outside], g_err[inside_g]])
+        source = np.concatenate([
+            np.zeros(outside.sum(), dtype=np.int8),
+            np.ones(inside_g.sum(), dtype=np.int8),
+        ])
+
+        order = np.argsort(wave)
+        wave, flux, err, source = wave[order], flux[order], err[order], source[order]
+
+        # buracos da grating preenchidos com o prisma
+        gaps = (source == 1) & ~np.isfinite(flux)
+        if gaps.any():
+            p_good = np.isfinite(prism["flux"])
+            flux[gaps] = np.interp(
+                wave[gaps], p_wave[p_good], prism["flux"][p_good],
+                left=np.nan, right=np.nan,
+            )
+            err[gaps] = np.interp(
+                wave[gaps], p_wave[p_good], prism["err"][p_good],
+                left=np.nan, right=np.nan,
+            )
+            source[gaps] = 0
+
+    else:
+        raise ValueError("mode must be 'native' or 'prism'")
+
+    # ---- Normalization ----
+    norm_factor = None
+    norm_error = None
+    normalized = False
+
+    if normalize:
+        try:
+            flux, err, norm_factor, _, _ = normalize_spectrum(
+                wave,
+                flux,
+                err=err,
+                window=norm_window,
+                statistic=norm_statistic,
+            )
+            normalized = True
+        except ValueError as e:
+            norm_error = str(e)
+
+    return {
+        "wave": wave,
+        "flux": flux,
+        "err": err,
+        "source": source,
+        "z": z,
+        "file": prism_path,
+        "grating_files": list(grating_paths),
+        "mode": mode,
+        "normalized": normalized,
+        "norm_window": norm_window if normalized else None,
+        "norm_factor": norm_factor,
+        "norm_error": norm_error,
+        "output_flux_scale": loader_kwargs.get("output_flux_scale"),
+    }
+
+
+def merge_graded_sample(
+    spec_info,
+    prism_folder="DeGraaff_espectros",
+    grating_folder="Gradings",
+    **merge_kwargs
+):
+    """
+    Merge every object of a sample that has grating spectra.
+
+    Parameters
+    ----------
+    spec_info : list of (filename, z)
+        PRISM spectra, e.g. rows of gradings_spectra.csv
+    merge_kwargs :
+        Passed to merge_prism_grating()
+
+    Returns
+    -------
+    dict
+        {filename: merged spectrum} (objects without gratings are left out)
+    """
+
+    matches = match_prism_grating(prism_folder, grating_folder)
+
+    merged = {}
+
+    for fname, z in spec_info:
+        prism_path = os.path.join(prism_folder, fname)
+
+        if prism_path not in matches:
+            continue
+
+        try:
+            merged[fname] = merge_prism_grating(
+                prism_path, matches[prism_path], z, **merge_kwargs
+            )
+        except Exception as e:
+            print(f"Skipping {fname} → {e}")
+
+    return merged
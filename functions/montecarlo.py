@@ -0,0 +1,253 @@
+import os
+import numpy as np
+import pandas as pd
+
+from .spectrum import load_spectrum, window_slices
+
+
+# percentiles of the _0 … _4 columns of the de Graaff catalog
+PERCENTILES = (5, 16, 50, 84, 95)
+
+DEFAULT_WINDOWS = {
+    "5500": (0.5400, 0.5600),
+    "2000": (0.1850, 0.2150),
+}
+
+
+def perturb_flux(flux, err, n_draws=1000, rng=None):
+    """
+    Draw Gaussian realizations of a spectrum.
+
+    Parameters
+    ----------
+    flux, err : array_like
+        Spectrum, shape (n_pix,)
+    n_draws : int
+    rng : numpy Generator, int or None
+
+    Returns
+    -------
+    draws : ndarray, shape (n_draws, n_pix)
+    """
+
+    rng = np.random.default_rng(rng)
+
+    flux = np.asarray(flux, dtype=float)
+    err = np.asarray(err, dtype=float)
+
+    draws = rng.standard_normal((n_draws, len(flux)))
+    draws *= err
+    draws += flux
+
+    return draws
+
+
+def window_statistic(draws, sl, statistic="median", min_points=1):
+    """
+    Statistic of every draw inside a window.
+
+    Parameters
+    ----------
+    draws : ndarray, shape (n_draws, n_pix)
+    sl : slice
+        Window (see window_slices())
+    statistic : {'median', 'mean'}
+    min_points : int
+        Windows with fewer pixels give NaN
+
+    Returns
+    -------
+    ndarray, shape (n_draws,)
+    """
+
+    block = draws[:, sl]
+
+    if block.shape[1] < min_points:
+        return np.full(draws.shape[0], np.nan)
+
+    if statistic == "median":
+        return np.nanmedian(block, axis=1)
+    elif statistic == "mean":
+        return np.nanmean(block, axis=1)
+    else:
+        raise ValueError("statistic must be 'median' or 'mean'")
+
+
+def mc_spectrum_quantities(
+    wave,
+    flux,
+    err,
+    n_draws=1000,
+    norm_window=(0.3446, 0.3646),
+    norm_statistic="median",
+    windows=None,
+    ratios=None,
+    rng=None,
+    min_points=4,
+):
+    """
+    Monte Carlo draws of the derived quantities of one spectrum.
+
+    The flux is perturbed by err n_draws times and each draw goes
+    through the same reductions as normalize_spectrum() and
+    compute_error_stats(), all at once on the (n_draws, n_pix) array.
+
+    Parameters
+    ----------
+    wave, flux, err : array_like
+        Spectrum (not normalized)
+    n_draws : int
+    norm_window : tuple or None
+        Normalization window; if None, window fluxes are not normalized
+    windows : dict
+        {name: (lambda_min, lambda_max)} windows where the normalized
+        mean flux and SNR are measured (default: 5500 and 2000 Å)
+    ratios : dict
+        {name: (window_num, window_den)} ratios of mean window fluxes
+    rng : numpy Generator, int or None
+
+    Returns
+    -------
+    dict of ndarray, each of shape (n_draws,)
+        norm_factor, flux_mean_<window>, snr_<window>, <ratio>
+    """
+
+    if windows is None:
+        windows = DEFAULT_WINDOWS
+
+    if ratios is None:
+        ratios = {}
+
+    wave = np.asarray(wave, dtype=float)
+    err = np.asarray(err, dtype=float)
+
+    draws = perturb_flux(flux, err, n_draws=n_draws, rng=rng)
+
+    names = list(windows)
+    slices = window_slices(wave, [windows[k] for k in names])
+
+    out = {}
+
+    # ---- normalization ----
+    if norm_window is not None:
+        norm_sl = window_slices(wave, norm_window)
+        norm = window_statistic(
+            draws, norm_sl, norm_statistic, min_points=min_points
+        )
+        norm[~(norm > 0)] = np.nan
+        out["norm_factor"] = norm
+    else:
+        norm = np.ones(n_draws)
+
+    # ---- window stats ----
+    for name, sl in zip(names, slices):
+        flux_mean = window_statistic(draws, sl, "mean", min_points=3) / norm
+
+        err_window = err[sl]
+        if len(err_window):
+            err_rms = np.sqrt(np.nanmean(err_window**2)) / norm
+        else:
+            err_rms = np.full(n_draws, np.nan)
+
+        out[f"flux_mean_{name}"] = flux_mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[f"snr_{name}"] = flux_mean / err_rms
+
+    # ---- ratios ----
+    for name, (num, den) in ratios.items():
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[name] = out[f"flux_mean_{num}"] / out[f"flux_mean_{den}"]
+
+    return out
+
+
+def summarize_draws(draws, percentiles=PERCENTILES):
+    """
+    Percentiles of Monte Carlo draws, in the catalog _0 … _4 convention.
+
+    Parameters
+    ----------
+    draws : dict
+        {quantity: ndarray (n_draws,)}
+
+    Returns
+    -------
+    dict
+        {f"{quantity}_{i}": value}, e.g. norm_factor_2 = median
+    """
+
+    row = {}
+
+    for name, values in draws.items():
+        finite = values[np.isfinite(values)]
+
+        if len(finite) == 0:
+            pct = [np.nan] * len(percentiles)
+        else:
+            pct = np.percentile(finite, percentiles)
+
+        for i, v in enumerate(pct):
+            row[f"{name}_{i}"] = v
+
+    return row
+
+
+def mc_sample_table(
+    spec_info,
+    base_path="DeGraaff_espectros",
+    loader_kwargs=None,
+    n_draws=1000,
+    seed=42,
+    **quantity_kwargs
+):
+    """
+    Monte Carlo percentiles of the derived quantities of a sample.
+
+    Parameters
+    ----------
+    spec_info : list of (filename, z)
+    loader_kwargs : dict
+        Passed to load_spectrum() (normalization is done per draw)
+    n_draws : int
+    seed : int
+        Spectrum i uses the seed (seed, i), so the table is
+        reproducible for a given spec_info
+    quantity_kwargs :
+        Passed to mc_spectrum_quantities() (windows, ratios, norm_window...)
+
+    Returns
+    -------
+    DataFrame with file, z and <quantity>_0 … <quantity>_4 columns
+    """
+
+    if loader_kwargs is None:
+        loader_kwargs = {}
+
+    loader_kwargs = dict(loader_kwargs)
+    loader_kwargs["normalize"] = False
+
+    rows = []
+
+    for i, (fname, z) in enumerate(spec_info):
+        try:
+            spec = load_spectrum(
+                os.path.join(base_path, fname), z=z, **loader_kwargs
+            )
+        except Exception as e:
+            print(f"Skipping {fname} → {e}")
+            continue
+
+        draws = mc_spectrum_quantities(
+            spec["wave"],
+            spec["flux"],
+            spec["err"],
+            n_draws=n_draws,
+            rng=np.random.default_rng((seed, i)),
+            **quantity_kwargs
+        )
+
+        row = {"file": fname, "z": z}
+        row.update(summarize_draws(draws))
+        rows.append(row)
+
+    return pd.DataFrame(rows)
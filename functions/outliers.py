@@ -0,0 +1,229 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+
+from .spectrum import spectra_on_grid
+from .profiling import stage, count, timed
+
+
+# MAD → σ de uma gaussiana
+MAD_TO_SIGMA = 1.4826
+
+
+def robust_stack(flux, min_objects=3):
+    """
+    Per-pixel median and MAD-based scatter of a (n_spectra, n_pix) matrix.
+
+    Returns
+    -------
+    median, sigma, n : ndarray (n_pix,)
+        sigma = 1.4826 MAD; NaN where fewer than min_objects spectra
+    """
+
+    n = np.sum(np.isfinite(flux), axis=0)
+
+    with warnings.catch_warnings():
+        # pixels sem nenhum espectro
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(flux, axis=0)
+        sigma = MAD_TO_SIGMA * np.nanmedian(np.abs(flux - median), axis=0)
+
+    few = n < min_objects
+    median[few] = np.nan
+    sigma[few] = np.nan
+
+    return median, sigma, n
+
+
+def _group_labels(groups, files):
+    """
+    Group of every spectrum, from an array aligned with the spectra or
+    a catalog with file and group columns (matched by file name).
+    """
+
+    if isinstance(groups, pd.DataFrame):
+        lookup = dict(zip(
+            (os.path.basename(str(f)) for f in groups["file"]),
+            groups["group"],
+        ))
+        return np.array(
+            [lookup.get(os.path.basename(str(f))) for f in files], dtype=object
+        )
+
+    if groups is None:
+        return np.array(["all"] * len(files), dtype=object)
+
+    groups = np.asarray(groups, dtype=object)
+    if len(groups) != len(files):
+        raise ValueError("groups must have one entry per spectrum")
+    return groups
+
+
+@timed("find_outliers")
+def find_outliers(
+    spectra,
+    groups=None,
+    wave_grid=None,
+    pixel_threshold=5.0,
+    spectrum_threshold=3.5,
+    min_objects=3,
+    use_errors=True,
+):
+    """
+    Score every spectrum against the robust stack of its group.
+
+    The sample is resampled once into a (n_spectra, n_pix) matrix; each
+    group's per-pixel median and MAD come from its rows, and every pixel
+    gets the score
+
+        z = (flux - median) / sqrt(sigma_MAD² + err²)
+
+    Per spectrum, the median |z| and the fraction of pixels above
+    pixel_threshold summarize how anomalous it is; the median |z| is
+    then compared robustly with the other members of the group, and
+    spectra more than spectrum_threshold MADs above it are flagged.
+    Groups whose median |z| have no spread (MAD = 0) get a NaN score
+    and are not flagged.
+
+    Example
+    -------
+    >>> res = find_outliers(spectra, pd.read_csv("groups.csv"),
+    ...                     wave_grid=log_wave_grid(0.15, 0.7))
+    >>> res["table"].query("is_outlier")
+    >>> mean = compute_mean_spectrum(spectra, wave_grid=res["wave"],
+    ...                              exclude=exclusions(res))
+
+    Parameters
+    ----------
+    spectra : list of dict or CubeSelection
+        load_spectrum() outputs (normalized) or a cube selection
+    groups : array_like, DataFrame or None
+        Group of every spectrum, or a catalog with file and group
+        columns (e.g. groups.csv); None scores against the whole sample
+    wave_grid : array_like or None
+        Required for a list of spectra
+    pixel_threshold : float
+        |z| above which a pixel is anomalous
+    spectrum_threshold : float
+        Robust z of the per-spectrum score above which a spectrum is
+        flagged
+    min_objects : int
+        Pixels covered by fewer group members get no score
+    use_errors : bool
+        Include the spectrum's own error in the pixel scores
+
+    Returns
+    -------
+    dict with
+        wave, files, groups, pixel_scores (n_spectra, n_pix),
+        pixel_outliers (bool, same shape), stacks {group: (median,
+        sigma, n)} and table (one line per spectrum: file, group,
+        n_pix, median_abs_z, frac_outlier_pixels, score, is_outlier)
+    """
+
+    wave, flux, err, files = spectra_on_grid(spectra, wave_grid, return_error=use_errors)
+    labels = _group_labels(groups, files)
+
+    z = np.full(flux.shape, np.nan)
+    stacks = {}
+
+    # -------------------------
+    # pilha robusta e scores por grupo
+    # -------------------------
+    with stage("outliers.score"):
+        for g in pd.unique(labels[pd.notna(labels)]):
+            rows = np.flatnonzero(labels == g)
+
+            median, sigma, n = robust_stack(flux[rows], min_objects=min_objects)
+            stacks[g] = (median, sigma, n)
+
+            scale2 = sigma**2
+            if use_errors:
+                scale2 = scale2 + np.where(np.isfinite(err[rows]), err[rows] ** 2, 0.0)
+
+            with np.errstate(invalid="ignore", divide="ignore"):
+                z[rows] = (flux[rows] - median) / np.sqrt(scale2)
+
+    z[~np.isfinite(z)] = np.nan
+    absz = np.abs(z)
+
+    n_pix = np.sum(np.isfinite(z), axis=1)
+    with np.errstate(invalid="ignore"):
+        bad = absz > pixel_threshold
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median_abs_z = np.nanmedian(absz, axis=1)
+        frac_bad = bad.sum(axis=1) / n_pix
+
+    # -------------------------
+    # score de cada espectro relativo ao grupo
+    # -------------------------
+    score = np.full(len(files), np.nan)
+    for g in stacks:
+        rows = np.flatnonzero(labels == g)
+        m = median_abs_z[rows]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            center = np.nanmedian(m)
+            spread = MAD_TO_SIGMA * np.nanmedian(np.abs(m - center))
+
+        # grupo sem dispersão (idênticos, ou poucos membros): sem score
+        if not spread > 0:
+            continue
+
+        score[rows] = (m - center) / spread
+
+    is_outlier = np.nan_to_num(score, nan=0.0) > spectrum_threshold
+
+    count("outliers_flagged", int(is_outlier.sum()))
+
+    table = pd.DataFrame({
+        "file": files,
+        "group": labels,
+        "n_pix": n_pix,
+        "median_abs_z": median_abs_z,
+        "frac_outlier_pixels": frac_bad,
+        "score": score,
+        "is_outlier": is_outlier,
+    })
+
+    return {
+        "wave": wave,
+        "files": files,
+        "groups": labels,
+        "pixel_scores": z,
+        "pixel_outliers": bad,
+        "stacks": stacks,
+        "table": table,
+    }
+
+
+def exclusions(result, pixels=False):
+    """
+    Exclusions for compute_mean_spectrum(exclude=...).
+
+    Parameters
+    ----------
+    result : dict
+        find_outliers() output
+    pixels : bool
+        False: the flagged spectra (list of files); True: a dict
+        {file: anomalous-pixel mask on result["wave"]} for every
+        spectrum, so only those pixels are dropped (the grid of the
+        mean spectrum must then be result["wave"])
+
+    Returns
+    -------
+    list or dict
+    """
+
+    if not pixels:
+        return list(result["table"].loc[result["table"]["is_outlier"], "file"])
+
+    return {
+        f: mask
+        for f, mask in zip(result["files"], result["pixel_outliers"])
+        if mask.any()
+    }
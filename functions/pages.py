@@ -0,0 +1,308 @@
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+from .plot import axis_columns, draw_emission_lines, flux_ylabel
+from .decimate import decimate_spectrum
+from .prefetch import PrefetchLoader
+from .profiling import stage, count, timed, count_artists
+
+
+class SpectrumPanelTemplate:
+    """
+    The figure of make_spectrum_panel(), built once and refilled per page.
+
+    Figure, axes, grid, emission-line markers, the step line, title and
+    redshift label of every axis are created in the constructor; fill()
+    only swaps the step data and the texts. The layout (tight_layout) is
+    computed on the first page and reused, so a multi-page group costs
+    one layout pass instead of one per page.
+
+    Example
+    -------
+    >>> template = SpectrumPanelTemplate(xlim=(0.1, 1.0), ylim=(-0.5, 15))
+    >>> template.fill(page)            # list of (fname, z, spectrum)
+    >>> template.fig.savefig("page.pdf")
+
+    Parameters
+    ----------
+    nrows, ncols : int
+    xlim, ylim : tuple or None
+        Axis limits (autoscaled per page when None)
+    plot_kwargs : dict
+        Passed to ax.step()
+    show_emission_lines : bool
+    decimate : bool
+        Reduce dense spectra to a min/max envelope per pixel column
+    """
+
+    def __init__(
+        self,
+        nrows=4,
+        ncols=2,
+        xlim=None,
+        ylim=None,
+        plot_kwargs=None,
+        show_emission_lines=True,
+        decimate=True,
+    ):
+        if plot_kwargs is None:
+            plot_kwargs = {}
+
+        self.xlim = xlim
+        self.ylim = ylim
+        self.decimate = decimate
+        self.laid_out = False
+
+        with stage("template.build"):
+            self.fig, axes = plt.subplots(
+                nrows, ncols,
+                figsize=(14, 4 * nrows),
+                sharex=True, sharey=True
+            )
+            self.axes = np.atleast_1d(axes).flatten()
+
+            self.lines = []
+            self.z_labels = []
+
+            for ax in self.axes:
+                if show_emission_lines:
+                    draw_emission_lines(ax)
+
+                (line,) = ax.step([], [], **plot_kwargs)
+                self.lines.append(line)
+
+                ax.grid(True)
+                ax.set_title(" ", fontsize=10)
+
+                self.z_labels.append(ax.text(
+                    0.97, 0.95,
+                    "",
+                    transform=ax.transAxes,
+                    ha='right', va='top',
+                    fontsize=9,
+                    bbox=dict(facecolor='white', alpha=0.7, edgecolor='none')
+                ))
+
+            if xlim is not None:
+                self.axes[0].set_xlim(xlim)
+            if ylim is not None:
+                self.axes[0].set_ylim(ylim)
+
+            self.fig.supxlabel(r"Rest-frame wavelength [$\mu$m]")
+            self.ylabel = self.fig.supylabel(flux_ylabel(False), fontsize=14)
+
+    @property
+    def n_panel(self):
+        return len(self.axes)
+
+    def fill(self, page):
+        """
+        Show a page of spectra.
+
+        Parameters
+        ----------
+        page : list of (fname, z, spectrum)
+            At most n_panel entries; spectrum is a load_spectrum() dict,
+            or None to leave the panel empty (e.g. failed normalization)
+
+        Returns
+        -------
+        Figure
+        """
+
+        normalized = None
+        output_flux_scale = None
+
+        with stage("template.fill"):
+            for k, ax in enumerate(self.axes):
+                fname, z, spec = page[k] if k < len(page) else (None, None, None)
+
+                if spec is None:
+                    # painel vazio: some, mas mantém o layout
+                    self.lines[k].set_data([], [])
+                    ax.set_visible(False)
+                    continue
+
+                # ---- Consistency checks ----
+                if normalized is None:
+                    normalized = spec.get("normalized", False)
+                    output_flux_scale = spec.get("output_flux_scale")
+                else:
+                    if spec.get("normalized", False) != normalized:
+                        raise ValueError("Inconsistent normalization across spectra")
+                    if spec.get("output_flux_scale") != output_flux_scale:
+                        raise ValueError("Inconsistent output_flux_scale across spectra")
+
+                if self.decimate:
+                    wave, flux = decimate_spectrum(
+                        spec,
+                        xlim=self.xlim,
+                        n_columns=axis_columns(ax),
+                    )
+                else:
+                    wave, flux = spec["wave"], spec["flux"]
+
+                self.lines[k].set_data(wave, flux)
+                ax.set_title(fname, fontsize=10)
+                self.z_labels[k].set_text("" if z is None else f"z = {z:.3f}")
+                ax.set_visible(True)
+
+            self.ylabel.set_text(flux_ylabel(normalized, output_flux_scale))
+
+            # eixos compartilhados: relim em todos antes de autoescalar
+            if self.xlim is None or self.ylim is None:
+                for ax in self.axes:
+                    ax.relim()
+                self.axes[0].autoscale_view(
+                    scalex=self.xlim is None, scaley=self.ylim is None
+                )
+
+        if not self.laid_out:
+            with stage("tight_layout"):
+                self.fig.tight_layout()
+            self.laid_out = True
+
+        count("pages_filled")
+        count_artists(self.fig)
+
+        return self.fig
+
+    def close(self):
+        plt.close(self.fig)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _load_page(loader, base_path, entries, loader_kwargs):
+    """
+    (fname, z, spectrum or None) for every entry of a page.
+    """
+
+    page = []
+    for fname, z in entries:
+        try:
+            spec = loader(os.path.join(base_path, str(fname)), z=z, **loader_kwargs)
+        except Exception as e:
+            print(f"Skipping {fname} → {e}")
+            page.append((fname, z, None))
+            continue
+
+        # ---- Skip spectra that failed normalization ----
+        if loader_kwargs.get("normalize", False) and not spec["normalized"]:
+            print(
+                f"⚠️ Skipping {fname}, redshift {z}: normalization failed "
+                f"({spec['norm_error']})"
+            )
+            spec = None
+
+        page.append((fname, z, spec))
+
+    return page
+
+
+@timed("pages.render_spectrum_pages")
+def render_spectrum_pages(
+    spec_info,
+    output,
+    nrows=4,
+    ncols=2,
+    base_path="DeGraaff_espectros",
+    xlim=None,
+    ylim=None,
+    plot_kwargs=None,
+    loader_kwargs=None,
+    loader=None,
+    workers=4,
+    queue_depth=1,
+    metadata=None,
+):
+    """
+    Every page of make_spectrum_panel() for spec_info in one multi-page PDF.
+
+    One SpectrumPanelTemplate is built and refilled for every page, and
+    the pages are appended to a single PdfPages file, while the spectra
+    of the next queue_depth pages load in the background.
+
+    Example
+    -------
+    >>> render_spectrum_pages(
+    ...     g1_zip_zsorted, "Grupos/G1/plots/spectra_panels_g1.pdf",
+    ...     loader_kwargs=kw, xlim=(0.1, 1.0), ylim=(-0.5, 15),
+    ... )
+
+    Parameters
+    ----------
+    spec_info : list of (filename, z)
+    output : str
+        PDF path
+    plot_kwargs : dict
+        Passed to ax.step()
+    loader_kwargs : dict
+        Passed to load_spectrum()
+    loader : PrefetchLoader or None
+        Shared loader (a private one with `workers` threads otherwise)
+    queue_depth : int
+        Pages loaded ahead of the one being drawn
+    metadata : dict or None
+        PDF metadata (Title, Author, ...)
+
+    Returns
+    -------
+    int
+        Number of pages written
+    """
+
+    if loader_kwargs is None:
+        loader_kwargs = {}
+
+    spec_info = list(spec_info)
+
+    n_panel = nrows * ncols
+    starts = list(range(0, len(spec_info), n_panel))
+
+    own = loader is None
+    if own:
+        loader = PrefetchLoader(workers=workers)
+
+    def submit_page(k):
+        if k < len(starts) and hasattr(loader, "prefetch"):
+            s = starts[k]
+            loader.prefetch(spec_info[s:s + n_panel], base_path, loader_kwargs)
+
+    folder = os.path.dirname(os.path.abspath(output))
+    os.makedirs(folder, exist_ok=True)
+
+    try:
+        for k in range(queue_depth + 1):
+            submit_page(k)
+
+        with SpectrumPanelTemplate(
+            nrows, ncols, xlim=xlim, ylim=ylim, plot_kwargs=plot_kwargs
+        ) as template, PdfPages(output, metadata=metadata) as pdf:
+
+            for k, start in enumerate(starts):
+                page = _load_page(
+                    loader, base_path, spec_info[start:start + n_panel], loader_kwargs
+                )
+
+                # a página k+depth+1 carrega enquanto esta é desenhada
+                submit_page(k + queue_depth + 1)
+
+                template.fill(page)
+
+                with stage("savefig"):
+                    pdf.savefig(template.fig)
+
+                count("pages_written")
+
+    finally:
+        if own:
+            loader.close()
+
+    return len(starts)
@@ -0,0 +1,406 @@
+import os
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+from .units import pack_ragged
+from .profiling import stage, count, timed
+
+
+ARRAYS = ("wave", "flux", "err")
+
+
+# -------------------------
+# memória compartilhada
+# -------------------------
+
+def _attach(name):
+    """
+    Attach to an existing block without handing it to this process'
+    resource tracker (the owner is the only one that unlinks it).
+    """
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    # Python < 3.13: SharedMemory() always registers the block. With fork
+    # the workers share the owner's tracker, so unregistering afterwards
+    # would drop the owner's entry; skip the registration instead.
+    from multiprocessing import resource_tracker
+
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedSample:
+    """
+    A loaded sample (wave/flux/err of every spectrum) in shared memory.
+
+    The spectra are packed into one flat buffer per array (ragged
+    layout, see units.pack_ragged()) plus an offsets array, so workers
+    attach zero-copy views instead of receiving pickled arrays.
+
+    Create it in the parent with from_spectra() and use it as a context manager, which unlinks the
+    blocks on exit; workers call SharedSample.attach(handle).
+
+    Attributes
+    ----------
+    wave, flux, err : ndarray
+        Flat buffers
+    offsets : ndarray
+        Spectrum i is [offsets[i]:offsets[i + 1]]
+    meta : list of dict
+        file, z, normalized, norm_factor of every spectrum
+    """
+
+    def __init__(self, blocks, arrays, meta, owner):
+        self._blocks = blocks
+        self._owner = owner
+        self.meta = meta
+
+        self.offsets = arrays["offsets"]
+        for key in ARRAYS:
+            setattr(self, key, arrays[key])
+
+    # ---- criação ----
+    @classmethod
+    def from_spectra(cls, spectra):
+        """
+        Copy a list of load_spectrum() dicts into shared memory.
+        """
+
+        spectra = list(spectra)
+
+        host = {}
+        for key in ARRAYS:
+            flat, offsets = pack_ragged([s[key] for s in spectra])
+            host[key] = flat
+        host["offsets"] = offsets
+
+        blocks = {}
+        arrays = {}
+        for key, a in host.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+            view = np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)
+            view[...] = a
+            blocks[key] = shm
+            arrays[key] = view
+
+        meta = [
+            {
+                "file": s.get("file"),
+                "z": s.get("z"),
+                "normalized": s.get("normalized"),
+                "norm_factor": s.get("norm_factor"),
+            }
+            for s in spectra
+        ]
+
+        count("shared_bytes", sum(a.nbytes for a in host.values()))
+
+        return cls(blocks, arrays, meta, owner=True)
+
+    def handle(self):
+        """
+        Small picklable description used by the workers to attach.
+        """
+
+        return {
+            "blocks": {
+                key: (shm.name, getattr(self, key).shape, getattr(self, key).dtype.str)
+                for key, shm in self._blocks.items()
+            },
+            "meta": self.meta,
+        }
+
+    @classmethod
+    def attach(cls, handle):
+        blocks = {}
+        arrays = {}
+        for key, (name, shape, dtype) in handle["blocks"].items():
+            shm = _attach(name)
+            blocks[key] = shm
+            arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            # workers só leem
+            arrays[key].flags.writeable = False
+
+        return cls(blocks, arrays, handle["meta"], owner=False)
+
+    # ---- acesso ----
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def spectrum(self, i):
+        """
+        Spectrum i as a dict of views (wave, flux, err, file, z, ...).
+        """
+
+        sl = slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+        spec = {key: getattr(self, key)[sl] for key in ARRAYS}
+        spec.update(self.meta[i])
+        return spec
+
+    # ---- ciclo de vida ----
+    def close(self):
+        # views precisam sumir antes do close do buffer
+        for key in ARRAYS + ("offsets",):
+            setattr(self, key, None)
+
+        for shm in self._blocks.values():
+            try:
+                shm.close()
+            except BufferError:
+                pass
+            if self._owner:
+                try:
+                    shm.unlink()
+                except FileNotFoundError:
+                    pass
+
+        self._blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------
+# pool
+# -------------------------
+
+_WORKER_SAMPLE = None
+
+
+def _init_worker(handle):
+    global _WORKER_SAMPLE
+    _WORKER_SAMPLE = SharedSample.attach(handle)
+
+
+def _run_chunk(args):
+    func, indices, kwargs = args
+    return [func(_WORKER_SAMPLE, i, **kwargs) for i in indices]
+
+
+def _run_reduce(args):
+    func, indices, kwargs = args
+    return func(_WORKER_SAMPLE, indices, **kwargs)
+
+
+class SharedPool:
+    """
+    Process pool whose workers attach to a SharedSample once.
+
+    Tasks are module-level functions func(sample, i, **kwargs) (map) or
+    func(sample, indices, **kwargs) (map_chunks, for reductions such as
+    partial stacks). Indices are sent in chunks, so scheduling costs one
+    message per chunk and no array is ever pickled.
+
+    Example
+    -------
+    >>> with SharedSample.from_spectra(spectra) as sample, \\
+    ...         SharedPool(sample, processes=4) as pool:
+    ...     stats = pool.map(task_window_stats, window=(0.54, 0.56))
+    ...     mean = parallel_mean_spectrum(pool, wave_grid)
+
+    Parameters
+    ----------
+    sample : SharedSample
+    processes : int or None
+        Default: os.cpu_count()
+    chunk_size : int or None
+        Indices per task (default: about 4 chunks per worker)
+    """
+
+    def __init__(self, sample, processes=None, chunk_size=None, context=None):
+        self.sample = sample
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+        ctx = mp.get_context(context)
+        self._pool = ctx.Pool(
+            self.processes,
+            initializer=_init_worker,
+            initargs=(sample.handle(),),
+        )
+
+    def _chunks(self, indices, chunk_size):
+        indices = list(range(len(self.sample))) if indices is None else list(indices)
+        if chunk_size is None:
+            chunk_size = self.chunk_size or max(1, -(-len(indices) // (4 * self.processes)))
+        return [indices[k:k + chunk_size] for k in range(0, len(indices), chunk_size)]
+
+    def map(self, func, indices=None, chunk_size=None, **kwargs):
+        """
+        [func(sample, i, **kwargs) for i in indices], in order.
+        """
+
+        chunks = self._chunks(indices, chunk_size)
+        with stage("parallel.map"):
+            parts = self._pool.map(_run_chunk, [(func, c, kwargs) for c in chunks])
+        return [r for part in parts for r in part]
+
+    def map_chunks(self, func, indices=None, chunk_size=None, **kwargs):
+        """
+        [func(sample, chunk, **kwargs) for every chunk of indices].
+        """
+
+        chunks = self._chunks(indices, chunk_size)
+        with stage("parallel.map_chunks"):
+            return self._pool.map(_run_reduce, [(func, c, kwargs) for c in chunks])
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+# -------------------------
+# tarefas
+# -------------------------
+
+def task_window_stats(sample, i, window=(0.54, 0.56), min_points=3):
+    """
+    compute_error_stats() of spectrum i.
+    """
+
+    from .spectrum import compute_error_stats
+
+    spec = sample.spectrum(i)
+    return compute_error_stats(
+        spec["wave"], spec["flux"], spec["err"], window,
+        normalized=bool(spec["normalized"]), min_points=min_points,
+    )
+
+
+def task_mc_quantities(sample, i, n_draws=1000, seed=42, **quantity_kwargs):
+    """
+    Monte Carlo percentiles of spectrum i (see montecarlo.py); the seed
+    (seed, i) makes the result independent of the scheduling.
+    """
+
+    from .montecarlo import mc_spectrum_quantities, summarize_draws
+
+    spec = sample.spectrum(i)
+    draws = mc_spectrum_quantities(
+        spec["wave"], spec["flux"], spec["err"],
+        n_draws=n_draws, rng=np.random.default_rng((seed, i)),
+        **quantity_kwargs
+    )
+
+    row = {"file": spec["file"], "z": spec["z"]}
+    row.update(summarize_draws(draws))
+    return row
+
+
+def task_partial_stack(sample, indices, wave_grid=None, flux_min=None):
+    """
+    Per-pixel count, mean and sum of squared deviations (and summed
+    squared errors) of a chunk of spectra interpolated onto wave_grid.
+    """
+
+    n_pix = len(wave_grid)
+
+    n = np.zeros(n_pix)
+    mean = np.zeros(n_pix)
+    m2 = np.zeros(n_pix)
+    n_err = np.zeros(n_pix)
+    e2 = np.zeros(n_pix)
+
+    for i in indices:
+        spec = sample.spectrum(i)
+
+        f = np.interp(wave_grid, spec["wave"], spec["flux"], left=np.nan, right=np.nan)
+        e = np.interp(wave_grid, spec["wave"], spec["err"], left=np.nan, right=np.nan)
+
+        # como em compute_mean_spectrum(): fluxo e erro dos pixels cortados
+        if flux_min is not None:
+            low = f < flux_min
+            f[low] = np.nan
+            e[low] = np.nan
+
+        # Welford por pixel
+        good = np.isfinite(f)
+        n[good] += 1
+        delta = f[good] - mean[good]
+        mean[good] += delta / n[good]
+        m2[good] += delta * (f[good] - mean[good])
+
+        eg = np.isfinite(e)
+        n_err[eg] += 1
+        e2[eg] += e[eg] ** 2
+
+    return n, mean, m2, n_err, e2
+
+
+@timed("parallel_mean_spectrum")
+def parallel_mean_spectrum(pool, wave_grid, indices=None, chunk_size=None, flux_min=None):
+    """
+    compute_mean_spectrum() over the workers of a SharedPool.
+
+    Each worker stacks a chunk into (count, mean, M2) per pixel; the
+    chunks are merged with the parallel variance formula (Chan et al.),
+    so the result equals the serial mean/std up to rounding.
+
+    Returns
+    -------
+    dict with wave, flux_mean, flux_std, err_mean, n_contrib, n_objects
+    """
+
+    wave_grid = np.asarray(wave_grid, dtype=float)
+
+    parts = pool.map_chunks(
+        task_partial_stack, indices, chunk_size=chunk_size,
+        wave_grid=wave_grid, flux_min=flux_min,
+    )
+
+    n = np.zeros(len(wave_grid))
+    mean = np.zeros(len(wave_grid))
+    m2 = np.zeros(len(wave_grid))
+    n_err = np.zeros(len(wave_grid))
+    e2 = np.zeros(len(wave_grid))
+
+    for nb, mb, m2b, neb, e2b in parts:
+        tot = n + nb
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mb - mean
+            mean = np.where(tot > 0, mean + delta * nb / tot, 0.0)
+            m2 = m2 + m2b + np.where(tot > 0, delta**2 * n * nb / tot, 0.0)
+        n = tot
+        n_err += neb
+        e2 += e2b
+
+    n_objects = len(pool.sample) if indices is None else len(list(indices))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        flux_mean = np.where(n > 0, mean, np.nan)
+        flux_std = np.where(n > 0, np.sqrt(m2 / n), np.nan)
+        err_mean = np.sqrt(e2 / n_err) / np.sqrt(n)
+
+    return {
+        "wave": wave_grid,
+        "flux_mean": flux_mean,
+        "flux_std": flux_std,
+        "n_contrib": n.astype(np.int64),
+        "n_objects": n_objects,
+        "err_mean": err_mean,
+    }
@@ -0,0 +1,406 @@
+import os
+import re
+import glob
+import hashlib
+import warnings
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+
+from .units import convert_flux, wave_to_angstrom
+from .resolution import pixel_edges, oversampling_factor
+from .cube import log_wave_grid
+from .prefetch import iter_spectra
+from .profiling import stage, count, timed
+
+
+# F070W, F277W, F410M, F150W2, F164N ...
+_BAND = re.compile(r"(F\d{3}[WMN]2?)", re.IGNORECASE)
+
+
+# -------------------------
+# curvas de transmissão
+# -------------------------
+
+def read_filter_curve(path, wave_unit="um"):
+    """
+    Two-column ASCII transmission curve (wavelength, throughput).
+
+    Comment lines (#) and text headers such as the "microns throughput"
+    line of the NIRCam system throughput files are skipped; SVO curves
+    are in Å (wave_unit="A").
+
+    Returns
+    -------
+    wave : ndarray
+        Wavelength [μm], increasing
+    trans : ndarray
+        Throughput (clipped at 0)
+    """
+
+    data = np.genfromtxt(path, comments="#", usecols=(0, 1), invalid_raise=False)
+    data = np.atleast_2d(data)
+    data = data[np.all(np.isfinite(data), axis=1)]
+
+    if len(data) < 2:
+        raise ValueError(f"{path}: no transmission curve found")
+
+    wave = wave_to_angstrom(data[:, 0], wave_unit) / 1e4
+    trans = np.clip(data[:, 1], 0, None)
+
+    order = np.argsort(wave)
+    return wave[order], trans[order]
+
+
+def band_name(path):
+    """
+    Band of a filter file (F277W from "F277W_mean_system_throughput.txt"
+    or "JWST_NIRCam.F277W.dat"), or the file name without extension.
+    """
+
+    base = os.path.basename(path)
+    m = _BAND.search(base)
+    if m is not None:
+        return m.group(1).upper()
+    return os.path.splitext(base)[0]
+
+
+def load_filters(location, pattern="*", wave_unit="um"):
+    """
+    Transmission curves of a folder of filter files (or a list of paths).
+
+    Returns
+    -------
+    dict
+        {band: (wave [μm], throughput)}, sorted by pivot wavelength
+    """
+
+    if isinstance(location, (str, os.PathLike)):
+        paths = sorted(glob.glob(os.path.join(location, pattern)))
+    else:
+        paths = list(location)
+
+    filters = {}
+    for path in paths:
+        try:
+            filters[band_name(path)] = read_filter_curve(path, wave_unit=wave_unit)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path} → {e}")
+
+    pivots = pivot_wavelengths(filters)
+    return dict(sorted(filters.items(), key=lambda kv: pivots[kv[0]]))
+
+
+def _trapezoid(y, x):
+    return 0.5 * np.sum((y[1:] + y[:-1]) * np.diff(x))
+
+
+def pivot_wavelengths(filters):
+    """
+    Pivot wavelength [μm] of every filter,
+    λ_p² = ∫ T λ dλ / ∫ T dλ/λ.
+    """
+
+    pivots = {}
+    for name, (wave, trans) in filters.items():
+        num = _trapezoid(trans * wave, wave)
+        den = _trapezoid(trans / wave, wave)
+        pivots[name] = np.sqrt(num / den)
+
+    return pivots
+
+
+def filters_grid(filters, dlnlam=0.001):
+    """
+    Observed-frame log grid [μm] spanning every filter.
+    """
+
+    wmin = min(w[0] for w, _ in filters.values())
+    wmax = max(w[-1] for w, _ in filters.values())
+    return log_wave_grid(wmin, wmax, dlnlam)
+
+
+# -------------------------
+# matriz de pesos
+# -------------------------
+
+# pesos por (filtros, grade)
+_WEIGHT_CACHE = OrderedDict()
+_WEIGHT_CACHE_SIZE = 32
+
+
+def _digest(*arrays):
+    h = hashlib.sha1()
+    for a in arrays:
+        h.update(np.ascontiguousarray(a, dtype=float).tobytes())
+    return h.hexdigest()
+
+
+def filter_matrix(filters, wave_grid):
+    """
+    Weights of the mean F_nu of every filter, on a wavelength grid.
+
+    For photon-counting detectors the band-averaged flux density is
+    <F_nu> = ∫ F_nu T dλ/λ / ∫ T dλ/λ; column j holds T_j(λ_i) Δλ_i / λ_i
+    normalized to unit sum, so spectra (n_spec, n_pix) @ W gives the
+    band fluxes of all spectra and filters at once. The curves are
+    resampled once per (filters, grid) pair and cached.
+
+    Returns
+    -------
+    W : ndarray (n_pix, n_filters)
+    """
+
+    wave_grid = np.asarray(wave_grid, dtype=float)
+    names = list(filters)
+
+    key = (
+        tuple(names),
+        _digest(*[a for w_t in filters.values() for a in w_t]),
+        _digest(wave_grid),
+    )
+
+    if key in _WEIGHT_CACHE:
+        _WEIGHT_CACHE.move_to_end(key)
+        return _WEIGHT_CACHE[key]
+
+    dlam = np.diff(pixel_edges(wave_grid))
+
+    W = np.zeros((len(wave_grid), len(names)))
+    for j, name in enumerate(names):
+        wave, trans = filters[name]
+        T = np.interp(wave_grid, wave, trans, left=0.0, right=0.0)
+        w = T * dlam / wave_grid
+        W[:, j] = w / w.sum() if w.sum() > 0 else np.nan
+
+    W.flags.writeable = False
+
+    _WEIGHT_CACHE[key] = W
+    if len(_WEIGHT_CACHE) > _WEIGHT_CACHE_SIZE:
+        _WEIGHT_CACHE.popitem(last=False)
+
+    count("filter_matrices")
+
+    return W
+
+
+def clear_filter_cache():
+    """
+    Empty the cache used by filter_matrix().
+    """
+
+    _WEIGHT_CACHE.clear()
+
+
+# -------------------------
+# fotometria sintética
+# -------------------------
+
+def band_fluxes(flux, err, W, min_coverage=0.95, oversampling=None):
+    """
+    Band-averaged flux densities of a stack of spectra on one grid.
+
+    Pixels without data (NaN) are left out and the weights renormalized
+    over the covered part of each filter; bands with less than
+    min_coverage of their weight covered are NaN.
+
+    Parameters
+    ----------
+    flux, err : ndarray (n_spec, n_pix)
+        F_nu on the grid of W (err may be None)
+    W : ndarray (n_pix, n_filters)
+        filter_matrix()
+    oversampling : ndarray (n_spec, n_pix) or None
+        Grid pixels per native pixel (resolution.oversampling_factor()):
+        the variance of each pixel is multiplied by it, since the
+        interpolated pixels are not independent. None: independent pixels
+
+    Returns
+    -------
+    fnu, fnu_err, coverage : ndarray (n_spec, n_filters)
+    """
+
+    flux = np.atleast_2d(flux)
+    good = np.isfinite(flux)
+
+    with stage("photometry.matmul"):
+        coverage = good.astype(float) @ W
+        fnu = np.where(good, flux, 0.0) @ W
+
+        if err is not None:
+            err = np.atleast_2d(err)
+            e2 = np.where(good & np.isfinite(err), err * err, 0.0)
+            if oversampling is not None:
+                e2 = e2 * oversampling
+            var = e2 @ (W * W)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fnu = fnu / coverage
+        fnu_err = np.sqrt(var) / coverage if err is not None else None
+
+    low = ~(coverage >= min_coverage)
+    fnu[low] = np.nan
+    if fnu_err is not None:
+        fnu_err[low] = np.nan
+
+    return fnu, fnu_err, coverage
+
+
+@timed("synthetic_photometry")
+def synthetic_photometry(
+    spec_info,
+    filters,
+    base_path="DeGraaff_espectros",
+    loader_kwargs=None,
+    wave_grid=None,
+    min_coverage=0.95,
+    workers=4,
+):
+    """
+    Synthetic AB magnitudes of observed-frame spectra through a set of
+    filters (e.g. the NIRCam bands), for flux-calibration / slit-loss
+    checks.
+
+    Every spectrum is loaded in the observed frame in μJy, without
+    normalization, and interpolated onto one grid; the band fluxes of
+    all spectra and filters are then a single matrix product with the
+    cached filter_matrix(). The errors account for the grid being finer
+    than the native pixels (see band_fluxes()).
+
+    Example
+    -------
+    >>> filters = load_filters("filters/nircam")
+    >>> phot = synthetic_photometry(list(zip(df.file, df.z)), filters)
+
+    Parameters
+    ----------
+    spec_info : list of (filename, z)
+    filters : dict or str
+        {band: (wave [μm], throughput)} or a folder for load_filters()
+    loader_kwargs : dict
+        Passed to load_spectrum() (restframe, normalize and
+        output_flux_unit are overridden)
+    wave_grid : array_like or None
+        Observed-frame grid [μm] (default: filters_grid())
+    min_coverage : float
+        Fraction of the filter weight that must be covered by data
+
+    Returns
+    -------
+    DataFrame
+        file, z and, per band, <band>_flux, <band>_flux_err [μJy],
+        <band>_mag, <band>_mag_err [AB] and <band>_coverage
+    """
+
+    if isinstance(filters, (str, os.PathLike)):
+        filters = load_filters(filters)
+
+    loader_kwargs = dict(loader_kwargs or {})
+    loader_kwargs.update(restframe=False, normalize=False, output_flux_unit="uJy")
+
+    if wave_grid is None:
+        wave_grid = filters_grid(filters)
+    wave_grid = np.asarray(wave_grid, dtype=float)
+
+    W = filter_matrix(filters, wave_grid)
+
+    # -------------------------
+    # espectros na grade comum
+    # -------------------------
+    spec_info = list(spec_info)
+    flux = np.full((len(spec_info), len(wave_grid)), np.nan)
+    err = np.full((len(spec_info), len(wave_grid)), np.nan)
+    oversampling = np.ones((len(spec_info), len(wave_grid)))
+
+    with stage("photometry.interpolate"):
+        for k, (fname, z, spec) in enumerate(
+            iter_spectra(spec_info, base_path, loader_kwargs, workers=workers)
+        ):
+            if isinstance(spec, Exception):
+                print(f"Skipping {fname} → {spec}")
+                continue
+
+            flux[k] = np.interp(wave_grid, spec["wave"], spec["flux"], left=np.nan, right=np.nan)
+            err[k] = np.interp(wave_grid, spec["wave"], spec["err"], left=np.nan, right=np.nan)
+            oversampling[k] = oversampling_factor(spec["wave"], wave_grid)
+
+    fnu, fnu_err, coverage = band_fluxes(
+        flux, err, W, min_coverage=min_coverage, oversampling=oversampling
+    )
+
+    # μJy → AB (σ_m = 1.0857 σ_F / F)
+    pivots = np.array(list(pivot_wavelengths(filters).values()))
+    mag, mag_err = convert_flux(fnu, pivots, "uJy", "ABmag", err=fnu_err)
+    mag_err[~np.isfinite(mag)] = np.nan
+
+    count("synthetic_magnitudes", int(np.isfinite(mag).sum()))
+
+    table = {
+        "file": [fname for fname, _ in spec_info],
+        "z": [z for _, z in spec_info],
+    }
+    for j, band in enumerate(filters):
+        table[f"{band}_flux"] = fnu[:, j]
+        table[f"{band}_flux_err"] = fnu_err[:, j]
+        table[f"{band}_mag"] = mag[:, j]
+        table[f"{band}_mag_err"] = mag_err[:, j]
+        table[f"{band}_coverage"] = coverage[:, j]
+
+    return pd.DataFrame(table)
+
+
+def calibration_offsets(synth, photometry, bands=None, columns="{band}", on="file"):
+    """
+    Observed minus synthetic magnitudes, per band and per object.
+
+    A negative offset means the spectrum is fainter than the imaging
+    (flux lost outside the slit), a positive one brighter;
+    median_offset is the grey offset of each object and flux_correction
+    = 10^(-0.4 Δm) the factor that brings the spectrum onto the imaging.
+
+    Parameters
+    ----------
+    synth : DataFrame
+        synthetic_photometry() output
+    photometry : DataFrame
+        Observed AB magnitudes, with an `on` column
+    bands : list or None
+        Default: every band of synth found in photometry
+    columns : str
+        Catalog column of a band, formatted with band= (e.g. "{band}_mag")
+
+    Returns
+    -------
+    DataFrame
+        on, <band>_offset for every band, n_bands, median_offset,
+        flux_correction
+    """
+
+    if bands is None:
+        bands = [
+            c[:-len("_mag")] for c in synth.columns
+            if c.endswith("_mag") and columns.format(band=c[:-len("_mag")]) in photometry
+        ]
+
+    # nomes explícitos: a coluna do catálogo pode ter o nome da sintética
+    observed = {columns.format(band=band): f"{band}_obs" for band in bands}
+    obs = photometry[[on, *observed]].rename(columns=observed)
+    syn = synth[[on] + [f"{band}_mag" for band in bands]]
+
+    merged = syn.merge(obs, on=on, how="inner")
+
+    out = pd.DataFrame({on: merged[on]})
+    for band in bands:
+        out[f"{band}_offset"] = merged[f"{band}_obs"] - merged[f"{band}_mag"]
+
+    offsets = out[[f"{band}_offset" for band in bands]].to_numpy(dtype=float)
+    out["n_bands"] = np.isfinite(offsets).sum(axis=1)
+
+    # objetos sem nenhuma banda → NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        out["median_offset"] = np.nanmedian(offsets, axis=1)
+
+    out["flux_correction"] = 10 ** (-0.4 * out["median_offset"])
+
+    return out
@@ -1,11 +1,92 @@
 import matplotlib.pyplot as plt
-import matplotlib.cm as cm
+from matplotlib import colormaps
 from matplotlib.patches import Patch
 import numpy as np
 from .spectrum import load_spectrum
+from .decimate import decimate_spectrum
+from .profiling import stage, timed, count_artists
+from .prefetch import prefetch_indices
 import os
 
 
+def axis_columns(ax):
+    """
+    Width of an axis in display pixels (number of pixel columns).
+    """
+
+    return max(int(np.ceil(ax.get_window_extent().width)), 1)
+
+
+def draw_emission_lines(ax):
+    """
+    Dashed markers and labels of the rest-frame emission lines
+    (hydrogen in pink, others in black).
+    """
+
+    # --- Fixed rest-frame emission lines (μm) ---
+    emission_lines = {
+        r"[O II]": 0.3727,
+        r"[Ne III]": 0.386876,
+        r"[O III] 4363": 0.436321,
+        r"[O III] 5007": 0.5006843,   	
+    }
+
+    H_emission_lines = {
+        r"H$\beta$": 0.48613,
+        r"H$\alpha$": 0.6563,
+        r"H$\epsilon$": 0.3970079,
+        r"H$\gamma$": 0.4340471,
+        r"H$\delta$": 0.4101742,
+    }
+
+    # --- Draw emission lines first (background) ---
+    for label, wave0 in emission_lines.items():
+        ax.axvline(
+            wave0,
+            color="black",
+            ls="--",
+            lw=0.8,
+            alpha=0.7,
+            zorder=0
+        )
+
+        ax.text(
+            wave0,
+            0.98,
+            label,
+            rotation=90,
+            ha="right",
+            va="top",
+            transform=ax.get_xaxis_transform(),
+            fontsize=8,
+            color="gray"
+        )
+
+    # --- Draw H series emission lines first (background) ---
+    for label, wave0 in H_emission_lines.items():
+        ax.axvline(
+            wave0,
+            color="deeppink",
+            ls="--",
+            lw=0.8,
+            alpha=0.7,
+            zorder=0
+        )
+
+        ax.text(
+            wave0,
+            0.78,
+            label,
+            rotation=90,
+            ha="right",
+            va="top",
+            transform=ax.get_xaxis_transform(),
+            fontsize=8,
+            color="deeppink"
+        )
+
+
+@timed("plot.plot_spectrum_ax")
 def plot_spectrum_ax(
     ax,
     spectrum,
@@ -14,6 +95,7 @@ def plot_spectrum_ax(
     ylim=None,
     title=None,
     z=None,
+    decimate=True,
     **plot_kwargs
 ):
     """
@@ -28,75 +110,28 @@ def plot_spectrum_ax(
         Axis limits, e.g. (xmin, xmax)
     title : str or None
     z : float or None
+    decimate : bool
+        Reduce dense spectra to a min/max envelope per pixel column
+        of the axis before drawing (see decimate_spectrum())
     plot_kwargs :
         Passed directly to ax.plot()
     """
 
-    # --- Fixed rest-frame emission lines (μm) ---
-    emission_lines = {
-        r"[O II]": 0.3727,
-        r"[Ne III]": 0.386876,
-        r"[O III] 4363": 0.436321,
-        r"[O III] 5007": 0.5006843,   	
-    }
-
-    H_emission_lines = {
-        r"H$\beta$": 0.48613,
-        r"H$\alpha$": 0.6563,
-        r"H$\epsilon$": 0.3970079,
-        r"H$\gamma$": 0.4340471,
-        r"H$\delta$": 0.4101742,
-    }
     if show_emission_lines:
-        # --- Draw emission lines first (background) ---
-        for label, wave0 in emission_lines.items():
-            ax.axvline(
-                wave0,
-                color="black",
-                ls="--",
-                lw=0.8,
-                alpha=0.7,
-                zorder=0
-            )
-
-            ax.text(
-                wave0,
-                0.98,
-                label,
-                rotation=90,
-                ha="right",
-                va="top",
-                transform=ax.get_xaxis_transform(),
-                fontsize=8,
-                color="gray"
-            )
-
-        # --- Draw H series emission lines first (background) ---
-        for label, wave0 in H_emission_lines.items():
-            ax.axvline(
-                wave0,
-                color="deeppink",
-                ls="--",
-                lw=0.8,
-                alpha=0.7,
-                zorder=0
-            )
+        draw_emission_lines(ax)
 
-            ax.text(
-                wave0,
-                0.78,
-                label,
-                rotation=90,
-                ha="right",
-                va="top",
-                transform=ax.get_xaxis_transform(),
-                fontsize=8,
-                color="deeppink"
-            )
+    if decimate:
+        wave, flux = decimate_spectrum(
+            spectrum,
+            xlim=xlim,
+            n_columns=axis_columns(ax),
+        )
+    else:
+        wave, flux = spectrum["wave"], spectrum["flux"]
 
     ax.step(
-        spectrum["wave"],
-        spectrum["flux"],
+        wave,
+        flux,
         **plot_kwargs
     )
 
@@ -121,6 +156,27 @@ def plot_spectrum_ax(
             bbox=dict(facecolor='white', alpha=0.7, edgecolor='none')
         )
 
+
+def flux_ylabel(normalized, output_flux_scale=None):
+    """
+    Y-axis label of a panel of spectra.
+    """
+
+    if normalized:
+        ylabel = r"Normalized $F_\lambda$"
+    elif output_flux_scale is not None:
+        power = -int(np.log10(output_flux_scale))
+        ylabel = (
+            rf"$F_\lambda$ "
+            rf"($10^{{{power}}}$ erg s$^{{-1}}$ cm$^{{-2}}$ Å$^{{-1}}$)"
+        )
+    else:
+        ylabel = r"$F_\lambda$ (erg s$^{-1}$ cm$^{-2}$ Å$^{-1}$)"
+
+    return ylabel
+
+
+@timed("plot.make_spectrum_panel")
 def make_spectrum_panel(
     spec_info,
     start=0,
@@ -131,6 +187,7 @@ def make_spectrum_panel(
     ylim=None,
     plot_kwargs=None,
     loader_kwargs=None,
+    loader=None,
 ):
     """
     Plot a panel of spectra.
@@ -142,6 +199,8 @@ def make_spectrum_panel(
         Passed to ax.plot()
     loader_kwargs : dict
         Passed to load_spectrum()
+    loader : callable or None
+        Used instead of load_spectrum(), e.g. a PrefetchLoader
     """
 
     if plot_kwargs is None:
@@ -150,9 +209,17 @@ def make_spectrum_panel(
     if loader_kwargs is None:
         loader_kwargs = {}
 
+    if loader is None:
+        loader = load_spectrum
+
     n_panel = nrows * ncols
     subset = spec_info[start:start + n_panel]
 
+    prefetch_indices(
+        loader, spec_info, range(start, start + len(subset)),
+        base_path, loader_kwargs,
+    )
+
     fig, axes = plt.subplots(
         nrows, ncols,
         figsize=(14, 4 * nrows),
@@ -166,7 +233,7 @@ def make_spectrum_panel(
 
     for ax, (fname, z) in zip(axes, subset):
 
-        spec = load_spectrum(
+        spec = loader(
             f"{base_path}/{fname}",
             z=z,
             **loader_kwargs
@@ -209,21 +276,12 @@ def make_spectrum_panel(
     # ---- Axis labels ----
     fig.supxlabel(r"Rest-frame wavelength [$\mu$m]")
 
-    if normalized:
-        ylabel = r"Normalized $F_\lambda$"
-    elif output_flux_scale is not None:
-        power = -int(np.log10(output_flux_scale))
-        ylabel = (
-            rf"$F_\lambda$ "
-            rf"($10^{{{power}}}$ erg s$^{{-1}}$ cm$^{{-2}}$ Å$^{{-1}}$)"
-        )
-    else:
-        ylabel = r"$F_\lambda$ (erg s$^{-1}$ cm$^{-2}$ Å$^{-1}$)"
-
-    fig.supylabel(ylabel, fontsize=14)
+    fig.supylabel(flux_ylabel(normalized, output_flux_scale), fontsize=14)
 
 
-    plt.tight_layout()
+    with stage("tight_layout"):
+        plt.tight_layout()
+    count_artists(fig)
     return fig
 
 def short_label_from_filename(fname):
@@ -247,6 +305,137 @@ def short_label_from_filename(fname):
     return f"{survey}-{id_part}"
 
 
+def step_vertices(x, y, where="mid"):
+    """
+    Build the vertices of a step curve, as drawn by ax.step().
+
+    Parameters
+    ----------
+    x, y : array_like
+        Data points
+    where : {'mid', 'pre', 'post'}
+        Step position, same meaning as in ax.step()
+
+    Returns
+    -------
+    xs, ys : ndarray
+        Vertices of the step curve (length 2*len(x) - 1 or 2*len(x))
+    """
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+
+    if n < 2:
+        return x.copy(), y.copy()
+
+    if where == "mid":
+        xm = 0.5 * (x[:-1] + x[1:])
+
+        xs = np.empty(2 * n)
+        xs[0] = x[0]
+        xs[1:-1:2] = xm
+        xs[2:-1:2] = xm
+        xs[-1] = x[-1]
+
+        ys = np.repeat(y, 2)
+
+    elif where == "pre":
+        xs = np.empty(2 * n - 1)
+        xs[0::2] = x
+        xs[1::2] = x[:-1]
+
+        ys = np.empty(2 * n - 1)
+        ys[0::2] = y
+        ys[1::2] = y[1:]
+
+    elif where == "post":
+        xs = np.empty(2 * n - 1)
+        xs[0::2] = x
+        xs[1::2] = x[1:]
+
+        ys = np.empty(2 * n - 1)
+        ys[0::2] = y
+        ys[1::2] = y[:-1]
+
+    else:
+        raise ValueError("where must be 'mid', 'pre' or 'post'")
+
+    return xs, ys
+
+
+def qualitative_colors(n):
+    """
+    n distinct colors: tab10, tab20 up to 20 spectra, then evenly
+    spaced samples of a continuous colormap (tab10/tab20 repeat).
+    """
+
+    if n <= 10:
+        return list(colormaps["tab10"].colors[:n])
+    if n <= 20:
+        return list(colormaps["tab20"].colors[:n])
+    return list(colormaps["turbo"](np.linspace(0.05, 0.95, n)))
+
+
+def add_step_collection(
+    ax,
+    curves,
+    colors,
+    where="mid",
+    lw=1.5,
+    rasterized=False,
+    zorder=2,
+):
+    """
+    Draw many step curves as a single LineCollection.
+
+    Much cheaper than one ax.step() call per spectrum when plotting
+    tens to hundreds of spectra: only one artist is created.
+
+    Parameters
+    ----------
+    ax : matplotlib axis
+    curves : list of (x, y)
+        Data of each spectrum
+    colors : list
+        One color per curve
+    where : {'mid', 'pre', 'post'}
+        Step position, same meaning as in ax.step()
+    lw : float
+        Line width
+    rasterized : bool
+        Rasterize the spectra layer (keeps vector PDFs small)
+
+    Returns
+    -------
+    LineCollection or None
+    """
+
+    from matplotlib.collections import LineCollection
+
+    if len(curves) == 0:
+        return None
+
+    segments = []
+    for x, y in curves:
+        xs, ys = step_vertices(x, y, where=where)
+        segments.append(np.column_stack([xs, ys]))
+
+    lc = LineCollection(
+        segments,
+        colors=list(colors)[:len(segments)],
+        linewidths=lw,
+        zorder=zorder,
+    )
+    lc.set_rasterized(rasterized)
+
+    ax.add_collection(lc, autolim=True)
+    ax.autoscale_view()
+
+    return lc
+
+
+@timed("plot.plot_overlaid_spectra")
 def plot_overlaid_spectra(
     spec_info,
     indices,
@@ -257,23 +446,46 @@ def plot_overlaid_spectra(
     figsize=(7, 5),
     offset=True,
     lines=None,
+    fast=False,
+    rasterized=False,
+    decimate=True,
+    loader=None,
 ):
+    """
+    Plot several spectra on the same axis.
 
-    import os
-    import numpy as np
-    import matplotlib.pyplot as plt
-    from matplotlib import cm
-    from matplotlib.patches import Patch
+    Parameters
+    ----------
+    spec_info : list of (filename, z)
+    indices : list
+        Indices of spec_info to plot
+    offset : bool
+        Apply vertical offset to separate spectra
+    fast : bool
+        Draw all spectra as a single LineCollection instead of one
+        ax.step() per spectrum (use for large overlays)
+    rasterized : bool
+        Rasterize the spectra layer (only with fast=True)
+    decimate : bool
+        Reduce dense spectra to a min/max envelope per pixel column
+    loader : callable or None
+        Used instead of load_spectrum(), e.g. a PrefetchLoader
+    """
 
     if loader_kwargs is None:
         loader_kwargs = {}
 
+    if loader is None:
+        loader = load_spectrum
+
+    # começa a ler enquanto a figura é montada
+    prefetch_indices(loader, spec_info, indices, base_path, loader_kwargs)
+
     # -------------------------
     # cores (qualitativas)
     # -------------------------
     n = len(indices)
-    base_cmap = cm.get_cmap("tab10")
-    colors = base_cmap.colors[:n]
+    colors = qualitative_colors(n)
 
     fig, ax = plt.subplots(figsize=figsize)
 
@@ -353,6 +565,8 @@ def plot_overlaid_spectra(
     # plot dos espectros
     # -------------------------
     labels = []
+    curves = []
+    curve_colors = []
 
     for j, i in enumerate(indices):
         fname, z = spec_info[i]
@@ -362,7 +576,7 @@ def plot_overlaid_spectra(
         full_path = os.path.join(base_path, fname)
 
         try:
-            data = load_spectrum(
+            data = loader(
                 full_path,
                 z=z,
                 **loader_kwargs
@@ -373,18 +587,33 @@ def plot_overlaid_spectra(
 
         label = short_label_from_filename(fname)
 
-        if offset:
+        if decimate:
+            wave, flux = decimate_spectrum(
+                data,
+                xlim=(xmin, xmax),
+                n_columns=axis_columns(ax),
+            )
+        else:
+            wave, flux = data["wave"], data["flux"]
+
+        if fast:
+            y_offset = 6.5 * (i - indices[0]) if offset else 0.0
+
+            curves.append((wave, flux + y_offset))
+            curve_colors.append(color)
+
+        elif offset:
             y_offset = 6.5 * (i - indices[0])
 
-            x = data["wave"]
-            y = data["flux"] + y_offset
+            x = wave
+            y = flux + y_offset
 
             ax.step(x, y, color=color, where="mid", lw=1.5)
 
         else:
             ax.step(
-                data["wave"],
-                data["flux"],
+                wave,
+                flux,
                 where='mid',
                 lw=1.5,
                 color=color,
@@ -393,6 +622,21 @@ def plot_overlaid_spectra(
         # 👇 sempre salva labels
         labels.append(label)
 
+    if fast:
+        add_step_collection(
+            ax,
+            curves,
+            curve_colors,
+            where="mid",
+            lw=1.5,
+            rasterized=rasterized,
+        )
+
+        # add_collection re-scales the axis
+        ax.set_xlim(xmin, xmax)
+        if ylim is not None:
+            ax.set_ylim(*ylim)
+
     # -------------------------
     # labels dos eixos
     # -------------------------
@@ -418,10 +662,13 @@ def plot_overlaid_spectra(
         handlelength=1.5,
     )
 
-    fig.tight_layout(rect=[0, 0, 1, 0.92])
+    with stage("tight_layout"):
+        fig.tight_layout(rect=[0, 0, 1, 0.92])
+    count_artists(fig)
 
     return fig
 
+@timed("plot.plot_spectrum_presentation")
 def plot_spectrum_presentation(
     fname,
     z,
@@ -434,6 +681,7 @@ def plot_spectrum_presentation(
     title=None,
     spectrum_kwargs=None,
     line_kwargs=None,
+    loader=None,
 ):
     """
     Plot a single spectrum optimized for presentations.
@@ -451,11 +699,10 @@ def plot_spectrum_presentation(
         kwargs passed to ax.step()
     line_kwargs : dict
         kwargs passed to ax.axvline()
+    loader : callable or None
+        Used instead of load_spectrum(), e.g. a PrefetchLoader
     """
 
-    import os
-    import matplotlib.pyplot as plt
-
     if loader_kwargs is None:
         loader_kwargs = {}
 
@@ -494,9 +741,12 @@ def plot_spectrum_presentation(
             r"Pa$\gamma$": 1.0938,
         }
 
+    if loader is None:
+        loader = load_spectrum
+
     full_path = os.path.join(base_path, fname)
 
-    spec = load_spectrum(
+    spec = loader(
         full_path,
         z=z,
         **loader_kwargs
@@ -605,10 +855,13 @@ def plot_spectrum_presentation(
     for spine in ax.spines.values():
         spine.set_linewidth(1.2)
 
-    fig.tight_layout()
+    with stage("tight_layout"):
+        fig.tight_layout()
+    count_artists(fig)
 
     return fig, ax
 
+@timed("plot.plot_spectrum_shaded_lines")
 def plot_spectrum_shaded_lines(
     fname,
     z,
@@ -621,14 +874,14 @@ def plot_spectrum_shaded_lines(
     title=None,
     spectrum_kwargs=None,
     shade_width=0.002,
+    loader=None,
 ):
     """
     Plot spectrum with shaded regions marking emission lines.
     Hydrogen lines are shown in red, others in gray.
-    """
 
-    import os
-    import matplotlib.pyplot as plt
+    loader (callable or None) is used instead of load_spectrum().
+    """
 
     if loader_kwargs is None:
         loader_kwargs = {}
@@ -654,9 +907,12 @@ def plot_spectrum_shaded_lines(
             r"He I 10830": 1.0830,
         }
 
+    if loader is None:
+        loader = load_spectrum
+
     full_path = os.path.join(base_path, fname)
 
-    spec = load_spectrum(
+    spec = loader(
         full_path,
         z=z,
         **loader_kwargs
@@ -780,10 +1036,13 @@ def plot_spectrum_shaded_lines(
 
     ax.grid(alpha=0.25)
 
-    fig.tight_layout()
+    with stage("tight_layout"):
+        fig.tight_layout()
+    count_artists(fig)
 
     return fig, ax
 
+@timed("plot.plot_mean_spectrum")
 def plot_mean_spectrum(
     mean_spec,
     lines=None,
@@ -1003,10 +1262,13 @@ def plot_mean_spectrum(
             bbox=dict(facecolor='white', alpha=0.7, edgecolor='none')
         )
 
-    fig.tight_layout()
+    with stage("tight_layout"):
+        fig.tight_layout()
+    count_artists(fig)
 
     return fig, ax
 
+@timed("plot.plot_overlaid_mean_spectra")
 def plot_overlaid_mean_spectra(
     mean_specs,
     xlim=(0.2, 0.6),
@@ -1032,10 +1294,6 @@ def plot_overlaid_mean_spectra(
         Emission lines {label: wavelength}
     """
 
-    import numpy as np
-    import matplotlib.pyplot as plt
-    from matplotlib import cm
-
     # -------------------------
     # cores
     # -------------------------
@@ -1062,7 +1320,7 @@ def plot_overlaid_mean_spectra(
 
     else:
         # fallback: colormap
-        cmap = cm.get_cmap(cmap_name)
+        cmap = colormaps[cmap_name]
         colors_array = cmap(np.linspace(0.0, 0.8, n))
         colors_map = {g: colors_array[i] for i, g in enumerate(group_names)}
 
@@ -1228,12 +1486,15 @@ def plot_overlaid_mean_spectra(
         handlelength=1.5,
     )
 
-    fig.tight_layout(rect=[0, 0, 1, 0.92])
+    with stage("tight_layout"):
+        fig.tight_layout(rect=[0, 0, 1, 0.92])
+    count_artists(fig)
 
 
     return fig, ax
 
 
+@timed("plot.plot_stacked_spectra_with_mean")
 def plot_stacked_spectra_with_mean(
     spec_info,
     indices,
@@ -1250,6 +1511,10 @@ def plot_stacked_spectra_with_mean(
     ylim_top=None,
     ylim_bottom=None,
     group_name='group',
+    fast=False,
+    rasterized=False,
+    decimate=True,
+    loader=None,
 ):
     """
     Painel superior:
@@ -1266,30 +1531,34 @@ def plot_stacked_spectra_with_mean(
         Índices dos objetos a plotar
     mean_spec : dict
         Saída de compute_mean_spectrum()
+    fast : bool
+        Draw the individual spectra as a single LineCollection
+    rasterized : bool
+        Rasterize the individual spectra layer (only with fast=True)
+    decimate : bool
+        Reduce dense spectra to a min/max envelope per pixel column
+    loader : callable or None
+        Used instead of load_spectrum(), e.g. a PrefetchLoader
     """
 
-    import os
-    import numpy as np
-    import matplotlib.pyplot as plt
-    from matplotlib import cm
-
     if loader_kwargs is None:
         loader_kwargs = {}
 
+    if loader is None:
+        loader = load_spectrum
+
+    prefetch_indices(loader, spec_info, indices, base_path, loader_kwargs)
+
 
     n = len(indices)
 
     if color_mode == "qualitative":
 
-        cmap = cm.get_cmap("tab10")
-        colors = cmap.colors[:min(n, 10)]
-
-        if n > 10:
-            colors = cmap(np.linspace(0, 1, n))
+        colors = qualitative_colors(n)
 
     elif color_mode == "sequential":
 
-        cmap = cm.get_cmap(cmap_name)
+        cmap = colormaps[cmap_name]
         colors = cmap(np.linspace(0.05, 0.95, n))
 
     elif color_mode == "custom":
@@ -1320,12 +1589,13 @@ def plot_stacked_spectra_with_mean(
     # espectros individuais
     # -------------------------
     labels = []
+    curves = []
 
     for j, i in enumerate(indices):
 
         fname, z = spec_info[i]
 
-        spec = load_spectrum(
+        spec = loader(
             os.path.join(base_path, fname),
             z=z,
             **loader_kwargs
@@ -1333,16 +1603,38 @@ def plot_stacked_spectra_with_mean(
 
         y_offset = j * offset_step
 
-        ax_top.step(
-            spec["wave"],
-            spec["flux"] + y_offset,
+        if decimate:
+            wave, flux = decimate_spectrum(
+                spec,
+                xlim=xlim,
+                n_columns=axis_columns(ax_top),
+            )
+        else:
+            wave, flux = spec["wave"], spec["flux"]
+
+        if fast:
+            curves.append((wave, flux + y_offset))
+        else:
+            ax_top.step(
+                wave,
+                flux + y_offset,
+                where="mid",
+                lw=1.3,
+                color=colors[j]
+            )
+
+        labels.append(short_label_from_filename(fname))
+
+    if fast:
+        add_step_collection(
+            ax_top,
+            curves,
+            colors,
             where="mid",
             lw=1.3,
-            color=colors[j]
+            rasterized=rasterized,
         )
 
-        labels.append(short_label_from_filename(fname))
-
     # -------------------------
     # espectro médio
     # -------------------------
@@ -1454,6 +1746,8 @@ def plot_stacked_spectra_with_mean(
     if ylim_bottom is not None:
         ax_bot.set_ylim(*ylim_bottom)
 
-    fig.tight_layout()
+    with stage("tight_layout"):
+        fig.tight_layout()
+    count_artists(fig)
 
     return fig, (ax_top, ax_bot)
\ No newline at end of file
@@ -0,0 +1,239 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .spectrum import load_spectrum
+from .profiling import stage, count
+
+
+def _key(path, z, loader_kwargs):
+    return (
+        os.path.normpath(str(path)),
+        z,
+        tuple(sorted((k, repr(v)) for k, v in loader_kwargs.items())),
+    )
+
+
+class PrefetchLoader:
+    """
+    load_spectrum() replacement that loads spectra ahead in a thread pool.
+
+    Spectra are queued with submit() (or prefetch()) and handed out by
+    calling the loader like load_spectrum(); a spectrum that was never
+    submitted is loaded on the spot. Every plot function that accepts
+    spec_info takes it as loader=..., so FITS reading overlaps with
+    drawing and saving.
+
+    Example
+    -------
+    >>> with PrefetchLoader(workers=4) as loader:
+    ...     for start, fig in iter_spectrum_panels(spec_info, loader=loader,
+    ...                                            loader_kwargs=kw):
+    ...         fig.savefig(f"panel_{start // 8:02d}.pdf")
+
+    Parameters
+    ----------
+    workers : int
+        Loader threads
+    """
+
+    def __init__(self, workers=4):
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(workers)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, path, z=None, **loader_kwargs):
+        """
+        Start loading a spectrum in the background (same arguments as
+        load_spectrum()).
+        """
+
+        key = _key(path, z, loader_kwargs)
+
+        with self._lock:
+            if key not in self._futures:
+                self._futures[key] = self._pool.submit(
+                    load_spectrum, path, z=z, **loader_kwargs
+                )
+                count("spectra_prefetched")
+
+    def prefetch(self, spec_info, base_path="DeGraaff_espectros", loader_kwargs=None):
+        """
+        Submit a list of (filename, z).
+        """
+
+        if loader_kwargs is None:
+            loader_kwargs = {}
+
+        for fname, z in spec_info:
+            self.submit(os.path.join(base_path, str(fname)), z=z, **loader_kwargs)
+
+    def __call__(self, path, z=None, **loader_kwargs):
+        key = _key(path, z, loader_kwargs)
+
+        with self._lock:
+            future = self._futures.pop(key, None)
+
+        if future is None:
+            return load_spectrum(path, z=z, **loader_kwargs)
+
+        # tempo esperando o disco (0 quando o prefetch chegou antes)
+        with stage("prefetch_wait"):
+            return future.result()
+
+    @property
+    def pending(self):
+        with self._lock:
+            return sum(not f.done() for f in self._futures.values())
+
+    def close(self):
+        with self._lock:
+            for f in self._futures.values():
+                f.cancel()
+            self._futures.clear()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def prefetch_indices(loader, spec_info, indices, base_path, loader_kwargs):
+    """
+    Submit spec_info[indices] if loader supports prefetching (no-op for
+    load_spectrum itself).
+    """
+
+    if not hasattr(loader, "prefetch"):
+        return
+
+    loader.prefetch(
+        [spec_info[i] for i in indices],
+        base_path=base_path,
+        loader_kwargs=loader_kwargs,
+    )
+
+
+def iter_spectra(
+    spec_info,
+    base_path="DeGraaff_espectros",
+    loader_kwargs=None,
+    workers=4,
+    queue_depth=16,
+):
+    """
+    Load spectra in order while the next ones load in the background.
+
+    Parameters
+    ----------
+    spec_info : list of (filename, z)
+    queue_depth : int
+        Spectra loaded ahead of the one being consumed
+
+    Yields
+    ------
+    (filename, z, spectrum or Exception)
+    """
+
+    if loader_kwargs is None:
+        loader_kwargs = {}
+
+    spec_info = list(spec_info)
+
+    with PrefetchLoader(workers=workers) as loader:
+        loader.prefetch(spec_info[:queue_depth], base_path, loader_kwargs)
+
+        for j, (fname, z) in enumerate(spec_info):
+            if j + queue_depth < len(spec_info):
+                loader.prefetch(
+                    [spec_info[j + queue_depth]], base_path, loader_kwargs
+                )
+
+            try:
+                spec = loader(
+                    os.path.join(base_path, str(fname)), z=z, **loader_kwargs
+                )
+            except Exception as e:
+                spec = e
+
+            yield fname, z, spec
+
+
+def iter_spectrum_panels(
+    spec_info,
+    nrows=4,
+    ncols=2,
+    base_path="DeGraaff_espectros",
+    loader_kwargs=None,
+    loader=None,
+    workers=4,
+    queue_depth=1,
+    **panel_kwargs
+):
+    """
+    make_spectrum_panel() for every page of spec_info, loading the next
+    queue_depth pages while the current one is drawn and saved.
+
+    Example
+    -------
+    >>> for start, fig in iter_spectrum_panels(g1_zip_zsorted, loader_kwargs=kw):
+    ...     fig.savefig(f"Grupos/G1/plots/spectra_panel_g1_{start // 8:02d}.pdf")
+    ...     plt.close(fig)
+
+    Parameters
+    ----------
+    queue_depth : int
+        Pages loaded ahead of the one being drawn
+    loader : PrefetchLoader or None
+        Shared loader (a private one with `workers` threads otherwise)
+    panel_kwargs :
+        Passed to make_spectrum_panel()
+
+    Yields
+    ------
+    (start, Figure)
+    """
+
+    from .plot import make_spectrum_panel
+
+    if loader_kwargs is None:
+        loader_kwargs = {}
+
+    n_panel = nrows * ncols
+    starts = list(range(0, len(spec_info), n_panel))
+
+    own = loader is None
+    if own:
+        loader = PrefetchLoader(workers=workers)
+
+    def submit_page(k):
+        if k < len(starts):
+            s = starts[k]
+            loader.prefetch(spec_info[s:s + n_panel], base_path, loader_kwargs)
+
+    try:
+        for k in range(queue_depth + 1):
+            submit_page(k)
+
+        for k, start in enumerate(starts):
+            fig = make_spectrum_panel(
+                spec_info,
+                start=start,
+                nrows=nrows,
+                ncols=ncols,
+                base_path=base_path,
+                loader_kwargs=loader_kwargs,
+                loader=loader,
+                **panel_kwargs
+            )
+
+            # a página k+depth+1 carrega enquanto esta é salva
+            submit_page(k + queue_depth + 1)
+
+            yield start, fig
+    finally:
+        if own:
+            loader.close()
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+
+
+# active profiler (None → instrumentation disabled)
+_PROFILER = None
+
+_NULL_STAGE = nullcontext()
+
+
+class Profiler:
+    """
+    Collects stage timers and counters while profiling() is active.
+
+    Attributes
+    ----------
+    events : list of dict
+        One entry per finished stage (name, start, duration, thread)
+    counters : dict
+        Accumulated counters, e.g. {"files_opened": 8, "bytes_read": ...}
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.events = []
+        self.counters = {}
+        self.counter_events = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.events.append({
+                    "name": name,
+                    "start": start - self.t0,
+                    "duration": end - start,
+                    "thread": threading.get_ident(),
+                })
+
+    def count(self, name, value=1):
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self.counter_events.append(
+                (name, time.perf_counter() - self.t0, total)
+            )
+
+    def summary(self):
+        """
+        Total time and number of calls per stage.
+
+        Returns
+        -------
+        dict
+            {stage: {"calls": n, "total": seconds, "mean": seconds}}
+        """
+
+        stats = {}
+        for ev in self.events:
+            s = stats.setdefault(ev["name"], {"calls": 0, "total": 0.0})
+            s["calls"] += 1
+            s["total"] += ev["duration"]
+
+        for s in stats.values():
+            s["mean"] = s["total"] / s["calls"]
+
+        return stats
+
+    def report(self):
+        """
+        Human-readable table of stages and counters.
+        """
+
+        lines = [f"{'stage':<40} {'calls':>8} {'total [s]':>10} {'mean [ms]':>10}"]
+
+        stats = sorted(
+            self.summary().items(), key=lambda x: x[1]["total"], reverse=True
+        )
+        for name, s in stats:
+            lines.append(
+                f"{name:<40} {s['calls']:>8d} {s['total']:>10.4f} "
+                f"{1e3 * s['mean']:>10.3f}"
+            )
+
+        if self.counters:
+            lines.append("")
+            lines.append(f"{'counter':<40} {'value':>10}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name:<40} {value:>10}")
+
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """
+        Events in the Chrome trace format (chrome://tracing, Perfetto).
+        """
+
+        pid = os.getpid()
+
+        trace = [
+            {
+                "name": ev["name"],
+                "ph": "X",
+                "ts": 1e6 * ev["start"],
+                "dur": 1e6 * ev["duration"],
+                "pid": pid,
+                "tid": ev["thread"],
+            }
+            for ev in self.events
+        ]
+
+        trace += [
+            {
+                "name": name,
+                "ph": "C",
+                "ts": 1e6 * t,
+                "pid": pid,
+                "args": {name: total},
+            }
+            for name, t, total in self.counter_events
+        ]
+
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+@contextmanager
+def profiling(report=True, trace_path=None):
+    """
+    Enable the instrumentation of the functions package.
+
+    Example
+    -------
+    >>> with profiling(trace_path="trace.json") as prof:
+    ...     fig = make_spectrum_panel(spec_info, loader_kwargs=...)
+    >>> prof.summary()["tight_layout"]
+
+    Parameters
+    ----------
+    report : bool
+        Print the table of stages and counters on exit
+    trace_path : str or None
+        Write a Chrome-trace JSON file on exit
+
+    Yields
+    ------
+    Profiler
+    """
+
+    global _PROFILER
+
+    previous = _PROFILER
+    prof = Profiler()
+    _PROFILER = prof
+
+    try:
+        yield prof
+    finally:
+        _PROFILER = previous
+
+        if report:
+            print(prof.report())
+
+        if trace_path is not None:
+            prof.write_chrome_trace(trace_path)
+
+
+def is_enabled():
+    return _PROFILER is not None
+
+
+def stage(name):
+    """
+    Context manager timing a stage (no-op when profiling is disabled).
+    """
+
+    prof = _PROFILER
+    if prof is None:
+        return _NULL_STAGE
+
+    return prof.stage(name)
+
+
+def count(name, value=1):
+    """
+    Increment a counter (no-op when profiling is disabled).
+    """
+
+    prof = _PROFILER
+    if prof is not None:
+        prof.count(name, value)
+
+
+def timed(name=None):
+    """
+    Decorator timing every call of a function as a stage.
+    """
+
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            prof = _PROFILER
+            if prof is None:
+                return func(*args, **kwargs)
+
+            with prof.stage(stage_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count_artists(fig):
+    """
+    Count the artists of a figure into the 'artists_created' counter.
+    """
+
+    prof = _PROFILER
+    if prof is None:
+        return
+
+    n = 0
+    for ax in fig.axes:
+        n += len(ax.lines) + len(ax.collections) + len(ax.patches) + len(ax.texts)
+
+    prof.count("artists_created", n)
@@ -0,0 +1,481 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+
+
+# FWHM = sigma * 2 sqrt(2 ln 2)
+FWHM_TO_SIGMA = 1.0 / (2.0 * np.sqrt(2.0 * np.log(2.0)))
+
+# Approximate nominal resolving power R = lambda / FWHM of the NIRSpec
+# dispersers (JDox dispersion curves), as a function of the observed
+# wavelength in μm.
+RESOLUTION_CURVES = {
+    "prism": (
+        np.array([0.6, 0.8, 1.0, 1.2, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0, 5.5]),
+        np.array([85., 50., 35., 30., 33., 45., 60., 80., 105., 140., 185., 250., 320.]),
+    ),
+    "g140m": (
+        np.array([0.97, 1.89]),
+        np.array([700., 1340.]),
+    ),
+    "g235m": (
+        np.array([1.66, 3.17]),
+        np.array([700., 1340.]),
+    ),
+    "g395m": (
+        np.array([2.87, 5.27]),
+        np.array([700., 1340.]),
+    ),
+    "g140h": (
+        np.array([0.97, 1.89]),
+        np.array([1900., 3600.]),
+    ),
+    "g235h": (
+        np.array([1.66, 3.17]),
+        np.array([1900., 3600.]),
+    ),
+    "g395h": (
+        np.array([2.87, 5.27]),
+        np.array([1900., 3600.]),
+    ),
+}
+
+
+def resolving_power(disperser, wave_obs):
+    """
+    Nominal resolving power of a NIRSpec disperser.
+
+    Parameters
+    ----------
+    disperser : str
+        'prism', 'g235m', 'g395m', ... (case insensitive)
+    wave_obs : array_like
+        Observed-frame wavelength [μm]
+
+    Returns
+    -------
+    R : ndarray
+        lambda / FWHM at each wavelength (constant outside the table)
+    """
+
+    key = str(disperser).lower().split("-")[0].split("_")[0]
+
+    if key not in RESOLUTION_CURVES:
+        raise ValueError(
+            f"Unknown disperser {disperser!r}; "
+            f"choose from {sorted(RESOLUTION_CURVES)}"
+        )
+
+    wave_tab, r_tab = RESOLUTION_CURVES[key]
+
+    return np.interp(np.asarray(wave_obs, dtype=float), wave_tab, r_tab)
+
+
+def lsf_sigma(wave, r_target, r_source=None):
+    """
+    Gaussian sigma needed to degrade a spectrum to a target resolution.
+
+    Parameters
+    ----------
+    wave : array_like
+        Wavelength where the kernel is evaluated
+    r_target : float or array_like
+        Target resolving power at wave
+    r_source : float, array_like or None
+        Resolving power of the input spectrum at wave. If None the input
+        is treated as infinitely resolved.
+
+    Returns
+    -------
+    sigma : ndarray
+        Kernel sigma in the units of wave (0 where no smoothing is needed)
+    """
+
+    wave = np.asarray(wave, dtype=float)
+
+    inv2 = 1.0 / np.asarray(r_target, dtype=float) ** 2
+    if r_source is not None:
+        inv2 = inv2 - 1.0 / np.asarray(r_source, dtype=float) ** 2
+
+    return wave * np.sqrt(np.clip(inv2, 0.0, None)) * FWHM_TO_SIGMA
+
+
+def pixel_edges(wave):
+    """
+    Pixel edges from pixel centers (midpoints, extrapolated at the ends).
+    """
+
+    wave = np.asarray(wave, dtype=float)
+
+    mid = 0.5 * (wave[:-1] + wave[1:])
+    first = wave[0] - (mid[0] - wave[0])
+    last = wave[-1] + (wave[-1] - mid[-1])
+
+    return np.concatenate([[first], mid, [last]])
+
+
+def oversampling_factor(src_wave, dst_wave):
+    """
+    Number of dst_wave pixels per src_wave pixel, at every dst pixel.
+
+    A spectrum interpolated onto a finer grid repeats the noise of each
+    native pixel in about k neighbouring pixels; a sum over the grid
+    that treats them as independent underestimates its variance by k.
+
+    Returns
+    -------
+    k : ndarray (len(dst_wave),), at least 1
+    """
+
+    src_wave = np.asarray(src_wave, dtype=float)
+    dst_wave = np.asarray(dst_wave, dtype=float)
+
+    src_width = np.diff(pixel_edges(src_wave))
+    dst_width = np.diff(pixel_edges(dst_wave))
+
+    k = np.interp(dst_wave, src_wave, src_width) / dst_width
+    return np.clip(k, 1.0, None)
+
+
+def lsf_kernel_matrix(src_wave, dst_wave, sigma, n_sigma=4.0):
+    """
+    Sparse matrix applying a variable-width Gaussian kernel.
+
+    Row i holds the weights of the source pixels for the output pixel
+    at dst_wave[i], a Gaussian of width sigma[i] truncated at n_sigma
+    and normalized to unit sum. Kernels narrower than the source pixels
+    are widened to half a pixel, so the matrix also works as a smooth
+    resampler. Rows of output pixels outside [src_wave[0], src_wave[-1]]
+    are empty, so apply_kernel() returns NaN there.
+
+    Parameters
+    ----------
+    src_wave : array_like
+        Wavelength of the input pixels (sorted)
+    dst_wave : array_like
+        Wavelength of the output pixels (sorted)
+    sigma : float or array_like
+        Kernel sigma at each output pixel, in wavelength units
+    n_sigma : float
+        Truncation of the kernel
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix of shape (len(dst_wave), len(src_wave))
+    """
+
+    from scipy import sparse
+
+    src_wave = np.asarray(src_wave, dtype=float)
+    dst_wave = np.asarray(dst_wave, dtype=float)
+
+    dw_src = np.diff(pixel_edges(src_wave))
+
+    # largura mínima: meio pixel da grade de entrada
+    dw_local = np.interp(dst_wave, src_wave, dw_src)
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), dst_wave.shape)
+    sigma = np.maximum(sigma, 0.5 * dw_local)
+
+    lo = np.searchsorted(src_wave, dst_wave - n_sigma * sigma, side="left")
+    hi = np.searchsorted(src_wave, dst_wave + n_sigma * sigma, side="right")
+
+    # fora da cobertura da entrada: linha vazia (NaN em apply_kernel),
+    # como a interpolação, em vez de extrapolar a borda
+    outside = (dst_wave < src_wave[0]) | (dst_wave > src_wave[-1])
+    hi[outside] = lo[outside]
+
+    counts = hi - lo
+    rows = np.repeat(np.arange(len(dst_wave)), counts)
+
+    # column index of each non-zero element
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = np.repeat(lo, counts) + offsets
+
+    dx = (src_wave[cols] - dst_wave[rows]) / sigma[rows]
+    weights = np.exp(-0.5 * dx**2) * dw_src[cols]
+
+    kernel = sparse.csr_matrix(
+        (weights, (rows, cols)),
+        shape=(len(dst_wave), len(src_wave)),
+    )
+
+    norm = np.asarray(kernel.sum(axis=1)).ravel()
+    norm[norm == 0] = 1.0
+
+    return sparse.diags(1.0 / norm) @ kernel
+
+
+def apply_kernel(kernel, flux, err=None, min_weight=0.5):
+    """
+    Apply a kernel matrix to a spectrum, ignoring NaN pixels.
+
+    Parameters
+    ----------
+    kernel : sparse matrix
+        Output of lsf_kernel_matrix()
+    flux : array_like
+        Flux, shape (n_src,) or (n_spectra, n_src)
+    err : array_like or None
+        Error with the same shape as flux
+    min_weight : float
+        Output pixels where less than this fraction of the kernel falls
+        on valid pixels are set to NaN
+
+    Returns
+    -------
+    flux_out, err_out : ndarray
+        err_out is None if err is None
+    """
+
+    flux = np.asarray(flux, dtype=float)
+    good = np.isfinite(flux)
+
+    if err is not None:
+        err = np.asarray(err, dtype=float)
+        good &= np.isfinite(err)
+
+    # (n_src, n_spectra) layout for the sparse products
+    f = np.where(good, flux, 0.0).T
+    w = good.astype(float).T
+
+    weight = kernel @ w
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        flux_out = (kernel @ f) / weight
+
+        err_out = None
+        if err is not None:
+            e2 = np.where(good, err, 0.0).T ** 2
+            err_out = np.sqrt(kernel.power(2) @ e2) / weight
+
+    bad = weight < min_weight
+    flux_out[bad] = np.nan
+    if err_out is not None:
+        err_out[bad] = np.nan
+
+    if err_out is not None:
+        err_out = err_out.T
+
+    return flux_out.T, err_out
+
+
+def convolve_to_resolution(
+    wave,
+    flux,
+    err=None,
+    r_target=100.0,
+    r_source=None,
+    dst_wave=None,
+):
+    """
+    Degrade a spectrum to a target resolving power.
+
+    Parameters
+    ----------
+    wave, flux : array_like
+        Input spectrum
+    err : array_like or None
+    r_target : float or callable
+        Target resolving power; a callable is evaluated at dst_wave
+    r_source : float, callable or None
+        Resolving power of the input; a callable is evaluated at dst_wave
+    dst_wave : array_like or None
+        Output grid (default: same as wave)
+
+    Returns
+    -------
+    dst_wave, flux_out, err_out
+    """
+
+    wave = np.asarray(wave, dtype=float)
+    dst_wave = wave if dst_wave is None else np.asarray(dst_wave, dtype=float)
+
+    if callable(r_target):
+        r_target = r_target(dst_wave)
+    if callable(r_source):
+        r_source = r_source(dst_wave)
+
+    sigma = lsf_sigma(dst_wave, r_target, r_source)
+    kernel = lsf_kernel_matrix(wave, dst_wave, sigma)
+
+    flux_out, err_out = apply_kernel(kernel, flux, err)
+
+    return dst_wave, flux_out, err_out
+
+
+def rebin_spectrum(wave, flux, new_wave, err=None, min_coverage=0.5):
+    """
+    Flux-conserving rebinning onto a new wavelength grid.
+
+    Each output pixel is the average of the input flux density over its
+    edges, weighted by the overlap with each input pixel.
+
+    Parameters
+    ----------
+    wave, flux : array_like
+        Input spectrum
+    new_wave : array_like
+        Centers of the output pixels (sorted)
+    err : array_like or None
+    min_coverage : float
+        Minimum fraction of an output pixel covered by valid input
+        pixels; below it the output is NaN
+
+    Returns
+    -------
+    flux_new, err_new : ndarray
+        err_new is None if err is None
+    """
+
+    wave = np.asarray(wave, dtype=float)
+    flux = np.asarray(flux, dtype=float)
+    new_wave = np.asarray(new_wave, dtype=float)
+
+    edges = pixel_edges(wave)
+    new_edges = pixel_edges(new_wave)
+    dw = np.diff(edges)
+
+    good = np.isfinite(flux)
+    if err is not None:
+        err = np.asarray(err, dtype=float)
+        good &= np.isfinite(err)
+
+    # integrais acumuladas nas bordas de entrada
+    cum_f = np.concatenate([[0.0], np.cumsum(np.where(good, flux, 0.0) * dw)])
+    cum_w = np.concatenate([[0.0], np.cumsum(good * dw)])
+
+    f_new = np.diff(np.interp(new_edges, edges, cum_f))
+    w_new = np.diff(np.interp(new_edges, edges, cum_w))
+    width = np.diff(new_edges)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        flux_new = f_new / w_new
+
+        err_new = None
+        if err is not None:
+            cum_e = np.concatenate(
+                [[0.0], np.cumsum(np.where(good, err, 0.0) ** 2 * dw)]
+            )
+            e_new = np.diff(np.interp(new_edges, edges, cum_e))
+
+            # var = sum(err^2 * overlap^2) / w_new^2, with overlap ≈
+            # input pixel width (downsampling) or w_new (upsampling)
+            dw_local = np.interp(new_wave, wave, dw)
+            err_new = np.sqrt(e_new * np.minimum(dw_local, w_new)) / w_new
+
+    bad = w_new < min_coverage * width
+    flux_new[bad] = np.nan
+    if err_new is not None:
+        err_new[bad] = np.nan
+
+    return flux_new, err_new
+
+
+# kernel matrices, keyed by (source grid, target grid, sigma)
+_KERNEL_CACHE = OrderedDict()
+_KERNEL_CACHE_SIZE = 256
+
+
+def _array_digest(a):
+    a = np.ascontiguousarray(a, dtype=float)
+    return hashlib.sha1(a.tobytes()).hexdigest()
+
+
+def cached_lsf_kernel(src_wave, dst_wave, sigma, n_sigma=4.0):
+    """
+    lsf_kernel_matrix() with a cache per (source grid, target grid) pair.
+
+    Stacking the same spectra again (other clipping, min_contrib, ...)
+    reuses the kernel matrices instead of rebuilding them.
+    """
+
+    dst_wave = np.asarray(dst_wave, dtype=float)
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), dst_wave.shape)
+
+    key = (
+        _array_digest(src_wave),
+        _array_digest(dst_wave),
+        _array_digest(sigma),
+        n_sigma,
+    )
+
+    if key in _KERNEL_CACHE:
+        _KERNEL_CACHE.move_to_end(key)
+        return _KERNEL_CACHE[key]
+
+    kernel = lsf_kernel_matrix(src_wave, dst_wave, sigma, n_sigma=n_sigma)
+
+    _KERNEL_CACHE[key] = kernel
+
+    if len(_KERNEL_CACHE) > _KERNEL_CACHE_SIZE:
+        _KERNEL_CACHE.popitem(last=False)
+
+    return kernel
+
+
+def clear_kernel_cache():
+    """
+    Empty the cache used by cached_lsf_kernel().
+    """
+
+    _KERNEL_CACHE.clear()
+
+
+def spectrum_resolving_power(spectrum, wave=None):
+    """
+    Resolving power of a load_spectrum() output.
+
+    The disperser is taken from the msaexp filename (PRISM if it cannot
+    be parsed) and the curve is evaluated at the observed wavelength.
+
+    Parameters
+    ----------
+    spectrum : dict
+        Output of load_spectrum()
+    wave : array_like or None
+        Wavelengths (same frame as spectrum["wave"]); default spectrum["wave"]
+
+    Returns
+    -------
+    R : ndarray
+    """
+
+    from .merge import parse_spectrum_filename
+
+    if wave is None:
+        wave = spectrum["wave"]
+
+    info = parse_spectrum_filename(spectrum.get("file", ""))
+    disperser = "prism" if info is None else info["grating"]
+
+    z = spectrum.get("z")
+    if spectrum.get("restframe", z is not None) and z is not None:
+        wave_obs = np.asarray(wave) * (1.0 + z)
+    else:
+        wave_obs = np.asarray(wave)
+
+    return resolving_power(disperser, wave_obs)
+
+
+def match_resolution(wave, flux, err, dst_wave, r_target, r_source):
+    """
+    Convolve a spectrum to r_target and resample it onto dst_wave.
+
+    Parameters
+    ----------
+    wave, flux, err : array_like
+        Input spectrum (err may be None)
+    dst_wave : array_like
+        Output grid
+    r_target, r_source : float or array_like
+        Target and input resolving power at dst_wave
+
+    Returns
+    -------
+    flux_out, err_out : ndarray
+    """
+
+    sigma = lsf_sigma(dst_wave, r_target, r_source)
+    kernel = cached_lsf_kernel(wave, dst_wave, sigma)
+
+    return apply_kernel(kernel, flux, err)
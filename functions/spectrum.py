@@ -1,7 +1,10 @@
 import numpy as np
-from astropy.io import fits
-from scipy.signal import savgol_filter
 import warnings
+import os
+from .profiling import stage, count, timed, is_enabled
+from .resolution import match_resolution, spectrum_resolving_power, oversampling_factor
+from .storage import open_storage
+from .units import convert_flux, convert_wave, flux_kind
 
 def fnu_to_flambda(fnu, wave, wave_unit="um"):
     """
@@ -13,8 +16,8 @@ def fnu_to_flambda(fnu, wave, wave_unit="um"):
         Flux density per frequency [erg/s/cm^2/Hz]
     wave : array_like
         Wavelength
-    wave_unit : {'um', 'A'}
-        Unit of wavelength
+    wave_unit : {'um', 'nm', 'A', 'Hz'}
+        Unit of wavelength (see units.WAVE_UNITS)
 
     Returns
     -------
@@ -22,18 +25,7 @@ def fnu_to_flambda(fnu, wave, wave_unit="um"):
         Flux density per wavelength [erg/s/cm^2/Å]
     """
 
-    c = 2.998e10  # cm/s
-
-    wave = np.asarray(wave)
-
-    if wave_unit == "um":
-        lam_cm = wave * 1e-4
-    elif wave_unit == "A":
-        lam_cm = wave * 1e-8
-    else:
-        raise ValueError("wave_unit must be 'um' or 'A'")
-
-    return fnu * c / lam_cm**2 / 1e8
+    return convert_flux(fnu, wave, "cgs_fnu", "flambda", wave_unit=wave_unit)[0]
 
 def to_restframe(wave, flux, z, flux_type="flambda"):
     """
@@ -71,11 +63,20 @@ def read_spectrum_fits(
     fits_path,
     wave_col="wave",
     flux_col="flux",
-    err_col="err"
+    err_col="err",
+    storage=None,
 ):
     """
     Read wavelength and flux from a FITS spectrum.
 
+    Parameters
+    ----------
+    fits_path : str
+        Path, or member name when reading from a storage backend
+    storage : Storage, str or None
+        Folder, zip/tar archive or backend (see storage.open_storage());
+        members are parsed from memory, without extracting
+
     Returns
     -------
     wave : ndarray
@@ -83,14 +84,65 @@ def read_spectrum_fits(
     err : ndarray
     """
 
-    with fits.open(fits_path) as hdul:
-        data = hdul[1].data
-        wave = np.asarray(data[wave_col])
-        flux = np.asarray(data[flux_col])
-        err = np.asarray(data[err_col])
+    # astropy só quando um FITS é de fato lido (import lento)
+    from astropy.io import fits
+
+    if storage is not None:
+        storage = open_storage(storage)
+        source = storage.open(fits_path)
+    else:
+        source = fits_path
+
+    with stage("fits_io"):
+        with fits.open(source) as hdul:
+            data = hdul[1].data
+            wave = np.asarray(data[wave_col])
+            flux = np.asarray(data[flux_col])
+            err = np.asarray(data[err_col])
+
+    if is_enabled():
+        count("files_opened")
+        if storage is not None:
+            count("bytes_read", storage.size(fits_path))
+        elif isinstance(fits_path, (str, os.PathLike)):
+            count("bytes_read", os.path.getsize(fits_path))
 
     return wave, flux, err
 
+def window_slices(wave, windows):
+    """
+    Index ranges of wavelength windows in a sorted wavelength array.
+
+    Equivalent to the masks (wave >= wmin) & (wave <= wmax), but as
+    slices, so many windows cost one searchsorted call and no copies.
+
+    Parameters
+    ----------
+    wave : array_like
+        Sorted wavelength array
+    windows : tuple or list of tuples
+        (lambda_min, lambda_max) or a list of them
+
+    Returns
+    -------
+    slice or list of slices
+    """
+
+    wave = np.asarray(wave)
+    bounds = np.asarray(windows, dtype=float)
+
+    single = bounds.ndim == 1
+    bounds = np.atleast_2d(bounds)
+
+    lo = np.searchsorted(wave, bounds[:, 0], side="left")
+    hi = np.searchsorted(wave, bounds[:, 1], side="right")
+
+    slices = [slice(int(a), int(b)) for a, b in zip(lo, hi)]
+
+    return slices[0] if single else slices
+
+
+@timed("normalize_spectrum")
 def normalize_spectrum(
     wave,
     flux,
@@ -167,6 +219,7 @@ def normalize_spectrum(
 
 
 
+@timed("load_spectrum")
 def load_spectrum(
     fits_path,
     z=None,
@@ -177,27 +230,58 @@ def load_spectrum(
     norm_window=(0.3446,0.3646), #antes de 3646
     norm_statistic="median",
     output_flux_scale=None,
+    storage=None,
+    output_flux_unit="flambda",
+    columns=("wave", "flux", "err"),
 ):
     """
     Load a spectrum, convert units, optionally shift to rest frame
     and normalize.
-    """
 
-    wave, flux, err = read_spectrum_fits(fits_path)
+    input_flux_unit is any unit of units.FLUX_UNITS (Jy, mJy, uJy, nJy,
+    cgs F_nu / F_lambda, AB magnitudes) or a scaled one such as
+    "1e-20 flambda"; output_flux_unit must be linear (default: F_lambda
+    in erg/s/cm²/Å). columns are the (wave, flux, err) FITS columns;
+    wave_unit is that of the wave column (um, nm, A, cm or Hz), and the
+    returned wavelengths are always in μm.
 
-    # ---- Flux unit conversion ----
-    if input_flux_unit == "uJy":
-        fnu = flux * 1e-29
-        err_fnu = err * 1e-29
+    storage (folder, zip/tar archive or Storage backend) is passed to
+    read_spectrum_fits(); it can go in loader_kwargs of every function
+    that loads spectra.
 
-        flambda = fnu_to_flambda(fnu, wave, wave_unit)
-        err_flambda = fnu_to_flambda(err_fnu, wave, wave_unit)
+    Example
+    -------
+    >>> load_spectrum("Abell2744-QSO1_opt_1D.fits", z=7.04,
+    ...               input_flux_unit="1e-20 flambda",
+    ...               columns=("wave", "spec", "errs"))
+    """
 
-        flux = flambda
-        err = err_flambda
-        flux_type = "flambda"
-    else:
-        raise NotImplementedError("Only uJy implemented for now")
+    wave, flux, err = read_spectrum_fits(
+        fits_path, *columns, storage=storage
+    )
+
+    # ---- Flux unit conversion ----
+    flux_type = flux_kind(output_flux_unit)
+    if flux_type == "mag":
+        raise ValueError("output_flux_unit must be a linear flux unit")
+
+    # cópias (a tabela FITS pode ser big-endian / somente leitura)
+    flux, err = convert_flux(
+        flux,
+        wave,
+        input_flux_unit,
+        output_flux_unit,
+        wave_unit=wave_unit,
+        err=err,
+    )
+
+    # ---- Wavelength in μm (janelas, grades e linhas estão em μm) ----
+    if wave_unit != "um":
+        wave = convert_wave(wave, wave_unit, "um")
+
+        # frequências ficam em ordem decrescente
+        if len(wave) > 1 and wave[0] > wave[-1]:
+            wave, flux, err = wave[::-1], flux[::-1], err[::-1]
 
     # ---- Rest-frame correction ----
     if restframe and z is not None:
@@ -244,6 +328,7 @@ def load_spectrum(
         "err": err,
         "z": z,
         "file": fits_path,
+        "restframe": bool(restframe and z is not None),
         "normalized": normalized,
         "norm_window": norm_window if normalized else None,
         "norm_factor": norm_factor,
@@ -253,6 +338,7 @@ def load_spectrum(
         "output_flux_scale": output_flux_scale,
     }
 
+@timed("compute_error_stats")
 def compute_error_stats(
     wave,
     flux,
@@ -350,13 +436,54 @@ def compute_error_stats(
 
     return results
 
+def _apply_exclusions(flux_stack, err_stack, files, exclude):
+    """
+    Drop excluded spectra (or only their flagged pixels) from the
+    per-object arrays of compute_mean_spectrum().
+    """
+
+    # nomes comparados sem o diretório
+    names = [os.path.basename(str(f)) for f in files]
+
+    if isinstance(exclude, dict):
+        masks = {os.path.basename(str(f)): m for f, m in exclude.items()}
+        has_err = len(err_stack) == len(names)
+        if has_err:
+            err_stack = np.array(err_stack)
+
+        for i, name in enumerate(names):
+            m = masks.get(name)
+            if m is None:
+                continue
+            flux_stack[i, np.asarray(m, dtype=bool)] = np.nan
+            if has_err:
+                err_stack[i, np.asarray(m, dtype=bool)] = np.nan
+
+        count("pixels_excluded", int(sum(np.sum(m) for m in masks.values())))
+        return flux_stack, err_stack, files
+
+    drop = {os.path.basename(str(f)) for f in exclude}
+    keep = [i for i, name in enumerate(names) if name not in drop]
+
+    count("spectra_excluded", len(names) - len(keep))
+
+    if len(err_stack) == len(names):
+        err_stack = np.asarray(err_stack)[keep]
+
+    return flux_stack[keep], err_stack, [files[i] for i in keep]
+
+
+@timed("compute_mean_spectrum")
 def compute_mean_spectrum(
     spectra_list,
     wave_grid=None,
     n_clip_end=0,
     interp_kind="linear",
     return_error=True,
-    flux_min=None
+    flux_min=None,
+    target_resolution=None,
+    return_stack=False,
+    exclude=None,
 ):
     """
     Compute mean spectrum from a list of spectra.
@@ -364,7 +491,9 @@ def compute_mean_spectrum(
     Parameters
     ----------
     spectra_list : list of dict
-        Output of load_spectrum()
+        Output of load_spectrum(), or a cube.CubeSelection (stacked
+        straight from the cube when its grid is used and no clipping
+        or resolution matching is requested)
     wave_grid : array_like or None
         Common wavelength grid. If None, will be auto-generated.
     n_clip_end : int
@@ -374,6 +503,18 @@ def compute_mean_spectrum(
         ---- Later I can add other type if necessary 
     return_error : bool
         If True, compute error on the mean
+    target_resolution : float, array_like, callable or None
+        Resolving power to degrade every spectrum to before stacking
+        (float, values on wave_grid or function of wave_grid). Each
+        spectrum is convolved with a variable-width Gaussian from its
+        own disperser resolution (see resolution.match_resolution()),
+        so PRISM and grating spectra can be stacked together.
+    return_stack : bool
+        Also return the per-object spectra on the common grid
+    exclude : list or dict or None
+        Spectra left out, matched by file name (e.g. the outliers of
+        outliers.find_outliers()); a dict {file: bool array on
+        wave_grid} drops only the flagged pixels of those spectra
 
     Returns
     -------
@@ -384,8 +525,19 @@ def compute_mean_spectrum(
         err_mean (optional)
         n_contrib (number of spectra contributing per pixel)
         n_objects (number of spectra used)
+        flux_stack, err_stack, files (if return_stack)
     """
 
+    # seleção de um cubo: espectros já estão na grade do cubo
+    cube_stack = getattr(spectra_list, "stack", None)
+    if cube_stack is not None:
+        if wave_grid is None:
+            wave_grid = spectra_list.wave
+        elif not np.array_equal(wave_grid, spectra_list.wave):
+            cube_stack = None
+        if n_clip_end > 0 or target_resolution is not None:
+            cube_stack = None
+
     # -------------------------
     # 1. construir grade comum
     # -------------------------
@@ -406,60 +558,109 @@ def compute_mean_spectrum(
 
     wave_grid = np.asarray(wave_grid)
 
+    if callable(target_resolution):
+        target_resolution = target_resolution(wave_grid)
+
     # -------------------------
     # 2. interpolar espectros
     # -------------------------
     flux_stack = []
     err_stack = []
 
-    for spec in spectra_list:
-        wave = spec["wave"]
-        flux = spec["flux"]
-        err = spec["err"]
-
-        # cortar final ruidoso
-        if n_clip_end > 0:
-            wave = wave[:-n_clip_end]
-            flux = flux[:-n_clip_end]
-            if err is not None:
-                err = err[:-n_clip_end]
-
-        # interpolação
-        flux_interp = np.interp(
-            wave_grid,
-            wave,
-            flux,
-            left=np.nan,
-            right=np.nan
-        )
-
-        flux_stack.append(flux_interp)
-
-        if return_error and err is not None:
-            err_interp = np.interp(
+    if hasattr(spectra_list, "files"):
+        files = list(spectra_list.files)
+    else:
+        files = [s.get("file") for s in spectra_list]
+
+    if cube_stack is not None:
+        flux_stack, err_stack = cube_stack(return_error)
+        if err_stack is None:
+            err_stack = []
+        spectra_list = []
+
+    with stage("interpolate"):
+        for spec in spectra_list:
+            wave = spec["wave"]
+            flux = spec["flux"]
+            err = spec["err"]
+
+            # cortar final ruidoso
+            if n_clip_end > 0:
+                wave = wave[:-n_clip_end]
+                flux = flux[:-n_clip_end]
+                if err is not None:
+                    err = err[:-n_clip_end]
+
+            # convolução para a resolução alvo
+            if target_resolution is not None:
+                flux_interp, err_interp = match_resolution(
+                    wave,
+                    flux,
+                    err if return_error else None,
+                    wave_grid,
+                    target_resolution,
+                    spectrum_resolving_power(spec, wave_grid),
+                )
+
+                flux_stack.append(flux_interp)
+
+                if err_interp is not None:
+                    err_stack.append(err_interp)
+
+                continue
+
+            # interpolação
+            flux_interp = np.interp(
                 wave_grid,
                 wave,
-                err,
+                flux,
                 left=np.nan,
                 right=np.nan
             )
-            err_stack.append(err_interp)
+
+            flux_stack.append(flux_interp)
+
+            if return_error and err is not None:
+                err_interp = np.interp(
+                    wave_grid,
+                    wave,
+                    err,
+                    left=np.nan,
+                    right=np.nan
+                )
+                err_stack.append(err_interp)
+
+    count("pixels_interpolated", len(wave_grid) * len(flux_stack))
 
     flux_stack = np.array(flux_stack)
 
+    # -------------------------
+    # exclusões (outliers)
+    # -------------------------
+    if exclude:
+        flux_stack, err_stack, files = _apply_exclusions(
+            flux_stack, err_stack, files, exclude
+        )
+
     # -------------------------
     # limpeza de valores ruins
     # -------------------------
+    low = None
     if flux_min is not None:
-        flux_stack[flux_stack < flux_min] = np.nan
+        # uma só máscara para fluxo e erro
+        low = flux_stack < flux_min
+        flux_stack[low] = np.nan
 
     n_objects = flux_stack.shape[0]
 
     # -------------------------
     # 3. média ignorando NaN
     # -------------------------
-    flux_mean = np.nanmean(flux_stack, axis=0)
-    flux_std = np.nanstd(flux_stack, axis=0)
+    # pixels sem nenhum espectro ficam NaN (sem "Mean of empty slice")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        flux_mean = np.nanmean(flux_stack, axis=0)
+        flux_std = np.nanstd(flux_stack, axis=0)
 
     # quantos espectros contribuíram em cada pixel
     n_contrib = np.sum(~np.isnan(flux_stack), axis=0)
@@ -478,12 +679,109 @@ def compute_mean_spectrum(
     if return_error and len(err_stack) > 0:
         err_stack = np.array(err_stack)
 
-        if flux_min is not None:
-            err_stack[flux_stack < flux_min] = np.nan
+        if low is not None and err_stack.shape == low.shape:
+            err_stack[low] = np.nan
 
         # erro médio propagado (aproximação)
-        err_mean = np.sqrt(np.nanmean(err_stack**2, axis=0)) / np.sqrt(n_contrib)
+        with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            err_mean = np.sqrt(np.nanmean(err_stack**2, axis=0)) / np.sqrt(n_contrib)
 
         results["err_mean"] = err_mean
 
+    if return_stack:
+        results["flux_stack"] = flux_stack
+        results["err_stack"] = err_stack if len(err_stack) > 0 else None
+        results["files"] = files
+
     return results
+
+
+def spectra_on_grid(spectra_list, wave_grid=None, return_error=True):
+    """
+    Flux (and error) of a list of spectra as rows of a matrix on one grid.
+
+    Parameters
+    ----------
+    spectra_list : list of dict or cube.CubeSelection
+        load_spectrum() outputs (linearly interpolated, NaN outside
+        their coverage) or a cube selection (taken as is when wave_grid
+        is None or the cube grid)
+    wave_grid : array_like or None
+        Required for a list of spectra
+
+    Returns
+    -------
+    wave_grid, flux, err, files
+        flux and err are (n_spectra, n_pix); err is None if not
+        return_error
+    """
+
+    cube_stack = getattr(spectra_list, "stack", None)
+
+    if cube_stack is not None:
+        if wave_grid is None or np.array_equal(wave_grid, spectra_list.wave):
+            flux, err = cube_stack(return_error)
+            return np.asarray(spectra_list.wave), flux, err, list(spectra_list.files)
+
+    if wave_grid is None:
+        raise ValueError("wave_grid is required for a list of spectra")
+
+    wave_grid = np.asarray(wave_grid, dtype=float)
+    spectra_list = list(spectra_list)
+
+    flux = np.full((len(spectra_list), len(wave_grid)), np.nan)
+    err = np.full(flux.shape, np.nan) if return_error else None
+
+    with stage("interpolate"):
+        for i, spec in enumerate(spectra_list):
+            flux[i] = np.interp(wave_grid, spec["wave"], spec["flux"], left=np.nan, right=np.nan)
+            if return_error and spec.get("err") is not None:
+                err[i] = np.interp(wave_grid, spec["wave"], spec["err"], left=np.nan, right=np.nan)
+
+    count("pixels_interpolated", flux.size)
+
+    return wave_grid, flux, err, [s.get("file") for s in spectra_list]
+
+
+def oversampling_on_grid(spectra_list, wave_grid=None):
+    """
+    Grid pixels per native pixel of every spectrum, on the grid of
+    spectra_on_grid() (resolution.oversampling_factor()).
+
+    Errors of sums over interpolated pixels must be scaled by it: the
+    pixels of a finer grid share the noise of one native pixel.
+
+    Parameters
+    ----------
+    spectra_list : list of dict or cube.CubeSelection
+    wave_grid : array_like or None
+        As in spectra_on_grid()
+
+    Returns
+    -------
+    ndarray (n_spectra, n_pix), at least 1
+    """
+
+    cube_oversampling = getattr(spectra_list, "oversampling", None)
+
+    if cube_oversampling is not None:
+        k_cube = cube_oversampling()
+        if wave_grid is None or np.array_equal(wave_grid, spectra_list.wave):
+            return k_cube
+
+        # nativo → grade do cubo → wave_grid
+        wave_grid = np.asarray(wave_grid, dtype=float)
+        k_grid = oversampling_factor(spectra_list.wave, wave_grid)
+        return np.array([
+            np.interp(wave_grid, spectra_list.wave, k) * k_grid for k in k_cube
+        ]).reshape(len(k_cube), len(wave_grid))
+
+    if wave_grid is None:
+        raise ValueError("wave_grid is required for a list of spectra")
+
+    wave_grid = np.asarray(wave_grid, dtype=float)
+
+    return np.array([
+        oversampling_factor(spec["wave"], wave_grid) for spec in spectra_list
+    ]).reshape(len(spectra_list), len(wave_grid))
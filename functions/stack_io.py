@@ -0,0 +1,444 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from astropy.io import fits
+
+from .profiling import stage, timed
+
+
+FORMAT_VERSION = 1
+
+# arrays of the mean spectrum, in the order of compute_mean_spectrum()
+MEAN_KEYS = ("wave", "flux_mean", "flux_std", "err_mean", "n_contrib")
+STACK_KEYS = ("flux_stack", "err_stack")
+
+
+# -------------------------
+# helpers
+# -------------------------
+
+def _format(path):
+    ext = os.path.splitext(str(path).rstrip("/"))[1].lower()
+
+    if ext in (".fits", ".fit"):
+        return "fits"
+    elif ext in (".h5", ".hdf5"):
+        return "hdf5"
+    elif ext == ".zarr":
+        return "zarr"
+
+    raise ValueError(
+        f"Unknown format for {path} (use .fits, .h5/.hdf5 or .zarr)"
+    )
+
+
+def _jsonable(obj):
+    if isinstance(obj, dict):
+        return {str(k): _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if callable(obj):
+        return getattr(obj, "__name__", repr(obj))
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    return repr(obj)
+
+
+def _members(result, members):
+    """
+    Member list as (files, z); members can be filenames or (filename, z).
+    """
+
+    if members is None:
+        members = result.get("files")
+
+    if members is None:
+        return None, None
+
+    files = []
+    zs = []
+    for m in members:
+        if isinstance(m, (tuple, list)):
+            files.append(str(m[0]))
+            zs.append(float(m[1]) if m[1] is not None else np.nan)
+        else:
+            files.append(str(m))
+            zs.append(np.nan)
+
+    zs = np.array(zs)
+    if np.isnan(zs).all():
+        zs = None
+
+    return files, zs
+
+
+def _native(a):
+    # FITS guarda big-endian
+    a = np.asarray(a)
+    return a.astype(a.dtype.newbyteorder("="), copy=False)
+
+
+def _wave_slice(wave, wave_range):
+    if wave_range is None:
+        return slice(None)
+
+    i0, i1 = np.searchsorted(wave, wave_range[0], "left"), np.searchsorted(
+        wave, wave_range[1], "right"
+    )
+    return slice(int(i0), int(i1))
+
+
+def _metadata(result, group, params, files, zs):
+    return {
+        "format_version": FORMAT_VERSION,
+        "group": group,
+        "n_objects": int(result.get("n_objects", 0)),
+        "params": _jsonable(params or {}),
+        "files": files,
+        "z": None if zs is None else zs.tolist(),
+    }
+
+
+# -------------------------
+# FITS
+# -------------------------
+
+def _write_fits(path, arrays, stack, meta, chunk):
+    primary = fits.PrimaryHDU()
+    hdr = primary.header
+    hdr["FMTVER"] = (FORMAT_VERSION, "stack file format version")
+    hdr["GROUP"] = (str(meta["group"]) if meta["group"] is not None else "", "sample group")
+    hdr["NOBJ"] = (meta["n_objects"], "number of stacked spectra")
+    hdr["CHUNK"] = (chunk, "wavelength pixels per compressed tile")
+    hdr["PARAMS"] = json.dumps(meta["params"])
+
+    cols = []
+    for key in MEAN_KEYS:
+        if arrays.get(key) is None:
+            continue
+        a = np.asarray(arrays[key])
+        fmt = "K" if key == "n_contrib" else ("D" if a.dtype == np.float64 else "E")
+        cols.append(fits.Column(name=key.upper(), format=fmt, array=a))
+
+    hdus = [primary, fits.BinTableHDU.from_columns(cols, name="MEAN")]
+
+    if meta["files"] is not None:
+        mcols = [fits.Column(
+            name="FILE",
+            format=f"{max(len(f) for f in meta['files'])}A",
+            array=np.array(meta["files"]),
+        )]
+        if meta["z"] is not None:
+            mcols.append(fits.Column(name="Z", format="D", array=np.array(meta["z"])))
+        hdus.append(fits.BinTableHDU.from_columns(mcols, name="MEMBERS"))
+
+    for key in STACK_KEYS:
+        if stack.get(key) is None:
+            continue
+        a = np.asarray(stack[key])
+        # GZIP_2 sem quantização → compressão sem perdas
+        hdus.append(fits.CompImageHDU(
+            a,
+            name=key.upper(),
+            compression_type="GZIP_2",
+            quantize_level=0.0,
+            tile_shape=(a.shape[0], min(chunk, a.shape[1])),
+        ))
+
+    fits.HDUList(hdus).writeto(path, overwrite=True)
+
+
+def _read_fits(path, wave_range, stack, rows):
+    out = {}
+
+    with fits.open(path, memmap=True) as hdul:
+        hdr = hdul[0].header
+        mean = hdul["MEAN"].data
+
+        wave = _native(mean["WAVE"])
+        sl = _wave_slice(wave, wave_range)
+
+        for key in MEAN_KEYS:
+            if key.upper() in mean.columns.names:
+                out[key] = _native(mean[key.upper()][sl])
+
+        meta = {
+            "format_version": hdr.get("FMTVER"),
+            "group": hdr.get("GROUP") or None,
+            "n_objects": hdr.get("NOBJ"),
+            "params": json.loads(hdr.get("PARAMS", "{}")),
+            "files": None,
+            "z": None,
+        }
+
+        if "MEMBERS" in hdul:
+            members = hdul["MEMBERS"].data
+            meta["files"] = [str(f).strip() for f in members["FILE"]]
+            if "Z" in members.columns.names:
+                meta["z"] = np.array(members["Z"]).tolist()
+
+        if stack:
+            r = slice(None) if rows is None else rows
+            for key in STACK_KEYS:
+                if key.upper() in hdul:
+                    # só os tiles do intervalo de comprimento de onda
+                    out[key] = _native(hdul[key.upper()].section[:, sl])[r]
+
+    return out, meta
+
+
+# -------------------------
+# HDF5 / Zarr (optional)
+# -------------------------
+
+def _require(module, fmt):
+    try:
+        return __import__(module)
+    except ImportError as e:
+        raise ImportError(
+            f"Writing/reading {fmt} files requires {module} (pip install {module})"
+        ) from e
+
+
+def _write_hdf5(path, arrays, stack, meta, chunk):
+    h5py = _require("h5py", "HDF5")
+
+    with h5py.File(path, "w") as f:
+        f.attrs["meta"] = json.dumps(meta)
+
+        n_wave = len(arrays["wave"])
+        for key in MEAN_KEYS:
+            if arrays.get(key) is not None:
+                f.create_dataset(
+                    f"mean/{key}", data=np.asarray(arrays[key]),
+                    chunks=(min(chunk, n_wave),), compression="gzip",
+                )
+
+        for key in STACK_KEYS:
+            if stack.get(key) is not None:
+                a = np.asarray(stack[key])
+                f.create_dataset(
+                    f"stack/{key}", data=a,
+                    chunks=(a.shape[0], min(chunk, a.shape[1])),
+                    compression="gzip", shuffle=True,
+                )
+
+
+def _read_hdf5(path, wave_range, stack, rows):
+    h5py = _require("h5py", "HDF5")
+
+    out = {}
+
+    with h5py.File(path, "r") as f:
+        meta = json.loads(f.attrs["meta"])
+
+        sl = _wave_slice(f["mean/wave"][()], wave_range)
+
+        for key in MEAN_KEYS:
+            if f"mean/{key}" in f:
+                out[key] = f[f"mean/{key}"][sl]
+
+        if stack:
+            for key in STACK_KEYS:
+                if f"stack/{key}" in f:
+                    a = f[f"stack/{key}"][:, sl]
+                    out[key] = a if rows is None else a[rows]
+
+    return out, meta
+
+
+def _zarr_array(group, name, data, chunks):
+    if hasattr(group, "create_array"):
+        group.create_array(name, data=data, chunks=chunks)
+    else:
+        group.create_dataset(name, data=data, chunks=chunks)
+
+
+def _write_zarr(path, arrays, stack, meta, chunk):
+    zarr = _require("zarr", "Zarr")
+
+    root = zarr.open_group(str(path), mode="w")
+    root.attrs["meta"] = meta
+
+    n_wave = len(arrays["wave"])
+    mean = root.require_group("mean")
+    for key in MEAN_KEYS:
+        if arrays.get(key) is not None:
+            _zarr_array(mean, key, np.asarray(arrays[key]), (min(chunk, n_wave),))
+
+    grp = root.require_group("stack")
+    for key in STACK_KEYS:
+        if stack.get(key) is not None:
+            a = np.asarray(stack[key])
+            _zarr_array(grp, key, a, (a.shape[0], min(chunk, a.shape[1])))
+
+
+def _read_zarr(path, wave_range, stack, rows):
+    zarr = _require("zarr", "Zarr")
+
+    root = zarr.open_group(str(path), mode="r")
+    meta = dict(root.attrs["meta"])
+
+    sl = _wave_slice(root["mean"]["wave"][:], wave_range)
+
+    out = {}
+    for key in MEAN_KEYS:
+        if key in root["mean"]:
+            out[key] = root["mean"][key][sl]
+
+    if stack:
+        for key in STACK_KEYS:
+            if key in root["stack"]:
+                a = root["stack"][key][:, sl]
+                out[key] = a if rows is None else a[rows]
+
+    return out, meta
+
+
+_WRITERS = {"fits": _write_fits, "hdf5": _write_hdf5, "zarr": _write_zarr}
+_READERS = {"fits": _read_fits, "hdf5": _read_hdf5, "zarr": _read_zarr}
+
+
+# -------------------------
+# API
+# -------------------------
+
+@timed("stack_io.save")
+def save_mean_spectrum(
+    path,
+    result,
+    group=None,
+    params=None,
+    members=None,
+    stack=True,
+    chunk=256,
+):
+    """
+    Save a compute_mean_spectrum() result to a compressed binary file.
+
+    The format follows the extension: .fits (binary table for the mean,
+    tile-compressed images for the stacks; always available), .h5/.hdf5
+    (needs h5py) or .zarr (needs zarr). Stacks are chunked by wavelength
+    so a wavelength slice can be read without decompressing the rest.
+
+    Parameters
+    ----------
+    path : str
+    result : dict
+        Output of compute_mean_spectrum(); if computed with
+        return_stack=True the per-object spectra are saved too
+    group : str or None
+        e.g. "G4"
+    params : dict or None
+        Stacking parameters (n_clip_end, loader_kwargs...), stored as JSON
+    members : list or None
+        Filenames or (filename, z) of the stacked spectra
+        (default: result["files"])
+    stack : bool
+        Save flux_stack / err_stack if present
+    chunk : int
+        Wavelength pixels per chunk
+    """
+
+    fmt = _format(path)
+
+    files, zs = _members(result, members)
+    meta = _metadata(result, group, params, files, zs)
+
+    stacks = {k: result.get(k) for k in STACK_KEYS} if stack else {}
+
+    with stage(f"write_{fmt}"):
+        _WRITERS[fmt](path, result, stacks, meta, chunk)
+
+
+@timed("stack_io.load")
+def load_mean_spectrum(path, wave_range=None, stack=False, rows=None):
+    """
+    Read a file written by save_mean_spectrum().
+
+    Parameters
+    ----------
+    path : str
+    wave_range : tuple or None
+        (lambda_min, lambda_max): read only this wavelength slice
+    stack : bool
+        Also read the per-object spectra
+    rows : slice, array or None
+        Objects of the stack to keep
+
+    Returns
+    -------
+    dict with the arrays of compute_mean_spectrum() (plus flux_stack,
+    err_stack if stack=True) and:
+        n_objects, group, params, files, z
+    """
+
+    fmt = _format(path)
+
+    with stage(f"read_{fmt}"):
+        out, meta = _READERS[fmt](path, wave_range, stack, rows)
+
+    out["n_objects"] = meta["n_objects"]
+    out["group"] = meta["group"]
+    out["params"] = meta["params"]
+    out["files"] = meta["files"]
+    out["z"] = None if meta["z"] is None else np.array(meta["z"])
+
+    return out
+
+
+def convert_mean_spectra_csv(
+    folder="mean_spectra_csv",
+    output_folder=None,
+    fmt="fits",
+):
+    """
+    Convert the CSV mean spectra (wave, flux, std, n_contrib) of a folder.
+
+    G4_mean_spectrum.csv → G4_mean_spectrum.fits (group "G4")
+
+    Returns
+    -------
+    list of written paths
+    """
+
+    if output_folder is None:
+        output_folder = folder
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    written = []
+
+    for fname in sorted(os.listdir(folder)):
+        if not fname.endswith(".csv"):
+            continue
+
+        try:
+            df = pd.read_csv(os.path.join(folder, fname))
+        except Exception as e:
+            print(f"Skipping {fname} → {e}")
+            continue
+
+        result = {
+            "wave": df["wave"].to_numpy(),
+            "flux_mean": df["flux"].to_numpy(),
+            "flux_std": df["std"].to_numpy(),
+            "n_contrib": df["n_contrib"].to_numpy(),
+            "n_objects": int(df["n_contrib"].max()),
+        }
+        if "err" in df:
+            result["err_mean"] = df["err"].to_numpy()
+
+        root = os.path.splitext(fname)[0]
+        ext = {"fits": ".fits", "hdf5": ".h5", "zarr": ".zarr"}[fmt]
+        path = os.path.join(output_folder, root + ext)
+
+        save_mean_spectrum(path, result, group=root.split("_")[0])
+        written.append(path)
+
+    return written
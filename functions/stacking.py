@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+
+from .cube import SpectrumCube
+from .profiling import stage, count, timed
+
+
+def catalog_column(catalog, column):
+    """
+    Values of a catalog column; quantities stored as percentiles
+    (<column>_0 … _4) use the median, <column>_2.
+    """
+
+    if column in catalog:
+        return catalog[column]
+
+    if f"{column}_2" in catalog:
+        return catalog[f"{column}_2"]
+
+    raise KeyError(f"{column} (or {column}_2) is not a catalog column")
+
+
+def _bin_labels(values, bins):
+    """
+    Bin index of every object and the label/edges of every bin.
+
+    bins : None (one bin per distinct value), int (equal-count bins) or
+    array of edges
+    """
+
+    if bins is None:
+        cats = pd.Categorical(values)
+        ids = cats.codes.astype(np.int64)
+        ids[pd.isna(values)] = -1
+        labels = [str(c) for c in cats.categories]
+        edges = [None] * len(labels)
+        return ids, labels, edges
+
+    x = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+    finite = np.isfinite(x)
+
+    if np.isscalar(bins):
+        edges = np.nanpercentile(x[finite], np.linspace(0, 100, int(bins) + 1))
+    else:
+        edges = np.asarray(bins, dtype=float)
+
+    # intervalos [lo, hi), o último fechado
+    ids = np.searchsorted(edges, x, side="right") - 1
+    ids[x == edges[-1]] = len(edges) - 2
+    ids[~finite | (ids < 0) | (ids > len(edges) - 2)] = -1
+
+    pairs = list(zip(edges[:-1], edges[1:]))
+    labels = [f"[{lo:.4g}, {hi:.4g})" for lo, hi in pairs]
+    if labels:
+        lo, hi = pairs[-1]
+        labels[-1] = f"[{lo:.4g}, {hi:.4g}]"
+
+    return ids, labels, pairs
+
+
+@timed("stack_by")
+def stack_by(
+    cube,
+    catalog,
+    column,
+    bins=None,
+    where="normalized",
+    min_objects=1,
+    flux_min=None,
+    return_error=True,
+):
+    """
+    Mean spectra of every bin of a catalog quantity, in one pass.
+
+    The fluxes of all selected objects are gathered once from the cube
+    and sorted by bin; the per-bin sums, counts and squared deviations
+    are segment sums (np.add.reduceat) over the sorted rows, so the
+    cost hardly depends on the number of bins. Each stack matches
+    compute_mean_spectrum() on the cube rows of its members.
+
+    Example
+    -------
+    >>> cube = SpectrumCube("cube_restframe")
+    >>> cat = pd.read_csv("tabela_merged.csv")
+    >>> stacks = stack_by(cube, cat, "zspec", bins=[0, 4.5, 10])   # lowz/highz
+    >>> stacks = stack_by(cube, pd.read_csv("groups.csv"), "group")  # G1–G6
+    >>> stacks = stack_by(cube, cat, "logL_5100", bins=4)           # quartiles
+
+    Parameters
+    ----------
+    cube : SpectrumCube or str
+    catalog : DataFrame
+        Must have a "file" column matching the cube index
+    column : str
+        Binning quantity (percentile columns use the median _2)
+    bins : None, int or array_like
+        None: one stack per distinct value (e.g. group);
+        int: that many equal-count bins; array: bin edges
+    where : str or None
+        Query on the cube index selecting usable rows
+    min_objects : int
+        Bins with fewer members are left out
+    flux_min : float or None
+        Fluxes below it are ignored (as in compute_mean_spectrum())
+
+    Returns
+    -------
+    dict
+        {label: dict with wave, flux_mean, flux_std, err_mean, n_contrib,
+        n_objects, files, bin, column}
+    """
+
+    if isinstance(cube, str):
+        cube = SpectrumCube(cube)
+
+    # -------------------------
+    # objetos do catálogo presentes no cubo
+    # -------------------------
+    usable = set(cube.rows(where=where)) if where is not None else None
+
+    cube_rows = []
+    keep = []
+    for k, fname in enumerate(catalog["file"]):
+        try:
+            row = cube.row(fname)
+        except KeyError:
+            continue
+        if usable is not None and row not in usable:
+            continue
+        cube_rows.append(row)
+        keep.append(k)
+
+    values = catalog_column(catalog, column).iloc[keep]
+    ids, labels, edges = _bin_labels(values.reset_index(drop=True), bins)
+
+    cube_rows = np.asarray(cube_rows, dtype=np.int64)
+    valid = ids >= 0
+    cube_rows, ids = cube_rows[valid], ids[valid]
+
+    # -------------------------
+    # ordena por bin → segmentos contíguos
+    # -------------------------
+    order = np.argsort(ids, kind="stable")
+    cube_rows, ids = cube_rows[order], ids[order]
+
+    n_bins = len(labels)
+    sizes = np.bincount(ids, minlength=n_bins)
+    present = np.flatnonzero(sizes >= max(min_objects, 1))
+
+    in_present = np.isin(ids, present)
+    cube_rows = cube_rows[in_present]
+
+    seg_sizes = sizes[present]
+    seg_starts = np.concatenate([[0], np.cumsum(seg_sizes)[:-1]]).astype(np.int64)
+    seg_ids = np.repeat(np.arange(len(present)), seg_sizes)
+
+    count("stack_by_bins", len(present))
+
+    if len(present) == 0:
+        return {}
+
+    with stage("cube.gather"):
+        flux = np.asarray(cube.flux[cube_rows], dtype=float)
+        err = np.asarray(cube.err[cube_rows], dtype=float) if return_error else None
+
+    if flux_min is not None:
+        low = flux < flux_min
+        flux[low] = np.nan
+        if err is not None:
+            err[low] = np.nan
+
+    def seg(a):
+        return np.add.reduceat(a, seg_starts, axis=0)
+
+    with stage("stack_by.reduce"), np.errstate(invalid="ignore", divide="ignore"):
+        good = np.isfinite(flux)
+        n_contrib = seg(good.astype(np.int64))
+
+        flux_mean = seg(np.where(good, flux, 0.0)) / n_contrib
+
+        dev = np.where(good, flux - flux_mean[seg_ids], 0.0)
+        flux_std = np.sqrt(seg(dev * dev) / n_contrib)
+
+        if err is not None:
+            e_good = np.isfinite(err)
+            e2 = seg(np.where(e_good, err * err, 0.0))
+            n_err = seg(e_good.astype(np.int64))
+            err_mean = np.sqrt(e2 / n_err) / np.sqrt(n_contrib)
+
+    files = cube.index["file"].to_numpy()
+
+    stacks = {}
+    for j, b in enumerate(present):
+        members = cube_rows[seg_starts[j]:seg_starts[j] + seg_sizes[j]]
+
+        res = {
+            "wave": cube.wave,
+            "flux_mean": flux_mean[j],
+            "flux_std": flux_std[j],
+            "n_contrib": n_contrib[j],
+            "n_objects": int(sizes[b]),
+            "files": list(files[members]),
+            "rows": members,
+            "bin": edges[b],
+            "column": column,
+        }
+        if err is not None:
+            res["err_mean"] = err_mean[j]
+
+        stacks[labels[b]] = res
+
+    return stacks
+
+
+def stacks_table(stacks):
+    """
+    One line per stack (label, bin edges, number of members).
+    """
+
+    return pd.DataFrame([
+        {
+            "label": label,
+            "column": s["column"],
+            "bin_min": None if s["bin"] is None else s["bin"][0],
+            "bin_max": None if s["bin"] is None else s["bin"][1],
+            "n_objects": s["n_objects"],
+        }
+        for label, s in stacks.items()
+    ])
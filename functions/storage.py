@@ -0,0 +1,473 @@
+import io
+import os
+import json
+import zlib
+import struct
+import tarfile
+import zipfile
+import threading
+from collections import OrderedDict
+
+
+# -------------------------
+# leitura posicional (thread-safe)
+# -------------------------
+
+class _RandomAccessFile:
+    """
+    Read byte ranges of a file through one open handle.
+
+    Uses os.pread where available, so concurrent readers (e.g. a
+    prefetching thread pool) never race on the file position.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = open(path, "rb")
+        self._lock = threading.Lock()
+
+    def read(self, offset, size):
+        if hasattr(os, "pread"):
+            return os.pread(self._fh.fileno(), size, offset)
+
+        with self._lock:
+            self._fh.seek(offset)
+            return self._fh.read(size)
+
+    def close(self):
+        self._fh.close()
+
+
+def _archive_key(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+class Storage:
+    """
+    Base class of the spectrum storage backends.
+
+    A backend maps member names to bytes. Names are matched exactly or,
+    failing that, by basename, so os.path.join(base_path, fname) paths
+    built by the notebooks resolve inside archives too.
+    """
+
+    def names(self):
+        raise NotImplementedError
+
+    def read_bytes(self, name):
+        raise NotImplementedError
+
+    def size(self, name):
+        raise NotImplementedError
+
+    def open(self, name):
+        """
+        File-like object with the content of a member (no temp files).
+        """
+
+        return io.BytesIO(self.read_bytes(name))
+
+    def state(self, name):
+        """
+        Version of a member (JSON-friendly), which changes whenever its
+        content does; used to invalidate cached results.
+        """
+
+        raise NotImplementedError
+
+    def exists(self, name):
+        try:
+            self.resolve(name)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def resolve(self, name):
+        name = str(name).replace(os.sep, "/")
+
+        index = self._index()
+        if name in index:
+            return name
+
+        basenames = self._basenames()
+        base = os.path.basename(name)
+
+        if base not in basenames:
+            raise FileNotFoundError(f"{name} not found in {self}")
+
+        if basenames[base] is None:
+            matches = sorted(n for n in index if os.path.basename(n) == base)
+            raise FileNotFoundError(
+                f"{name} is ambiguous in {self}: {', '.join(matches)}"
+            )
+
+        return basenames[base]
+
+    def _index(self):
+        raise NotImplementedError
+
+    def _basenames(self):
+        # basenames de mais de um membro ficam ambíguos (None)
+        if getattr(self, "_by_basename", None) is None:
+            by_base = {}
+            for n in self._index():
+                base = os.path.basename(n)
+                by_base[base] = None if base in by_base else n
+            self._by_basename = by_base
+        return self._by_basename
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------
+# diretório
+# -------------------------
+
+class DirectoryStorage(Storage):
+    """
+    Plain folder (the default behaviour of read_spectrum_fits).
+    """
+
+    def __init__(self, root="."):
+        self.root = root
+        self._by_basename = None
+        self._files = None
+
+    def __repr__(self):
+        return f"DirectoryStorage({self.root!r})"
+
+    def _path(self, name):
+        path = os.path.join(self.root, name)
+        if os.path.isfile(path):
+            return path
+        return os.path.join(self.root, self.resolve(name))
+
+    def _index(self):
+        if self._files is None:
+            files = {}
+            for dirpath, _, filenames in os.walk(self.root):
+                for fname in filenames:
+                    rel = os.path.relpath(os.path.join(dirpath, fname), self.root)
+                    files[rel.replace(os.sep, "/")] = None
+            self._files = files
+        return self._files
+
+    def names(self):
+        return list(self._index())
+
+    def open(self, name):
+        return open(self._path(name), "rb")
+
+    def read_bytes(self, name):
+        with self.open(name) as f:
+            return f.read()
+
+    def size(self, name):
+        return os.path.getsize(self._path(name))
+
+    def state(self, name):
+        st = os.stat(self._path(name))
+        return [st.st_size, st.st_mtime_ns]
+
+
+# -------------------------
+# zip
+# -------------------------
+
+_ZIP_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+
+class ZipStorage(Storage):
+    """
+    Random access to the members of a zip archive.
+
+    The central directory is read once into {name: ZipInfo}; the data
+    offset of a member is taken from its local header on first access
+    and cached, so opening any member is one positional read (plus
+    inflate for deflated members).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._by_basename = None
+
+        with zipfile.ZipFile(path) as zf:
+            self._infos = {
+                info.filename: info
+                for info in zf.infolist()
+                if not info.is_dir()
+            }
+
+        self._data_offset = {}
+        self._raf = _RandomAccessFile(path)
+
+    def __repr__(self):
+        return f"ZipStorage({self.path!r})"
+
+    def _index(self):
+        return self._infos
+
+    def names(self):
+        return list(self._infos)
+
+    def size(self, name):
+        return self._infos[self.resolve(name)].file_size
+
+    def state(self, name):
+        info = self._infos[self.resolve(name)]
+        return [info.file_size, info.CRC]
+
+    def _offset(self, info):
+        offset = self._data_offset.get(info.filename)
+        if offset is None:
+            header = self._raf.read(info.header_offset, _ZIP_LOCAL_HEADER.size)
+            fields = _ZIP_LOCAL_HEADER.unpack(header)
+            n_name, n_extra = fields[-2], fields[-1]
+            offset = info.header_offset + _ZIP_LOCAL_HEADER.size + n_name + n_extra
+            self._data_offset[info.filename] = offset
+        return offset
+
+    def read_bytes(self, name):
+        info = self._infos[self.resolve(name)]
+        raw = self._raf.read(self._offset(info), info.compress_size)
+
+        if info.compress_type == zipfile.ZIP_STORED:
+            return raw
+        elif info.compress_type == zipfile.ZIP_DEFLATED:
+            return zlib.decompress(raw, -15)
+
+        # outros métodos (bzip2, lzma): deixa o zipfile cuidar
+        with zipfile.ZipFile(self.path) as zf:
+            return zf.read(info.filename)
+
+    def close(self):
+        self._raf.close()
+
+
+# -------------------------
+# tar
+# -------------------------
+
+class TarStorage(Storage):
+    """
+    Random access to the members of an uncompressed tar archive.
+
+    A tar has no central directory, so the archive is scanned once and
+    the {name: (data offset, size)} index is saved next to it
+    (<archive>.index.json); later sessions load the index and every
+    member is one positional read.
+    """
+
+    def __init__(self, path, index_path=None, write_index=True):
+        self.path = path
+        self.index_path = index_path or path + ".index.json"
+        self._by_basename = None
+
+        with open(path, "rb") as f:
+            magic = f.read(3)
+        if magic[:2] == b"\x1f\x8b" or magic == b"BZh" or magic[:2] == b"\xfd7":
+            raise ValueError(
+                f"{path} is compressed; random access needs an uncompressed tar"
+            )
+
+        self._members = self._load_index() or self._scan(write_index)
+        self._raf = _RandomAccessFile(path)
+
+    def __repr__(self):
+        return f"TarStorage({self.path!r})"
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return None
+
+        try:
+            with open(self.index_path) as f:
+                saved = json.load(f)
+        except Exception:
+            return None
+
+        if saved.get("archive") != _archive_key(self.path):
+            return None
+
+        return {k: tuple(v) for k, v in saved["members"].items()}
+
+    def _scan(self, write_index):
+        members = {}
+        with tarfile.open(self.path, "r:") as tf:
+            for ti in tf:
+                if ti.isfile():
+                    members[ti.name] = (ti.offset_data, ti.size)
+
+        if write_index:
+            try:
+                with open(self.index_path, "w") as f:
+                    json.dump(
+                        {"archive": _archive_key(self.path), "members": members}, f
+                    )
+            except OSError as e:
+                print(f"Skipping index {self.index_path} → {e}")
+
+        return members
+
+    def _index(self):
+        return self._members
+
+    def names(self):
+        return list(self._members)
+
+    def size(self, name):
+        return self._members[self.resolve(name)][1]
+
+    def state(self, name):
+        st = os.stat(self.path)
+        return [*self._members[self.resolve(name)], st.st_size, st.st_mtime_ns]
+
+    def read_bytes(self, name):
+        offset, size = self._members[self.resolve(name)]
+        return self._raf.read(offset, size)
+
+    def close(self):
+        self._raf.close()
+
+
+# -------------------------
+# object store (local stand-in)
+# -------------------------
+
+class ObjectStoreStorage(Storage):
+    """
+    Local stand-in of an object store (bucket/key → object).
+
+    Objects live in <root>/<bucket>/<key>; get() supports byte ranges
+    like an HTTP range request, so code written against it can be
+    pointed at a real store by replacing get() and list_keys().
+    """
+
+    def __init__(self, root, bucket):
+        self.root = root
+        self.bucket = bucket
+        self._by_basename = None
+        self._keys = None
+
+    def __repr__(self):
+        return f"ObjectStoreStorage({self.root!r}, {self.bucket!r})"
+
+    def _object_path(self, key):
+        return os.path.join(self.root, self.bucket, key)
+
+    def put(self, key, data):
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        self._keys = None
+        self._by_basename = None
+
+    def list_keys(self, prefix=""):
+        return [k for k in self._index() if k.startswith(prefix)]
+
+    def get(self, key, byte_range=None):
+        with open(self._object_path(self.resolve(key)), "rb") as f:
+            if byte_range is None:
+                return f.read()
+            start, end = byte_range
+            f.seek(start)
+            return f.read(end - start)
+
+    def _index(self):
+        if self._keys is None:
+            base = os.path.join(self.root, self.bucket)
+            keys = {}
+            for dirpath, _, filenames in os.walk(base):
+                for fname in filenames:
+                    rel = os.path.relpath(os.path.join(dirpath, fname), base)
+                    keys[rel.replace(os.sep, "/")] = None
+            self._keys = keys
+        return self._keys
+
+    def names(self):
+        return list(self._index())
+
+    def size(self, name):
+        return os.path.getsize(self._object_path(self.resolve(name)))
+
+    def state(self, name):
+        # mtime no lugar do ETag de um object store real
+        st = os.stat(self._object_path(self.resolve(name)))
+        return [st.st_size, st.st_mtime_ns]
+
+    def read_bytes(self, name):
+        return self.get(name)
+
+
+# -------------------------
+# fábrica
+# -------------------------
+
+# backends abertos, por (local, tamanho, mtime)
+_OPEN_STORAGES = OrderedDict()
+_OPEN_STORAGES_SIZE = 16
+
+
+def open_storage(location):
+    """
+    Storage backend for a folder or archive.
+
+    Backends are cached (up to 16) by location and size/mtime, so a
+    rewritten archive or a folder with files added or removed gets a
+    fresh index.
+
+    Parameters
+    ----------
+    location : str or Storage
+        Folder, .zip or .tar file (a Storage is returned as is)
+
+    Returns
+    -------
+    Storage
+    """
+
+    if isinstance(location, Storage):
+        return location
+
+    st = os.stat(location)
+    key = (os.path.abspath(location), st.st_size, st.st_mtime_ns)
+
+    storage = _OPEN_STORAGES.get(key)
+    if storage is not None:
+        _OPEN_STORAGES.move_to_end(key)
+        return storage
+
+    if os.path.isdir(location):
+        storage = DirectoryStorage(location)
+    elif zipfile.is_zipfile(location):
+        storage = ZipStorage(location)
+    elif location.endswith(".tar") or tarfile.is_tarfile(location):
+        storage = TarStorage(location)
+    else:
+        raise ValueError(f"{location} is not a folder, zip or tar archive")
+
+    _OPEN_STORAGES[key] = storage
+    if len(_OPEN_STORAGES) > _OPEN_STORAGES_SIZE:
+        # quem ainda usa o backend antigo o mantém vivo
+        _OPEN_STORAGES.popitem(last=False)
+
+    return storage
+
+
+def clear_storage_cache():
+    """
+    Close and forget the backends opened by open_storage().
+    """
+
+    while _OPEN_STORAGES:
+        _, storage = _OPEN_STORAGES.popitem()
+        storage.close()
@@ -0,0 +1,385 @@
+import os
+import numpy as np
+from astropy.io import fits
+
+from .resolution import resolving_power
+
+
+N_PRISM = 473
+N_GRATING = 1661
+
+# rest-frame wavelengths [μm]
+BALMER_LIMIT = 0.3646
+LYA = 0.121567
+
+# broad lines: (rest wavelength [μm], flux relative to Hα)
+BROAD_LINES = {
+    "Ha": (0.6563, 1.0),
+    "Hb": (0.48613, 0.25),
+    "Hg": (0.4340471, 0.12),
+}
+
+# narrow lines: (rest wavelength [μm], flux relative to [O III] 5007)
+NARROW_LINES = {
+    "OIII_5007": (0.5006843, 1.0),
+    "OIII_4959": (0.4958911, 0.33),
+    "OII": (0.3727, 0.3),
+    "NeIII": (0.386876, 0.2),
+}
+
+# default distributions of the model parameters:
+# scalar → fixed, (low, high) → uniform, callable(rng, n) → custom
+DEFAULT_PARAMS = {
+    "beta_uv": (-2.5, -1.5),          # F_lambda ∝ lambda^beta blueward of the turnover
+    "beta_opt": (0.5, 2.0),           # redward of the turnover
+    "turnover": (0.34, 0.40),         # V-shape turnover [μm, rest]
+    "balmer_break": (1.0, 3.0),       # flux ratio across the Balmer limit
+    "f5500": lambda rng, n: 10 ** rng.normal(-0.7, 0.4, n),   # μJy at 5500 Å rest
+    "ha_ew": lambda rng, n: 10 ** rng.normal(2.8, 0.3, n),    # rest EW of Hα [Å]
+    "fwhm_broad": (1500.0, 4500.0),   # km/s
+    "oiii_ratio": (0.0, 0.5),         # F([O III]) / F(Hα)
+    "snr": lambda rng, n: 10 ** rng.normal(1.0, 0.3, n),      # per pixel at 5500 Å
+}
+
+C_KMS = 2.998e5
+
+# rows generated at once inside generate_batch()
+_BLOCK = 1024
+
+
+def prism_wave_grid(n=N_PRISM, wmin=0.54, wmax=5.515):
+    """
+    PRISM-like observed grid [μm]: pixel size follows lambda / R(lambda).
+    """
+
+    fine = np.linspace(wmin, wmax, 20000)
+    u = np.concatenate([[0.0], np.cumsum(
+        resolving_power("prism", fine[1:]) / fine[1:] * np.diff(fine)
+    )])
+
+    return np.interp(np.linspace(0, u[-1], n), u, fine)
+
+
+def grating_wave_grid(n=N_GRATING, wmin=2.68, wmax=5.51):
+    """
+    G395M-like observed grid [μm] (linear).
+    """
+
+    return np.linspace(wmin, wmax, n)
+
+
+def draw_redshifts(rng, n, z_dist=("uniform", 3.0, 9.0)):
+    """
+    Draw redshifts.
+
+    Parameters
+    ----------
+    z_dist : tuple, array_like or callable
+        ('uniform', zmin, zmax), ('normal', mean, std),
+        ('lognormal', mean_log1pz, std_log1pz), an array to resample
+        from (e.g. the observed sample) or callable(rng, n)
+    """
+
+    if callable(z_dist):
+        return np.asarray(z_dist(rng, n), dtype=float)
+
+    if isinstance(z_dist, tuple) and isinstance(z_dist[0], str):
+        kind = z_dist[0]
+        if kind == "uniform":
+            return rng.uniform(z_dist[1], z_dist[2], n)
+        if kind == "normal":
+            return np.clip(rng.normal(z_dist[1], z_dist[2], n), 0.0, None)
+        if kind == "lognormal":
+            return np.exp(rng.normal(z_dist[1], z_dist[2], n)) - 1.0
+        raise ValueError(f"Unknown z distribution {kind!r}")
+
+    return rng.choice(np.asarray(z_dist, dtype=float), size=n, replace=True)
+
+
+def draw_params(rng, n, params=None):
+    """
+    Draw the model parameters of n spectra.
+
+    Returns
+    -------
+    dict of arrays of length n
+    """
+
+    spec = dict(DEFAULT_PARAMS)
+    if params is not None:
+        spec.update(params)
+
+    out = {}
+    for name, dist in spec.items():
+        if callable(dist):
+            out[name] = np.asarray(dist(rng, n), dtype=float)
+        elif isinstance(dist, tuple):
+            out[name] = rng.uniform(dist[0], dist[1], n)
+        else:
+            out[name] = np.full(n, float(dist))
+
+    return out
+
+
+def _add_gaussian(flam, wave, z, w0, fwhm_kms, line_flux, n_sigma=6.0):
+    """
+    flam += line_flux * unit-area Gaussian (rest frame), evaluated only
+    on the pixels within n_sigma of the line.
+    """
+
+    sigma_rest = w0 * np.asarray(fwhm_kms) / C_KMS / 2.3548
+    center = w0 * (1.0 + z)
+    sigma_obs = sigma_rest * (1.0 + z)
+
+    lo = np.searchsorted(wave, center - n_sigma * sigma_obs)
+    hi = np.searchsorted(wave, center + n_sigma * sigma_obs)
+
+    counts = hi - lo
+    rows = np.repeat(np.arange(len(z)), counts)
+    cols = np.repeat(lo, counts) + (
+        np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    )
+
+    x = (wave[cols] - center[rows]) / sigma_obs[rows]
+    amp = line_flux / (np.sqrt(2 * np.pi) * sigma_rest)
+
+    flam[rows, cols] += amp[rows] * np.exp(-0.5 * x * x)
+
+
+def model_spectra(wave, z, p):
+    """
+    Noise-free LRD-like spectra in μJy on an observed grid.
+
+    V-shaped F_lambda continuum with a Balmer break, IGM absorption
+    blueward of Lyα, broad Balmer lines and narrow forbidden lines.
+
+    Parameters
+    ----------
+    wave : array_like
+        Observed wavelength [μm], shape (n_pix,)
+    z : array_like
+        Redshifts, shape (n,)
+    p : dict
+        Output of draw_params()
+
+    Returns
+    -------
+    flux : ndarray, shape (n, n_pix) [μJy]
+    """
+
+    wave = np.asarray(wave, dtype=float)
+    z = np.asarray(z, dtype=float)
+
+    rest = wave[None, :] / (1.0 + z[:, None])
+
+    # ---- continuum (F_lambda, arbitrary units) ----
+    turn = p["turnover"][:, None]
+    beta = np.where(rest < turn, p["beta_uv"][:, None], p["beta_opt"][:, None])
+    flam = (rest / turn) ** beta
+
+    flam = np.where(rest < BALMER_LIMIT, flam / p["balmer_break"][:, None], flam)
+
+    # normalize at 5500 Å rest
+    ref = (0.55 / turn[:, 0]) ** p["beta_opt"]
+    flam = flam / ref[:, None]
+
+    # ---- lines (units of continuum F_lambda at 5500 Å × μm) ----
+    cont_ha = (0.6563 / turn[:, 0]) ** p["beta_opt"] / ref
+    ha_flux = p["ha_ew"] * 1e-4 * cont_ha
+
+    for w0, rel in BROAD_LINES.values():
+        _add_gaussian(flam, wave, z, w0, p["fwhm_broad"], rel * ha_flux)
+
+    fwhm_narrow = np.full(len(z), 300.0)
+    for w0, rel in NARROW_LINES.values():
+        amp = rel * p["oiii_ratio"] * ha_flux
+        _add_gaussian(flam, wave, z, w0, fwhm_narrow, amp)
+
+    # ---- IGM ----
+    flam[rest < LYA] = 0.0
+
+    # F_nu ∝ F_lambda lambda^2, scaled to f5500 [μJy]
+    fnu = flam * (rest / 0.55) ** 2
+
+    return fnu * p["f5500"][:, None]
+
+
+def add_noise(rng, flux, p, noise="gaussian"):
+    """
+    Add noise to model spectra.
+
+    Parameters
+    ----------
+    noise : {'gaussian', 'poisson', 'none'}
+        'gaussian': constant error per spectrum set by p['snr'] at 5500 Å;
+        'poisson': error grows with sqrt(flux) on top of that floor
+
+    Returns
+    -------
+    flux_noisy, err : ndarray
+    """
+
+    sigma0 = (p["f5500"] / p["snr"])[:, None]
+
+    if noise == "none":
+        return flux.copy(), np.broadcast_to(sigma0, flux.shape).copy()
+
+    if noise == "gaussian":
+        err = np.broadcast_to(sigma0, flux.shape).copy()
+    elif noise == "poisson":
+        err = sigma0 * np.sqrt(1.0 + np.abs(flux) / p["f5500"][:, None])
+    else:
+        raise ValueError("noise must be 'gaussian', 'poisson' or 'none'")
+
+    return flux + err * rng.standard_normal(flux.shape), err
+
+
+def generate_batch(
+    n,
+    kind="prism",
+    seed=42,
+    z_dist=("uniform", 3.0, 9.0),
+    params=None,
+    noise="gaussian",
+    wave=None,
+):
+    """
+    Generate a batch of synthetic spectra in memory.
+
+    Parameters
+    ----------
+    n : int
+        Number of spectra
+    kind : {'prism', 'grating'}
+        Observed wavelength grid (ignored if wave is given)
+    seed : int
+        Random seed (same seed → same batch)
+    z_dist :
+        See draw_redshifts()
+    params : dict or None
+        Overrides of DEFAULT_PARAMS
+    noise : {'gaussian', 'poisson', 'none'}
+
+    Returns
+    -------
+    dict with:
+        wave (n_pix,), flux (n, n_pix), err (n, n_pix) [μm, μJy]
+        z (n,), params (dict of arrays)
+    """
+
+    rng = np.random.default_rng(seed)
+
+    if wave is None:
+        wave = prism_wave_grid() if kind == "prism" else grating_wave_grid()
+
+    z = draw_redshifts(rng, n, z_dist)
+    p = draw_params(rng, n, params)
+
+    flux = np.empty((n, len(wave)))
+    err = np.empty((n, len(wave)))
+
+    # blocos pequenos: os temporários cabem no cache
+    for i in range(0, n, _BLOCK):
+        sl = slice(i, i + _BLOCK)
+        p_block = {k: v[sl] for k, v in p.items()}
+
+        model = model_spectra(wave, z[sl], p_block)
+        flux[sl], err[sl] = add_noise(rng, model, p_block, noise=noise)
+
+    return {
+        "wave": np.asarray(wave, dtype=float),
+        "flux": flux,
+        "err": err,
+        "z": z,
+        "params": p,
+        "kind": kind,
+    }
+
+
+def iter_batches(n, chunk_size=10000, seed=42, **batch_kwargs):
+    """
+    Generate n spectra in chunks (bounded memory).
+
+    Chunk i uses the seed (seed, i), so the output is reproducible for a
+    given chunk_size.
+    """
+
+    for i, start in enumerate(range(0, n, chunk_size)):
+        size = min(chunk_size, n - start)
+        yield start, generate_batch(size, seed=(seed, i), **batch_kwargs)
+
+
+def _fits_template(n_pix):
+    """
+    Header bytes of a spectrum file (primary + SPEC1D table).
+    """
+
+    table = fits.BinTableHDU.from_columns([
+        fits.Column(name="wave", format="D", unit="um", array=np.zeros(n_pix)),
+        fits.Column(name="flux", format="D", unit="uJy", array=np.zeros(n_pix)),
+        fits.Column(name="err", format="D", unit="uJy", array=np.zeros(n_pix)),
+    ], name="SPEC1D")
+
+    primary = fits.PrimaryHDU()
+    primary.header["ORIGIN"] = "functions.synthetic"
+
+    return primary.header.tostring().encode() + table.header.tostring().encode()
+
+
+def write_batch_fits(folder, batch, start=0, pid="0000", root="synth"):
+    """
+    Write a batch to one FITS file per spectrum.
+
+    The files follow the msaexp naming and the layout read by
+    read_spectrum_fits() (wave/flux/err columns in HDU 1). The headers
+    are built once and the table bytes are written directly, so writing
+    is limited by the file system, not by astropy.
+
+    Returns
+    -------
+    spec_info : list of (filename, z)
+    """
+
+    os.makedirs(folder, exist_ok=True)
+
+    wave = batch["wave"]
+    n_pix = len(wave)
+    tag = "prism-clear" if batch.get("kind", "prism") == "prism" else "g395m-f290lp"
+
+    header = _fits_template(n_pix)
+    n_data = 3 * 8 * n_pix
+    padding = b"\0" * ((-n_data) % 2880)
+
+    rows = np.empty((n_pix, 3), dtype=">f8")
+    rows[:, 0] = wave
+
+    spec_info = []
+    for i in range(len(batch["z"])):
+        rows[:, 1] = batch["flux"][i]
+        rows[:, 2] = batch["err"][i]
+
+        fname = f"{root}-v4_{tag}_{pid}_{start + i}.spec.fits"
+        with open(os.path.join(folder, fname), "wb") as f:
+            f.write(header)
+            f.write(rows.tobytes())
+            f.write(padding)
+
+        spec_info.append((fname, float(batch["z"][i])))
+
+    return spec_info
+
+
+def write_synthetic_sample(folder, n, chunk_size=10000, seed=42, **batch_kwargs):
+    """
+    Generate and write n synthetic spectra to folder.
+
+    Returns
+    -------
+    spec_info : list of (filename, z)
+    """
+
+    spec_info = []
+    for start, batch in iter_batches(n, chunk_size=chunk_size, seed=seed, **batch_kwargs):
+        spec_info += write_batch_fits(folder, batch, start=start)
+
+    return spec_info
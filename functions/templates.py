@@ -0,0 +1,376 @@
+import hashlib
+import itertools
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+
+from .spectrum import window_slices, spectra_on_grid, oversampling_on_grid
+from .profiling import stage, count, timed
+
+
+# -------------------------
+# matriz de templates
+# -------------------------
+
+# matrizes por (templates, grade)
+_TEMPLATE_CACHE = OrderedDict()
+_TEMPLATE_CACHE_SIZE = 16
+
+
+def _digest(*arrays):
+    h = hashlib.sha1()
+    for a in arrays:
+        h.update(np.ascontiguousarray(a, dtype=float).tobytes())
+    return h.hexdigest()
+
+
+def _template_arrays(template):
+    """
+    (wave, flux) of a compute_mean_spectrum() / stack_by() result or of
+    a (wave, flux) pair.
+    """
+
+    if isinstance(template, dict):
+        return np.asarray(template["wave"], dtype=float), np.asarray(template["flux_mean"], dtype=float)
+
+    wave, flux = template
+    return np.asarray(wave, dtype=float), np.asarray(flux, dtype=float)
+
+
+def template_matrix(templates, wave_grid):
+    """
+    Templates interpolated onto a common grid, as columns of a matrix.
+
+    The matrix is built once per (templates, grid) pair and cached.
+
+    Parameters
+    ----------
+    templates : dict
+        {label: mean spectrum (dict with wave, flux_mean) or (wave, flux)},
+        e.g. the G1–G6 stacks of stack_by()
+    wave_grid : array_like
+
+    Returns
+    -------
+    T : ndarray (n_pix, n_templates), read-only
+        NaN outside the coverage of a template
+    """
+
+    wave_grid = np.asarray(wave_grid, dtype=float)
+    arrays = [_template_arrays(t) for t in templates.values()]
+
+    key = (
+        tuple(templates),
+        _digest(*[a for pair in arrays for a in pair]),
+        _digest(wave_grid),
+    )
+
+    if key in _TEMPLATE_CACHE:
+        _TEMPLATE_CACHE.move_to_end(key)
+        return _TEMPLATE_CACHE[key]
+
+    T = np.empty((len(wave_grid), len(arrays)))
+    for j, (wave, flux) in enumerate(arrays):
+        if np.array_equal(wave, wave_grid):
+            T[:, j] = flux
+        else:
+            good = np.isfinite(flux)
+            T[:, j] = np.interp(wave_grid, wave[good], flux[good], left=np.nan, right=np.nan)
+
+    T.flags.writeable = False
+
+    _TEMPLATE_CACHE[key] = T
+    if len(_TEMPLATE_CACHE) > _TEMPLATE_CACHE_SIZE:
+        _TEMPLATE_CACHE.popitem(last=False)
+
+    count("template_matrices")
+
+    return T
+
+
+def clear_template_cache():
+    """
+    Empty the cache used by template_matrix().
+    """
+
+    _TEMPLATE_CACHE.clear()
+
+
+# -------------------------
+# ajuste em lote
+# -------------------------
+
+def _solve_subsets(G, b, nonneg, max_enumerate):
+    """
+    Coefficients minimizing c·G·c - 2 c·b for every spectrum.
+
+    With nonneg=True and few templates the exact NNLS solution is found
+    by solving the normal equations of every support (subset of
+    templates) for all spectra at once and keeping, per spectrum, the
+    best solution with no negative coefficient.
+    """
+
+    n_spec, k, _ = G.shape
+
+    if not nonneg:
+        return (np.linalg.pinv(G) @ b[:, :, None])[:, :, 0]
+
+    if k > max_enumerate:
+        return None
+
+    coef = np.zeros((n_spec, k))
+    best = np.zeros(n_spec)          # suporte vazio: c = 0, Δχ² = 0
+
+    for size in range(1, k + 1):
+        for support in itertools.combinations(range(k), size):
+            s = list(support)
+
+            Gs = G[:, s][:, :, s]
+            bs = b[:, s]
+
+            cs = (np.linalg.pinv(Gs) @ bs[:, :, None])[:, :, 0]
+
+            # χ² - χ²(c=0) = c·G·c - 2 c·b = -c·b no ótimo do suporte
+            gain = -np.einsum("si,si->s", cs, bs)
+
+            better = np.all(cs >= 0, axis=1) & (gain < best)
+            if better.any():
+                best[better] = gain[better]
+                coef[better] = 0.0
+                coef[np.ix_(better, s)] = cs[better]
+
+    count("nnls_supports", 2**k - 1)
+
+    return coef
+
+
+def _nnls_loop(A_w, y_w, valid):
+    """
+    scipy.optimize.nnls spectrum by spectrum (many templates).
+    """
+
+    from scipy.optimize import nnls
+
+    n_spec = y_w.shape[0]
+    coef = np.zeros((n_spec, A_w.shape[-1]))
+
+    for i in range(n_spec):
+        v = valid[i]
+        if v.sum() == 0:
+            continue
+        coef[i], _ = nnls(A_w[i][v], y_w[i][v])
+
+    return coef
+
+
+@timed("fit_templates")
+def fit_templates(
+    flux,
+    err,
+    T,
+    mask=None,
+    nonneg=True,
+    weighted=True,
+    max_enumerate=10,
+    oversampling=None,
+):
+    """
+    Fit every spectrum as a linear combination of templates, in one call.
+
+    The weighted normal equations of all spectra are built with two
+    matrix products, G = Tᵀ W T (n_spec, k, k) and b = Tᵀ W f, and
+    solved together: unconstrained with a batched pseudo-inverse, or
+    non-negative by enumerating the template supports (exact NNLS for
+    up to max_enumerate templates; above that scipy's nnls is called
+    per spectrum).
+
+    Parameters
+    ----------
+    flux, err : ndarray (n_spec, n_pix)
+        Spectra on the grid of T (err may be None if weighted=False)
+    T : ndarray (n_pix, n_templates)
+        template_matrix()
+    mask : ndarray of bool or None
+        (n_pix,) or (n_spec, n_pix); False excludes a pixel
+    nonneg : bool
+        Non-negative coefficients (NNLS)
+    weighted : bool
+        Weight pixels by 1/err²
+    oversampling : ndarray or None
+        (n_pix,) or (n_spec, n_pix) grid pixels per native pixel
+        (spectrum.oversampling_on_grid()). Interpolated pixels are not
+        independent: each pixel weight is divided by it, so χ² and the
+        degrees of freedom count native pixels. None: independent pixels
+
+    Returns
+    -------
+    dict with
+        coef (n_spec, k), chi2, dof, n_pix (used pixels), n_eff
+        (independent pixels among them), model and residuals (n_spec,
+        n_pix; NaN on excluded pixels), fractions (share of the model
+        flux of each template)
+    """
+
+    flux = np.atleast_2d(np.asarray(flux, dtype=float))
+    T = np.asarray(T, dtype=float)
+
+    n_spec, n_pix = flux.shape
+    k = T.shape[1]
+
+    # -------------------------
+    # pixels usados e pesos
+    # -------------------------
+    valid = np.isfinite(flux) & np.all(np.isfinite(T), axis=1)[None, :]
+
+    if mask is not None:
+        valid &= np.broadcast_to(np.asarray(mask, dtype=bool), flux.shape)
+
+    if weighted:
+        err = np.atleast_2d(np.asarray(err, dtype=float))
+        valid &= np.isfinite(err) & (err > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            w = np.where(valid, 1.0 / err**2, 0.0)
+    else:
+        w = valid.astype(float)
+
+    if oversampling is None:
+        inv_k = np.ones(flux.shape)
+    else:
+        inv_k = 1.0 / np.broadcast_to(np.asarray(oversampling, dtype=float), flux.shape)
+    w = w * inv_k
+
+    f0 = np.where(valid, flux, 0.0)
+    T0 = np.where(np.isfinite(T), T, 0.0)
+
+    # -------------------------
+    # equações normais de todos os espectros
+    # -------------------------
+    with stage("templates.normal_equations"):
+        wT = w[:, :, None] * T0[None, :, :]          # (n_spec, n_pix, k)
+        G = np.matmul(wT.transpose(0, 2, 1), T0)      # (n_spec, k, k)
+        b = (w * f0) @ T0                             # (n_spec, k)
+        ff = np.einsum("sp,sp->s", w, f0 * f0)
+
+    with stage("templates.solve"):
+        coef = _solve_subsets(G, b, nonneg, max_enumerate)
+
+        if coef is None:
+            sw = np.sqrt(w)
+            coef = _nnls_loop(sw[:, :, None] * T0[None, :, :], sw * f0, valid)
+
+    chi2 = ff - 2 * np.einsum("si,si->s", coef, b) + np.einsum("si,sij,sj->s", coef, G, coef)
+    chi2 = np.clip(chi2, 0, None)
+
+    n_used = valid.sum(axis=1)
+    n_eff = np.sum(np.where(valid, inv_k, 0.0), axis=1)
+    n_free = np.count_nonzero(coef, axis=1) if nonneg else np.full(n_spec, k)
+
+    model = coef @ T.T
+    residuals = np.where(valid, flux - model, np.nan)
+
+    # fração do fluxo do modelo vinda de cada template
+    contrib = coef * (valid.astype(float) @ T0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fractions = contrib / contrib.sum(axis=1, keepdims=True)
+
+    count("spectra_decomposed", n_spec)
+
+    return {
+        "coef": coef,
+        "chi2": chi2,
+        "dof": n_eff - n_free,
+        "n_pix": n_used,
+        "n_eff": n_eff,
+        "model": model,
+        "residuals": residuals,
+        "fractions": fractions,
+    }
+
+
+@timed("decompose_spectra")
+def decompose_spectra(
+    spectra,
+    templates,
+    wave_grid=None,
+    exclude=None,
+    nonneg=True,
+    weighted=True,
+):
+    """
+    Decompose every spectrum of a sample onto a set of mean spectra
+    (e.g. the G1–G6 stacks), to quantify how pure its group membership is.
+
+    Example
+    -------
+    >>> stacks = stack_by(cube, pd.read_csv("groups.csv"), "group")
+    >>> res = decompose_spectra(cube.select(where="normalized"), stacks)
+    >>> decomposition_table(res)
+
+    Parameters
+    ----------
+    spectra : list of dict or CubeSelection
+        load_spectrum() outputs (interpolated onto wave_grid) or a cube
+        selection (used on the cube grid directly)
+    templates : dict
+        {label: mean spectrum}, see template_matrix()
+    wave_grid : array_like or None
+        Default: the cube grid, or the grid of the first template
+    exclude : list of (wmin, wmax) or None
+        Windows left out of the fit (e.g. emission lines)
+
+    Returns
+    -------
+    dict
+        fit_templates() output plus wave, labels and files
+    """
+
+    if wave_grid is None and getattr(spectra, "stack", None) is None:
+        wave_grid = _template_arrays(next(iter(templates.values())))[0]
+
+    wave_grid, flux, err, files = spectra_on_grid(spectra, wave_grid, return_error=weighted)
+
+    mask = None
+    if exclude:
+        mask = np.ones(len(wave_grid), dtype=bool)
+        for sl in window_slices(wave_grid, list(exclude)):
+            mask[sl] = False
+
+    T = template_matrix(templates, wave_grid)
+    oversampling = oversampling_on_grid(spectra, wave_grid)
+
+    result = fit_templates(
+        flux, err, T, mask=mask, nonneg=nonneg, weighted=weighted,
+        oversampling=oversampling,
+    )
+    result.update(wave=wave_grid, labels=list(templates), files=files)
+
+    return result
+
+
+def decomposition_table(result):
+    """
+    One line per spectrum: coefficients, model-flux fractions, χ² and
+    the dominant template with its fraction (purity).
+    """
+
+    labels = result["labels"]
+
+    table = {"file": result["files"]}
+    for j, label in enumerate(labels):
+        table[f"coef_{label}"] = result["coef"][:, j]
+    for j, label in enumerate(labels):
+        table[f"frac_{label}"] = result["fractions"][:, j]
+
+    table["chi2"] = result["chi2"]
+    table["dof"] = result["dof"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table["chi2_red"] = result["chi2"] / result["dof"]
+
+    frac = np.where(np.isfinite(result["fractions"]), result["fractions"], -np.inf)
+    best = np.argmax(frac, axis=1)
+    has_fit = np.isfinite(result["fractions"]).any(axis=1)
+
+    table["best"] = [labels[j] if ok else None for j, ok in zip(best, has_fit)]
+    table["purity"] = np.where(has_fit, frac.max(axis=1), np.nan)
+
+    return pd.DataFrame(table)
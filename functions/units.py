@@ -0,0 +1,345 @@
+import re
+import numpy as np
+
+
+# mesmo valor de fnu_to_flambda() (mantém os fatores de normalização)
+C_CGS = 2.998e10                 # cm/s
+C_ANGSTROM = C_CGS * 1e8         # Å/s
+
+AB_ZEROPOINT = 48.6              # m_AB = -2.5 log10(F_nu [cgs]) - 48.6
+
+_POGSON = 2.5 / np.log(10.0)
+
+# wavelength units → Å
+WAVE_UNITS = {
+    "A": 1.0,
+    "nm": 10.0,
+    "um": 1e4,
+    "cm": 1e8,
+    "Hz": None,                  # frequência (recíproco)
+}
+
+# flux units → (kind, factor to cgs)
+#   fnu     : erg/s/cm²/Hz
+#   flambda : erg/s/cm²/Å
+#   mag     : AB magnitude
+FLUX_UNITS = {
+    "Jy": ("fnu", 1e-23),
+    "mJy": ("fnu", 1e-26),
+    "uJy": ("fnu", 1e-29),
+    "nJy": ("fnu", 1e-32),
+    "fnu": ("fnu", 1.0),
+    "cgs_fnu": ("fnu", 1.0),
+    "flambda": ("flambda", 1.0),
+    "cgs_flambda": ("flambda", 1.0),
+    "flambda_um": ("flambda", 1e-4),  # erg/s/cm²/μm
+    "ABmag": ("mag", None),
+}
+
+_SCALED = re.compile(r"^\s*([0-9.eE+\-*]+)\s+(\S+)\s*$")
+
+
+def parse_flux_unit(unit):
+    """
+    Kind and cgs factor of a flux unit.
+
+    Besides the names in FLUX_UNITS, a numeric prefix is accepted:
+    "1e-20 flambda" → ("flambda", 1e-20).
+
+    Returns
+    -------
+    (kind, factor) : kind in {'fnu', 'flambda', 'mag'}
+    """
+
+    if unit in FLUX_UNITS:
+        return FLUX_UNITS[unit]
+
+    m = _SCALED.match(str(unit))
+    if m is not None and m.group(2) in FLUX_UNITS:
+        kind, factor = FLUX_UNITS[m.group(2)]
+        if kind != "mag":
+            scale = float(m.group(1).replace("10**", "1e"))
+            return kind, scale * factor
+
+    raise ValueError(
+        f"Unknown flux unit {unit!r} (use {', '.join(FLUX_UNITS)} "
+        "or a scaled unit such as '1e-20 flambda')"
+    )
+
+
+def _check_wave_unit(unit):
+    if unit not in WAVE_UNITS:
+        raise ValueError(f"wave unit must be one of {', '.join(WAVE_UNITS)}")
+
+
+def wave_to_angstrom(wave, wave_unit="um"):
+    """
+    Wavelength in Å (a new array; frequencies in Hz are inverted).
+    """
+
+    _check_wave_unit(wave_unit)
+    wave = np.asarray(wave, dtype=float)
+
+    if wave_unit == "Hz":
+        return C_ANGSTROM / wave
+
+    return wave * WAVE_UNITS[wave_unit]
+
+
+def convert_wave(wave, from_unit="um", to_unit="A", inplace=False):
+    """
+    Convert wavelengths/frequencies between um, nm, A, cm and Hz.
+
+    Linear conversions are a single multiply; to/from Hz a single
+    divide. With inplace=True the input array is overwritten.
+
+    Returns
+    -------
+    ndarray
+    """
+
+    _check_wave_unit(from_unit)
+    _check_wave_unit(to_unit)
+
+    wave = np.asarray(wave)
+    if inplace:
+        if not np.issubdtype(wave.dtype, np.floating):
+            raise TypeError("in-place conversion needs a float array")
+        out = wave
+    else:
+        out = np.empty(wave.shape, dtype=np.result_type(wave.dtype, float))
+
+    if from_unit == to_unit:
+        out[...] = wave
+        return out
+
+    if "Hz" in (from_unit, to_unit):
+        other = to_unit if from_unit == "Hz" else from_unit
+        # λ[other] = c[Å/s] / ν / fator ;  ν = c[Å/s] / (λ[other] · fator)
+        np.divide(C_ANGSTROM / WAVE_UNITS[other], wave, out=out)
+        return out
+
+    np.multiply(wave, WAVE_UNITS[from_unit] / WAVE_UNITS[to_unit], out=out)
+    return out
+
+
+def flux_factor(wave, from_unit, to_unit, wave_unit="um"):
+    """
+    Multiplicative factor taking linear flux units from_unit → to_unit.
+
+    F_lambda [Å⁻¹] = F_nu [Hz⁻¹] · c / λ², so conversions between F_nu
+    and F_lambda depend on wavelength and give one factor per pixel;
+    all other cases give a scalar. Applying the factor is a single
+    multiply for flux and error alike.
+
+    Returns
+    -------
+    float or ndarray (same shape as wave)
+    """
+
+    kind_in, f_in = parse_flux_unit(from_unit)
+    kind_out, f_out = parse_flux_unit(to_unit)
+
+    if "mag" in (kind_in, kind_out):
+        raise ValueError("AB magnitudes are not linear; use convert_flux()")
+
+    scale = f_in / f_out
+
+    if kind_in == kind_out:
+        return scale
+
+    lam_A = wave_to_angstrom(wave, wave_unit)
+
+    if kind_in == "fnu":
+        # F_nu → F_lambda
+        return scale * C_ANGSTROM / lam_A**2
+
+    # F_lambda → F_nu
+    lam_A *= lam_A
+    lam_A *= scale / C_ANGSTROM
+    return lam_A
+
+
+def convert_flux(
+    flux,
+    wave,
+    from_unit,
+    to_unit,
+    wave_unit="um",
+    err=None,
+    inplace=False,
+    factor=None,
+):
+    """
+    Convert a flux array (and its error) between flux units.
+
+    Supported units: Jy, mJy, uJy, nJy, cgs F_nu, cgs F_lambda (per Å or
+    per μm, with optional numeric scale such as "1e-20 flambda") and AB
+    magnitudes. Linear conversions precompute one factor per pixel and
+    apply it with a single in-place multiply.
+
+    Flat arrays of concatenated spectra (see pack_ragged()) convert in
+    one call as long as `wave` is concatenated the same way.
+
+    Parameters
+    ----------
+    flux : array_like
+    wave : array_like
+        Wavelength (or frequency) of every pixel, in wave_unit
+    err : array_like or None
+    inplace : bool
+        Overwrite flux (and err) instead of allocating new arrays
+    factor : ndarray or None
+        Precomputed flux_factor() for these pixels (ignored when either
+        unit is a magnitude)
+
+    Returns
+    -------
+    flux, err (err is None if not given)
+    """
+
+    kind_in, f_in = parse_flux_unit(from_unit)
+    kind_out, f_out = parse_flux_unit(to_unit)
+
+    flux = np.asarray(flux)
+    if err is not None:
+        err = np.asarray(err)
+
+    if inplace:
+        for a in (flux, err):
+            if a is not None and not np.issubdtype(a.dtype, np.floating):
+                raise TypeError("in-place conversion needs float arrays")
+        out_f, out_e = flux, err
+    else:
+        out_f = np.array(flux, dtype=np.result_type(flux.dtype, float))
+        out_e = None if err is None else np.array(err, dtype=np.result_type(err.dtype, float))
+
+    # ---- magnitudes AB: passa por F_nu cgs ----
+    if kind_in == "mag":
+        if kind_out == "mag":
+            return out_f, out_e
+
+        # F_nu = 10^(-0.4 (m + 48.6))
+        out_f += AB_ZEROPOINT
+        out_f *= -0.4
+        np.power(10.0, out_f, out=out_f)
+
+        if out_e is not None:
+            # σ_F = F σ_m / 1.0857
+            out_e /= _POGSON
+            out_e *= out_f
+
+        return convert_flux(
+            out_f, wave, "cgs_fnu", to_unit,
+            wave_unit=wave_unit, err=out_e, inplace=True,
+        )
+
+    if kind_out == "mag":
+        convert_flux(
+            out_f, wave, from_unit, "cgs_fnu",
+            wave_unit=wave_unit, err=out_e, inplace=True,
+        )
+
+        if out_e is not None:
+            # σ_m = 1.0857 σ_F / F
+            out_e /= out_f
+            out_e *= _POGSON
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            np.log10(out_f, out=out_f)
+        out_f *= -2.5
+        out_f -= AB_ZEROPOINT
+
+        return out_f, out_e
+
+    # ---- linear: um único multiply ----
+    if factor is None:
+        factor = flux_factor(wave, from_unit, to_unit, wave_unit)
+
+    np.multiply(out_f, factor, out=out_f)
+    if out_e is not None:
+        np.multiply(out_e, factor, out=out_e)
+
+    return out_f, out_e
+
+
+def flux_kind(unit):
+    """
+    'fnu', 'flambda' or 'mag'.
+    """
+
+    return parse_flux_unit(unit)[0]
+
+
+# -------------------------
+# lotes irregulares
+# -------------------------
+
+def pack_ragged(arrays, dtype=float):
+    """
+    Concatenate arrays of different lengths into one flat buffer.
+
+    Returns
+    -------
+    flat : ndarray
+    offsets : ndarray of int, len(arrays) + 1
+        Array i is flat[offsets[i]:offsets[i + 1]]
+    """
+
+    lengths = np.fromiter((len(a) for a in arrays), dtype=np.int64, count=len(arrays))
+
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    flat = np.empty(offsets[-1], dtype=dtype)
+    for a, i0, i1 in zip(arrays, offsets[:-1], offsets[1:]):
+        flat[i0:i1] = a
+
+    return flat, offsets
+
+
+def unpack_ragged(flat, offsets):
+    """
+    Views of the arrays packed by pack_ragged() (no copies).
+    """
+
+    return [flat[i0:i1] for i0, i1 in zip(offsets[:-1], offsets[1:])]
+
+
+def convert_batch(
+    waves,
+    fluxes,
+    from_unit,
+    to_unit,
+    wave_unit="um",
+    errs=None,
+):
+    """
+    Convert a batch of spectra of different lengths in one pass.
+
+    The spectra are packed into flat buffers, the per-pixel factors are
+    computed once for the whole batch and applied in place.
+
+    Parameters
+    ----------
+    waves, fluxes : list of array_like
+    errs : list of array_like or None
+
+    Returns
+    -------
+    fluxes, errs : lists of ndarray (views of one flat buffer each)
+    """
+
+    flat_w, offsets = pack_ragged(waves)
+    flat_f, _ = pack_ragged(fluxes)
+    flat_e = None if errs is None else pack_ragged(errs)[0]
+
+    convert_flux(
+        flat_f, flat_w, from_unit, to_unit,
+        wave_unit=wave_unit, err=flat_e, inplace=True,
+    )
+
+    return (
+        unpack_ragged(flat_f, offsets),
+        None if flat_e is None else unpack_ragged(flat_e, offsets),
+    )
@@ -0,0 +1,460 @@
+import os
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+
+from .spectrum import load_spectrum, compute_mean_spectrum
+from .decimate import decimate_minmax
+
+
+# default loader options used by the notebooks
+DEFAULT_LOADER_KWARGS = dict(
+    input_flux_unit="uJy",
+    wave_unit="um",
+    restframe=True,
+    normalize=True,
+)
+
+
+def load_sample_table(
+    groups_csv="groups.csv",
+    gradings_csv="gradings_spectra.csv",
+):
+    """
+    Build the table of spectra shown in the viewer.
+
+    Parameters
+    ----------
+    groups_csv : str
+        CSV with columns file, z, group
+    gradings_csv : str or None
+        CSV with columns file, z, grading
+
+    Returns
+    -------
+    DataFrame with columns file, z, group and grading
+    """
+
+    sample = pd.read_csv(groups_csv)
+
+    if gradings_csv is not None and os.path.exists(gradings_csv):
+        gradings = pd.read_csv(gradings_csv)[["file", "grading"]]
+        sample = sample.merge(gradings, on="file", how="left")
+
+    if "grading" not in sample:
+        sample["grading"] = "no"
+
+    sample["grading"] = sample["grading"].fillna("no")
+
+    return sample.sort_values(["group", "z"]).reset_index(drop=True)
+
+
+def _freeze(value):
+    """
+    Hashable version of a loader option (lists and arrays become
+    tuples, dicts sorted tuples of items), for the cache keys.
+    """
+
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _loader_items(loader_kwargs):
+    return tuple(sorted((k, _freeze(v)) for k, v in loader_kwargs.items()))
+
+
+@lru_cache(maxsize=1024)
+def _cached_spectrum(fits_path, z, loader_items):
+    return load_spectrum(fits_path, z=z, **dict(loader_items))
+
+
+def get_spectrum(fits_path, z, loader_kwargs=None):
+    """
+    load_spectrum() with an in-memory cache.
+
+    Each spectrum is read from disk only once per session, so the
+    viewer callbacks only pay for downsampling.
+    """
+
+    if loader_kwargs is None:
+        loader_kwargs = DEFAULT_LOADER_KWARGS
+
+    return _cached_spectrum(fits_path, float(z), _loader_items(loader_kwargs))
+
+
+def downsample_for_view(wave, flux, x_range=None, n_points=2000):
+    """
+    Server-side downsampling of a spectrum for the current zoom.
+
+    Parameters
+    ----------
+    wave, flux : array_like
+    x_range : tuple or None
+        (xmin, xmax) currently shown in the browser
+    n_points : int
+        Approximate maximum number of points sent to the browser
+
+    Returns
+    -------
+    wave, flux : ndarray
+    """
+
+    return decimate_minmax(
+        wave,
+        flux,
+        xlim=x_range,
+        n_columns=max(n_points // 2, 1),
+    )
+
+
+def _x_range_from_relayout(relayout, default=None):
+    """
+    Extract the x range from a plotly relayoutData event.
+    """
+
+    if not relayout:
+        return default
+
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        return (relayout["xaxis.range[0]"], relayout["xaxis.range[1]"])
+
+    if "xaxis.range" in relayout:
+        return tuple(relayout["xaxis.range"])
+
+    if relayout.get("xaxis.autorange"):
+        return None
+
+    return default
+
+
+def make_viewer_figure(
+    sample,
+    files,
+    base_path="DeGraaff_espectros",
+    loader_kwargs=None,
+    x_range=None,
+    y_range=None,
+    offset=0.0,
+    mean_groups=(),
+    n_points=2000,
+    min_contrib=3,
+):
+    """
+    Build the plotly figure for a selection of spectra.
+
+    Parameters
+    ----------
+    sample : DataFrame
+        Output of load_sample_table()
+    files : list of str
+        Files (rows of sample) to plot
+    x_range, y_range : tuple or None
+        Current view
+    offset : float
+        Vertical offset between consecutive spectra
+    mean_groups : list of str
+        Groups whose mean spectrum is overlaid
+    n_points : int
+        Maximum number of points per trace
+    min_contrib : int
+        Mask mean spectrum pixels with fewer contributing spectra
+
+    Returns
+    -------
+    plotly Figure
+    """
+
+    import plotly.graph_objects as go
+
+    rows = sample.set_index("file")
+
+    fig = go.Figure()
+
+    for j, fname in enumerate(files):
+        z = rows.loc[fname, "z"]
+
+        try:
+            spec = get_spectrum(
+                os.path.join(base_path, fname), z, loader_kwargs
+            )
+        except Exception as e:
+            print(f"Skipping {fname} → {e}")
+            continue
+
+        wave, flux = downsample_for_view(
+            spec["wave"], spec["flux"], x_range=x_range, n_points=n_points
+        )
+
+        fig.add_trace(
+            go.Scattergl(
+                x=wave,
+                y=flux + j * offset,
+                mode="lines",
+                line=dict(shape="hvh", width=1.2),
+                name=f"{fname} ({rows.loc[fname, 'group']}, z={z:.3f})",
+            )
+        )
+
+    for group in mean_groups:
+        mean_spec = group_mean_spectrum(
+            sample, group, base_path=base_path, loader_kwargs=loader_kwargs
+        )
+
+        if mean_spec is None:
+            continue
+
+        flux = mean_spec["flux_mean"].copy()
+        flux[mean_spec["n_contrib"] < min_contrib] = np.nan
+
+        wave, flux = downsample_for_view(
+            mean_spec["wave"], flux, x_range=x_range, n_points=n_points
+        )
+
+        fig.add_trace(
+            go.Scattergl(
+                x=wave,
+                y=flux,
+                mode="lines",
+                line=dict(shape="hvh", width=2.5, color="black"),
+                name=f"{group} mean (N={mean_spec['n_objects']})",
+            )
+        )
+
+    fig.update_layout(
+        xaxis_title="Rest-frame wavelength [μm]",
+        yaxis_title="Normalized F<sub>λ</sub>",
+        template="simple_white",
+        uirevision="keep",
+        legend=dict(font=dict(size=9)),
+        margin=dict(l=60, r=20, t=30, b=50),
+    )
+
+    if x_range is not None:
+        fig.update_xaxes(range=list(x_range))
+
+    if y_range is not None:
+        fig.update_yaxes(range=list(y_range))
+
+    return fig
+
+
+_MEAN_CACHE = {}
+
+
+def group_mean_spectrum(
+    sample,
+    group,
+    base_path="DeGraaff_espectros",
+    loader_kwargs=None,
+):
+    """
+    Mean spectrum of a group, computed once from the cached spectra.
+    """
+
+    if loader_kwargs is None:
+        loader_kwargs = DEFAULT_LOADER_KWARGS
+
+    members = sample[sample["group"] == group]
+
+    key = (
+        group,
+        base_path,
+        _loader_items(loader_kwargs),
+        tuple(members["file"]),
+    )
+
+    if key in _MEAN_CACHE:
+        return _MEAN_CACHE[key]
+
+    spectra = []
+    for fname, z in zip(members["file"], members["z"]):
+        try:
+            spec = get_spectrum(os.path.join(base_path, fname), z, loader_kwargs)
+        except Exception as e:
+            print(f"Skipping {fname} → {e}")
+            continue
+
+        if loader_kwargs.get("normalize", False) and not spec["normalized"]:
+            continue
+
+        spectra.append(spec)
+
+    mean_spec = compute_mean_spectrum(spectra) if spectra else None
+
+    _MEAN_CACHE[key] = mean_spec
+
+    return mean_spec
+
+
+def make_viewer_app(
+    sample=None,
+    base_path="DeGraaff_espectros",
+    loader_kwargs=None,
+    n_points=2000,
+    preload=True,
+):
+    """
+    Create a Dash app to browse the spectra interactively.
+
+    Spectra are kept in memory after the first read and downsampled on
+    the server according to the current zoom, so only ~n_points per
+    trace are sent to the browser.
+
+    Parameters
+    ----------
+    sample : DataFrame or None
+        Output of load_sample_table(). If None, read from groups.csv
+        and gradings_spectra.csv
+    base_path : str
+        Folder with the FITS files
+    loader_kwargs : dict
+        Passed to load_spectrum()
+    n_points : int
+        Maximum number of points per trace
+    preload : bool
+        Read every spectrum into the cache before serving
+
+    Returns
+    -------
+    dash.Dash
+    """
+
+    try:
+        from dash import Dash, dcc, html, Input, Output, State
+    except ImportError as e:
+        raise ImportError(
+            "The interactive viewer requires dash (pip install dash)"
+        ) from e
+
+    if sample is None:
+        sample = load_sample_table()
+
+    if loader_kwargs is None:
+        loader_kwargs = DEFAULT_LOADER_KWARGS
+
+    if preload:
+        for fname, z in zip(sample["file"], sample["z"]):
+            try:
+                get_spectrum(os.path.join(base_path, fname), z, loader_kwargs)
+            except Exception as e:
+                print(f"Skipping {fname} → {e}")
+
+    groups = sorted(sample["group"].dropna().unique())
+
+    app = Dash(__name__)
+
+    app.layout = html.Div([
+        html.Div([
+            html.Label("Group"),
+            dcc.Dropdown(
+                id="group",
+                options=[{"label": "All", "value": "all"}]
+                + [{"label": g, "value": g} for g in groups],
+                value="all",
+                clearable=False,
+            ),
+            html.Label("Grading"),
+            dcc.RadioItems(
+                id="grading",
+                options=[
+                    {"label": "All", "value": "all"},
+                    {"label": "With grating", "value": "yes"},
+                    {"label": "PRISM only", "value": "no"},
+                ],
+                value="all",
+                inline=True,
+            ),
+            html.Label("Spectra"),
+            dcc.Dropdown(id="files", multi=True),
+            html.Label("Mean spectra"),
+            dcc.Checklist(
+                id="means",
+                options=[{"label": g, "value": g} for g in groups],
+                value=[],
+                inline=True,
+            ),
+            html.Label("Offset"),
+            dcc.Slider(id="offset", min=0, max=10, step=0.5, value=0),
+        ], style={"width": "25%", "display": "inline-block",
+                  "verticalAlign": "top"}),
+        html.Div([
+            dcc.Graph(id="spectra", style={"height": "85vh"}),
+        ], style={"width": "74%", "display": "inline-block"}),
+    ])
+
+    def _selection(group, grading):
+        sel = sample
+        if group != "all":
+            sel = sel[sel["group"] == group]
+        if grading != "all":
+            sel = sel[sel["grading"] == grading]
+        return sel
+
+    @app.callback(
+        Output("files", "options"),
+        Output("files", "value"),
+        Input("group", "value"),
+        Input("grading", "value"),
+    )
+    def update_files(group, grading):
+        sel = _selection(group, grading)
+        options = [
+            {"label": f"{f} (z={z:.2f})", "value": f}
+            for f, z in zip(sel["file"], sel["z"])
+        ]
+        return options, list(sel["file"][:8])
+
+    @app.callback(
+        Output("spectra", "figure"),
+        Input("files", "value"),
+        Input("means", "value"),
+        Input("offset", "value"),
+        Input("spectra", "relayoutData"),
+        State("spectra", "figure"),
+    )
+    def update_figure(files, means, offset, relayout, current):
+        default = None
+        if current is not None:
+            default = current.get("layout", {}).get("xaxis", {}).get("range")
+
+        x_range = _x_range_from_relayout(relayout, default=default)
+
+        return make_viewer_figure(
+            sample,
+            files or [],
+            base_path=base_path,
+            loader_kwargs=loader_kwargs,
+            x_range=x_range,
+            offset=offset or 0.0,
+            mean_groups=means or [],
+            n_points=n_points,
+        )
+
+    return app
+
+
+def run_viewer(host="127.0.0.1", port=8050, debug=False, **app_kwargs):
+    """
+    Serve the interactive viewer on localhost.
+
+    Parameters
+    ----------
+    host, port : str, int
+        Address of the server (http://127.0.0.1:8050 by default)
+    app_kwargs :
+        Passed to make_viewer_app()
+    """
+
+    app = make_viewer_app(**app_kwargs)
+    app.run(host=host, port=port, debug=debug)
+
+    return app
+
+
+if __name__ == "__main__":
+    run_viewer()
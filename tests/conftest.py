@@ -0,0 +1,22 @@
+"""
+Shared fixtures: a small folder of synthetic PRISM spectra (see
+functions.synthetic), written once per test session.
+"""
+
+import matplotlib
+matplotlib.use("Agg")
+
+import pytest
+
+from functions.synthetic import write_synthetic_sample
+
+
+@pytest.fixture(scope="session")
+def sample(tmp_path_factory):
+    """
+    (folder, spec_info) of 6 synthetic spectra.
+    """
+
+    folder = tmp_path_factory.mktemp("synth")
+    spec_info = write_synthetic_sample(str(folder), 6, seed=1)
+    return str(folder), spec_info
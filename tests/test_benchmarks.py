@@ -0,0 +1,32 @@
+import itertools
+
+import pytest
+
+from benchmarks.common import clear_fake_samples
+from benchmarks.run import iter_benchmarks, run_one
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _cleanup():
+    yield
+    clear_fake_samples()
+
+
+def _smallest(cls):
+    params = getattr(cls, "params", ())
+    if params and not isinstance(params[0], (list, tuple)):
+        params = (params,)
+    return next(itertools.product(*params), ())
+
+
+@pytest.mark.parametrize(
+    "cls, meth", [(cls, meth) for _, cls, meth in iter_benchmarks()],
+    ids=[full for full, _, _ in iter_benchmarks()],
+)
+def test_benchmark_runs(cls, meth):
+    best, peak = run_one(cls, meth, _smallest(cls))
+
+    if meth.startswith("peakmem_"):
+        assert peak > 0
+    else:
+        assert best >= 0
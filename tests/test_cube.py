@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from functions.cube import build_cube
+from functions.spectrum import load_spectrum
+
+
+@pytest.fixture(scope="module")
+def cube(sample, tmp_path_factory):
+    folder, spec_info = sample
+    return build_cube(
+        spec_info,
+        str(tmp_path_factory.mktemp("cube")),
+        base_path=folder,
+        loader_kwargs={"normalize": True, "norm_window": (0.3446, 0.3646)},
+        dtype=np.float64,
+        workers=1,
+    )
+
+
+@pytest.fixture
+def served(monkeypatch):
+    """
+    Records whether cube.loader() fell back to load_spectrum().
+    """
+
+    calls = []
+
+    def fake_load(path, z=None, **kwargs):
+        calls.append((path, z, kwargs))
+        return {"fallback": True}
+
+    monkeypatch.setattr("functions.cube.load_spectrum", fake_load)
+    return calls
+
+
+def test_loader_serves_row_with_same_options(cube, sample, served):
+    folder, spec_info = sample
+    fname, z = spec_info[0]
+
+    spec = cube.loader(f"{folder}/{fname}", z=z, normalize=True)
+
+    assert not served
+    assert spec["cube_row"] == 0
+    assert spec["normalized"]
+
+
+def test_loader_tuple_option_matches_json_list(cube, sample, served):
+    folder, spec_info = sample
+    fname, z = spec_info[0]
+
+    spec = cube.loader(fname, z=z, normalize=True, norm_window=(0.3446, 0.3646))
+
+    assert not served
+    assert spec["norm_window"] == (0.3446, 0.3646)
+
+
+def test_loader_missing_option_falls_back(cube, sample, served):
+    # a cube built with normalize=True must not answer a default request
+    folder, spec_info = sample
+    fname, z = spec_info[0]
+
+    spec = cube.loader(fname, z=z)
+
+    assert spec == {"fallback": True}
+    assert served[0][2] == {}
+
+
+def test_loader_other_redshift_falls_back(cube, sample, served):
+    folder, spec_info = sample
+    fname, z = spec_info[0]
+
+    spec = cube.loader(fname, z=z + 1.0, normalize=True)
+
+    assert spec == {"fallback": True}
+    assert served[0][1] == z + 1.0
+
+
+def test_cube_row_matches_fits(cube, sample):
+    folder, spec_info = sample
+    fname, z = spec_info[1]
+
+    ref = load_spectrum(f"{folder}/{fname}", z=z, normalize=True)
+    spec = cube.loader(f"{folder}/{fname}", z=z, normalize=True)
+
+    good = np.isfinite(spec["flux"])
+    np.testing.assert_allclose(
+        spec["flux"][good], np.interp(spec["wave"][good], ref["wave"], ref["flux"]), rtol=1e-10
+    )
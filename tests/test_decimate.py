@@ -0,0 +1,80 @@
+import weakref
+
+import numpy as np
+
+from functions.decimate import decimate_minmax, decimate_spectrum, clear_decimation_cache
+from functions.spectrum import load_spectrum
+
+
+def test_minmax_keeps_spikes():
+    wave = np.linspace(1, 2, 100_000)
+    flux = np.zeros_like(wave)
+    flux[12_345] = 10.0
+    flux[54_321] = -3.0
+
+    w, f = decimate_minmax(wave, flux, n_columns=500)
+
+    assert len(w) <= 1000
+    assert f.max() == 10.0 and f.min() == -3.0
+
+
+def test_cache_separates_flux_units(sample):
+    folder, spec_info = sample
+    fname, z = spec_info[0]
+    path = f"{folder}/{fname}"
+    clear_decimation_cache()
+
+    flam = load_spectrum(path, z=z)
+    fnu = load_spectrum(path, z=z, output_flux_unit="uJy")
+
+    _, f1 = decimate_spectrum(flam, n_columns=50)
+    _, f2 = decimate_spectrum(fnu, n_columns=50)
+
+    assert not np.allclose(f1, f2, equal_nan=True)
+
+
+def test_cache_separates_in_memory_spectra():
+    clear_decimation_cache()
+    wave = np.linspace(1, 2, 1000)
+    a = {"wave": wave, "flux": np.sin(wave * 50), "file": None}
+    b = {"wave": wave, "flux": np.cos(wave * 50), "file": None}
+
+    _, fa = decimate_spectrum(a, n_columns=20)
+    _, fb = decimate_spectrum(b, n_columns=20)
+    assert not np.array_equal(fa, fb)
+
+    # edited in place → same entry until the version changes
+    a["flux"] *= 2
+    _, fa1 = decimate_spectrum(a, n_columns=20)
+    np.testing.assert_array_equal(fa1, fa)
+
+    _, fa2 = decimate_spectrum(a, n_columns=20, version=1)
+    np.testing.assert_allclose(fa2, 2 * fa)
+
+
+def test_cache_hit_returns_same_result():
+    clear_decimation_cache()
+    wave = np.linspace(1, 2, 1000)
+    spec = {"wave": wave, "flux": wave**2}
+
+    assert decimate_spectrum(spec, n_columns=20) is decimate_spectrum(dict(spec), n_columns=20)
+
+
+def test_cache_keeps_only_decimated_copies():
+    clear_decimation_cache()
+    wave = np.linspace(1, 2, 1000)
+    spec = {"wave": wave, "flux": wave**2}
+
+    # poucos pontos → decimate_minmax devolve fatias do espectro
+    w, f = decimate_spectrum(spec, n_columns=1000)
+    assert w.base is None and f.base is None
+
+    # id reaproveitado por outro array → não devolve o resultado antigo
+    ref = weakref.ref(spec["flux"])
+    del spec, w, f
+    assert ref() is None
+
+    wave = np.linspace(1, 2, 1000)
+    other = {"wave": wave, "flux": -wave}
+    _, f2 = decimate_spectrum(other, n_columns=1000)
+    np.testing.assert_array_equal(f2, -wave)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from functions.eigen import EigenSpectra
+
+
+def _known_sample(n=600, n_pix=120, seed=3):
+    """
+    Spectra built from a mean and two orthonormal components, each
+    missing a different block of pixels (every pixel pair is still
+    observed together by many spectra).
+    """
+
+    rng = np.random.default_rng(seed)
+    wave = np.linspace(0.2, 0.7, n_pix)
+
+    mu = 1.0 + 0.3 * np.exp(-0.5 * ((wave - 0.5) / 0.02) ** 2)
+    basis = np.array([np.sin(2 * np.pi * (wave - 0.2) / 0.5), np.cos(6 * np.pi * wave)])
+    basis, _ = np.linalg.qr(basis.T)
+    basis = basis.T
+
+    coef = rng.normal(size=(n, 2)) * [2.0, 1.0]
+    flux = mu + coef @ basis
+
+    # cada espectro perde um bloco de 30% da grade em posição diferente
+    width = int(0.3 * n_pix)
+    start = rng.integers(0, n_pix - width + 1, size=n)
+    cols = np.arange(n_pix)
+    flux[(cols >= start[:, None]) & (cols < start[:, None] + width)] = np.nan
+
+    return wave, mu, basis, coef, flux
+
+
+def _span_overlap(a, b):
+    # cossenos dos ângulos principais entre os dois subespaços
+    return np.linalg.svd(a @ b.T, compute_uv=False)
+
+
+def test_partial_fit_in_batches_equals_single_fit():
+    wave, _, _, _, flux = _known_sample()
+
+    one = EigenSpectra(wave, n_components=2).partial_fit_arrays(flux)
+    two = EigenSpectra(wave, n_components=2)
+    two.partial_fit_arrays(flux[:250]).partial_fit_arrays(flux[250:])
+
+    for name in ("A", "B", "D"):
+        np.testing.assert_allclose(getattr(two, name), getattr(one, name), rtol=1e-10, atol=1e-9)
+    np.testing.assert_allclose(two.components, one.components, atol=1e-8)
+    assert two.n_spectra == one.n_spectra
+
+
+def test_save_load_reproduces_components(tmp_path):
+    wave, _, _, _, flux = _known_sample()
+    pca = EigenSpectra(wave, n_components=2).partial_fit_arrays(
+        flux, files=[f"s{i}" for i in range(len(flux))]
+    )
+
+    path = tmp_path / "eigen.npz"
+    pca.save(path)
+    loaded = EigenSpectra.load(path)
+
+    np.testing.assert_array_equal(loaded.wave, pca.wave)
+    np.testing.assert_allclose(loaded.components, pca.components)
+    np.testing.assert_allclose(loaded.explained_variance, pca.explained_variance)
+    assert loaded.files == pca.files and loaded.n_spectra == pca.n_spectra
+
+
+def test_gappy_fit_and_projection_recover_known_components():
+    wave, mu, basis, coef, flux = _known_sample()
+
+    pca = EigenSpectra(wave, n_components=2).partial_fit_arrays(flux)
+
+    np.testing.assert_allclose(pca.mean, mu, atol=0.1)
+    np.testing.assert_allclose(_span_overlap(pca.components, basis), 1.0, atol=1e-2)
+
+    # projeção só nos pixels observados recupera os coeficientes e
+    # preenche o buraco
+    full = pca.mean + coef[:5] @ pca.components
+    gappy = np.where(np.isfinite(flux[:5]), full, np.nan)
+    spectra = [
+        {"wave": wave, "flux": f, "err": np.ones_like(f), "file": f"s{i}"}
+        for i, f in enumerate(gappy)
+    ]
+    proj = pca.project(spectra)
+
+    assert (proj["n_pix"] < len(wave)).all()
+    np.testing.assert_allclose(proj["coef"], coef[:5], atol=1e-8)
+    np.testing.assert_allclose(proj["reconstruction"], full, atol=1e-8)
@@ -0,0 +1,75 @@
+import os
+import sys
+import shutil
+
+import pytest
+
+from functions.figcache import cached_figure, _source_digest
+from functions.storage import DirectoryStorage
+
+
+def first_spectrum(spec_info, base_path="", loader_kwargs=None):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.plot([0, 1], [0, 1])
+    return fig
+
+
+@pytest.fixture
+def folder(sample, tmp_path):
+    src, spec_info = sample
+    dst = tmp_path / "spectra"
+    shutil.copytree(src, dst)
+    return str(dst), spec_info[:2]
+
+
+def _touch(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+@pytest.mark.parametrize("storage", [None, "folder", "backend"])
+def test_changed_fits_invalidates_figure(folder, tmp_path, storage):
+    base, spec_info = folder
+    out = str(tmp_path / "fig.png")
+
+    if storage is None:
+        kw = dict(base_path=base, loader_kwargs={})
+    elif storage == "folder":
+        kw = dict(loader_kwargs={"storage": base})
+    else:
+        kw = dict(loader_kwargs={"storage": DirectoryStorage(base)})
+
+    assert cached_figure(out, first_spectrum, spec_info, **kw)
+    assert not cached_figure(out, first_spectrum, spec_info, **kw)
+
+    _touch(os.path.join(base, spec_info[1][0]))
+    assert cached_figure(out, first_spectrum, spec_info, **kw)
+    assert not cached_figure(out, first_spectrum, spec_info, **kw)
+
+
+def test_changed_arguments_invalidate_figure(folder, tmp_path):
+    base, spec_info = folder
+    out = str(tmp_path / "fig.png")
+
+    assert cached_figure(out, first_spectrum, spec_info, base_path=base)
+    assert cached_figure(out, first_spectrum, spec_info[:1], base_path=base)
+
+
+def test_source_digest_covers_package(tmp_path, monkeypatch):
+    pkg = tmp_path / "figpkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("")
+    (pkg / "plotting.py").write_text("def draw():\n    pass\n")
+    (pkg / "helpers.py").write_text("SCALE = 1\n")
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    from figpkg.plotting import draw
+
+    before = _source_digest(draw)
+    (pkg / "helpers.py").write_text("SCALE = 2\n")
+
+    assert _source_digest(draw) != before
+    sys.modules.pop("figpkg.plotting")
+    sys.modules.pop("figpkg")
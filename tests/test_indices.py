@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from functions.indices import band_means, measure_indices
+from functions.synthetic import prism_wave_grid
+
+
+def _noisy_spectra(n, sigma, z=5.0, seed=0):
+    rng = np.random.default_rng(seed)
+    wave = prism_wave_grid() / (1 + z)
+    flux = 1.0 + sigma * rng.standard_normal((n, len(wave)))
+    err = np.full(len(wave), sigma)
+    return [
+        {"wave": wave, "flux": f, "err": err, "file": f"s{i}.fits"}
+        for i, f in enumerate(flux)
+    ]
+
+
+def test_band_means_of_windows():
+    wave = np.linspace(0.3, 0.5, 201)
+    flux = np.vstack([wave, 2 * wave])
+    flux[1, :58] = np.nan          # 0.35–0.36 com < 80% de cobertura
+
+    mean, err = band_means(flux, None, wave, [(0.35, 0.36), (0.40, 0.45)])
+
+    sl = (wave >= 0.40) & (wave <= 0.45)
+    np.testing.assert_allclose(mean[:, 1], [wave[sl].mean(), 2 * wave[sl].mean()])
+    assert np.isnan(mean[1, 0]) and err is None
+
+
+@pytest.mark.parametrize("index", ["D4000", "Dn4000", "balmer_break"])
+def test_index_error_matches_noise_scatter(index):
+    tab = measure_indices(_noisy_spectra(1000, 0.05))
+
+    ratio = np.std(tab[index]) / np.median(tab[f"{index}_err"])
+    assert 0.8 < ratio < 1.25
+
+
+def test_narrow_band_error_is_not_underestimated():
+    # bandas Lick de ~1 pixel do PRISM: o erro fica conservador
+    tab = measure_indices(_noisy_spectra(1000, 0.05))
+
+    ratio = np.std(tab["HdeltaA"]) / np.median(tab["HdeltaA_err"])
+    assert 0.5 < ratio < 1.1
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from functions.merge import merge_prism_grating
+from functions.synthetic import generate_batch, write_batch_fits
+
+
+@pytest.fixture(scope="module")
+def object_files(tmp_path_factory):
+    """
+    One object with a PRISM spectrum and two gratings that do not
+    overlap (1.0–1.8 μm and 3.0–4.0 μm observed).
+    """
+
+    folder = str(tmp_path_factory.mktemp("merge"))
+    z = 5.0
+
+    def write(kind, wave, root):
+        batch = generate_batch(1, kind=kind, z_dist=[z], noise="none", wave=wave, seed=3)
+        batch["kind"] = kind
+        (fname, _), = write_batch_fits(folder, batch, root=root)
+        return f"{folder}/{fname}"
+
+    prism = write("prism", None, "obj")
+    g1 = write("grating", np.linspace(1.0, 1.8, 800), "obj-a")
+    g2 = write("grating", np.linspace(3.0, 4.0, 1000), "obj-b")
+    g3 = write("grating", np.linspace(2.2, 2.6, 400), "obj-c")
+
+    return prism, [g1, g2, g3], z
+
+
+@pytest.mark.parametrize("mode", ["native", "prism"])
+def test_gap_between_gratings_keeps_prism(object_files, mode):
+    prism, gratings, z = object_files
+
+    merged = merge_prism_grating(prism, gratings[:2], z, mode=mode)
+
+    obs = merged["wave"] * (1 + z)
+    gap = (obs > 1.85) & (obs < 2.95)
+
+    assert gap.any()
+    assert np.all(merged["source"][gap] == 0)
+    assert np.all(np.isfinite(merged["flux"][gap]))
+
+    for lo, hi in ((1.05, 1.75), (3.05, 3.95)):
+        inside = (obs > lo) & (obs < hi)
+        assert np.all(merged["source"][inside] == 1)
+
+
+@pytest.mark.parametrize("mode", ["native", "prism"])
+def test_middle_grating_between_others_is_kept(object_files, mode):
+    # a terceira grating (2.2–2.6 μm) fica entre as duas primeiras
+    prism, gratings, z = object_files
+
+    merged = merge_prism_grating(prism, gratings, z, mode=mode)
+
+    obs = merged["wave"] * (1 + z)
+    middle = (obs > 2.25) & (obs < 2.55)
+    gaps = ((obs > 1.85) & (obs < 2.15)) | ((obs > 2.65) & (obs < 2.95))
+
+    assert middle.any() and gaps.any()
+    assert np.all(merged["source"][middle] == 1)
+    assert np.all(np.isfinite(merged["flux"][middle]))
+    assert np.all(merged["source"][gaps] == 0)
+    assert np.all(np.isfinite(merged["flux"][gaps]))
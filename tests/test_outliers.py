@@ -0,0 +1,34 @@
+import numpy as np
+
+from functions.outliers import find_outliers
+
+
+def _spectra(flux, wave):
+    return [
+        {"wave": wave, "flux": f, "err": np.full(len(wave), 0.01), "file": f"s{i}.fits"}
+        for i, f in enumerate(flux)
+    ]
+
+
+def test_flags_the_odd_spectrum():
+    rng = np.random.default_rng(0)
+    wave = np.linspace(0.3, 0.6, 300)
+    flux = 1.0 + 0.01 * rng.standard_normal((20, len(wave)))
+    flux[7] += 0.5 * np.sin(40 * wave)
+
+    res = find_outliers(_spectra(flux, wave), wave_grid=wave)
+
+    assert list(res["table"].query("is_outlier")["file"]) == ["s7.fits"]
+
+
+def test_group_without_spread_is_not_flagged():
+    # 4 espectros idênticos: MAD dos scores = 0
+    wave = np.linspace(0.3, 0.6, 300)
+    flux = np.ones((5, len(wave)))
+    flux[4] += 0.05 * np.sin(40 * wave)
+
+    res = find_outliers(_spectra(flux, wave), wave_grid=wave)
+    tab = res["table"]
+
+    assert not tab["is_outlier"].any()
+    assert tab["score"].isna().all()
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+from multiprocessing import shared_memory
+
+from functions.parallel import (
+    SharedPool,
+    SharedSample,
+    parallel_mean_spectrum,
+    task_window_stats,
+)
+from functions.spectrum import compute_mean_spectrum, load_spectrum
+
+
+@pytest.fixture(scope="module")
+def spectra(sample):
+    folder, spec_info = sample
+    return [
+        load_spectrum(os.path.join(folder, fname), z=z, normalize=True)
+        for fname, z in spec_info
+    ]
+
+
+@pytest.mark.parametrize("flux_min", [None, 0.5])
+def test_parallel_mean_matches_serial(spectra, flux_min):
+    wave_grid = np.linspace(0.1, 1.0, 400)
+    ref = compute_mean_spectrum(spectra, wave_grid=wave_grid, flux_min=flux_min)
+
+    with SharedSample.from_spectra(spectra) as shared, \
+            SharedPool(shared, processes=2, chunk_size=2) as pool:
+        res = parallel_mean_spectrum(pool, wave_grid, flux_min=flux_min)
+
+    np.testing.assert_array_equal(res["n_contrib"], ref["n_contrib"])
+    for key in ("flux_mean", "flux_std", "err_mean"):
+        np.testing.assert_allclose(res[key], ref[key], rtol=1e-10, equal_nan=True)
+    assert res["n_objects"] == ref["n_objects"]
+
+
+def test_shared_blocks_unlinked_on_exit(spectra):
+    with SharedSample.from_spectra(spectra) as shared:
+        names = [shm.name for shm in shared._blocks.values()]
+
+        with SharedPool(shared, processes=2) as pool:
+            stats = pool.map(task_window_stats, window=(0.54, 0.56))
+
+        assert len(stats) == len(spectra)
+        np.testing.assert_array_equal(shared.spectrum(1)["flux"], spectra[1]["flux"])
+
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions.photometry import (
+    band_fluxes, calibration_offsets, filter_matrix, filters_grid,
+)
+from functions.resolution import oversampling_factor
+from functions.synthetic import prism_wave_grid
+
+
+@pytest.fixture
+def filters():
+    wave = np.linspace(2.4, 3.4, 200)
+    trans = np.clip(1 - np.abs(wave - 2.9) / 0.45, 0, None)
+    return {"F290X": (wave, trans)}
+
+
+def test_band_flux_error_matches_noise_scatter(filters):
+    rng = np.random.default_rng(0)
+    native = prism_wave_grid()
+    grid = filters_grid(filters)
+    W = filter_matrix(filters, grid)
+
+    sigma = 0.1
+    n = 2000
+    noisy = 1.0 + sigma * rng.standard_normal((n, len(native)))
+
+    flux = np.array([np.interp(grid, native, f) for f in noisy])
+    err = np.full(flux.shape, sigma)
+    k = np.broadcast_to(oversampling_factor(native, grid), flux.shape)
+
+    fnu, fnu_err, _ = band_fluxes(flux, err, W, oversampling=k)
+    ratio = np.std(fnu[:, 0]) / np.median(fnu_err[:, 0])
+
+    assert k.mean() > 3
+    assert 0.8 < ratio < 1.25
+
+    # sem a correção o erro sai ~sqrt(k) menor
+    _, naive_err, _ = band_fluxes(flux, err, W)
+    assert np.std(fnu[:, 0]) / np.median(naive_err[:, 0]) > 1.5
+
+
+@pytest.mark.parametrize("columns", ["{band}", "{band}_mag"])
+def test_calibration_offsets_reads_observed_columns(columns):
+    synth = pd.DataFrame({
+        "file": ["a.fits", "b.fits"],
+        "F277W_mag": [25.0, 26.0],
+        "F444W_mag": [24.0, np.nan],
+    })
+    phot = pd.DataFrame({
+        "file": ["b.fits", "a.fits"],
+        columns.format(band="F277W"): [25.5, 24.8],
+        columns.format(band="F444W"): [24.0, 23.8],
+    })
+
+    out = calibration_offsets(synth, phot, columns=columns).set_index("file")
+
+    np.testing.assert_allclose(out.loc["a.fits", ["F277W_offset", "F444W_offset"]], [-0.2, -0.2])
+    assert out.loc["b.fits", "F277W_offset"] == pytest.approx(-0.5)
+    assert out.loc["b.fits", "n_bands"] == 1
+    np.testing.assert_allclose(out["flux_correction"], 10 ** (-0.4 * out["median_offset"]))
+    assert out.loc["a.fits", "flux_correction"] == pytest.approx(10 ** 0.08)
@@ -0,0 +1,27 @@
+import numpy as np
+import matplotlib.pyplot as plt
+import pytest
+
+from functions.plot import qualitative_colors, plot_overlaid_spectra
+
+
+@pytest.mark.parametrize("n", [3, 10, 15, 40])
+def test_qualitative_colors_are_distinct(n):
+    colors = np.array([np.asarray(c, dtype=float)[:3] for c in qualitative_colors(n)])
+
+    assert len(colors) == n
+    assert len(np.unique(colors.round(6), axis=0)) == n
+
+
+def test_overlay_of_many_spectra_renders(sample):
+    folder, spec_info = sample
+    spec_info = spec_info * 2       # 12 curvas
+
+    fig = plot_overlaid_spectra(
+        spec_info, list(range(len(spec_info))), base_path=folder,
+        loader_kwargs={"normalize": True}, fast=True, lines={},
+    )
+
+    colors = fig.axes[0].collections[0].get_colors()
+    assert len(np.unique(colors.round(6), axis=0)) == len(spec_info)
+    plt.close(fig)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from functions.resolution import lsf_kernel_matrix, match_resolution, oversampling_factor
+from functions.spectrum import compute_mean_spectrum
+
+
+def test_kernel_leaves_pixels_outside_the_source_empty():
+    src = np.linspace(1.0, 2.0, 200)
+    dst = np.linspace(0.8, 2.2, 300)
+
+    flux, err = match_resolution(src, np.ones_like(src), np.full_like(src, 0.1), dst, 50.0, 1000.0)
+
+    inside = (dst >= src[0]) & (dst <= src[-1])
+    assert np.all(np.isnan(flux[~inside])) and np.all(np.isnan(err[~inside]))
+    np.testing.assert_allclose(flux[inside], 1.0)
+
+
+def test_kernel_rows_sum_to_one_inside():
+    src = np.linspace(1.0, 2.0, 200)
+    dst = np.linspace(0.9, 2.1, 100)
+    K = lsf_kernel_matrix(src, dst, 0.02)
+
+    rows = np.asarray(K.sum(axis=1)).ravel()
+    inside = (dst >= src[0]) & (dst <= src[-1])
+    np.testing.assert_allclose(rows[inside], 1.0)
+    assert np.all(rows[~inside] == 0)
+
+
+def test_resolution_matched_mean_has_interpolation_coverage():
+    grid = np.linspace(0.3, 0.7, 400)
+    spectra = [
+        {"wave": np.linspace(lo, lo + 0.2, 300), "flux": np.ones(300),
+         "err": np.full(300, 0.1), "z": 5.0, "restframe": True, "file": f"s{i}.fits"}
+        for i, lo in enumerate((0.35, 0.45))
+    ]
+
+    plain = compute_mean_spectrum(spectra, wave_grid=grid)
+    matched = compute_mean_spectrum(spectra, wave_grid=grid, target_resolution=50.0)
+
+    np.testing.assert_array_equal(matched["n_contrib"], plain["n_contrib"])
+
+
+def test_oversampling_factor():
+    k = oversampling_factor(np.linspace(1, 2, 11), np.linspace(1, 2, 101))
+    np.testing.assert_allclose(k[5:-5], 10.0)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from functions.spectrum import load_spectrum
+from functions.synthetic import generate_batch, write_batch_fits
+from functions.units import convert_wave
+
+
+@pytest.mark.parametrize("unit", ["A", "nm", "Hz"])
+def test_load_spectrum_returns_microns(tmp_path, unit):
+    batch = generate_batch(1, z_dist=[5.0], noise="none", seed=2)
+    (ref_name, z), = write_batch_fits(str(tmp_path), batch, root="um")
+
+    batch["wave"] = convert_wave(batch["wave"], "um", unit)
+    if unit == "Hz":
+        batch["wave"] = batch["wave"][::-1].copy()
+        batch["flux"] = batch["flux"][:, ::-1].copy()
+        batch["err"] = batch["err"][:, ::-1].copy()
+    (name, _), = write_batch_fits(str(tmp_path), batch, root=unit)
+
+    ref = load_spectrum(str(tmp_path / ref_name), z=z, normalize=True)
+    spec = load_spectrum(str(tmp_path / name), z=z, wave_unit=unit, normalize=True)
+
+    np.testing.assert_allclose(spec["wave"], ref["wave"], rtol=1e-10)
+    np.testing.assert_allclose(spec["flux"], ref["flux"], rtol=1e-8)
+    assert spec["normalized"]
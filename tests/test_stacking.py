@@ -0,0 +1,64 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions.cube import build_cube
+from functions.spectrum import compute_mean_spectrum
+from functions.stacking import stack_by
+
+
+@pytest.fixture(scope="module")
+def cube(sample, tmp_path_factory):
+    folder, spec_info = sample
+    return build_cube(
+        spec_info, str(tmp_path_factory.mktemp("cube")), base_path=folder,
+        loader_kwargs={"normalize": True}, dtype=np.float64, workers=1,
+    )
+
+
+@pytest.mark.parametrize("flux_min", [None, 0.5])
+def test_stack_by_matches_compute_mean_spectrum(cube, sample, flux_min):
+    _, spec_info = sample
+    catalog = pd.DataFrame({
+        "file": [f for f, _ in spec_info],
+        "group": ["A", "B"] * (len(spec_info) // 2),
+    })
+
+    stacks = stack_by(cube, catalog, "group", where=None, flux_min=flux_min)
+
+    for label, files in catalog.groupby("group")["file"]:
+        ref = compute_mean_spectrum(cube.select(files=list(files)), flux_min=flux_min)
+        s = stacks[label]
+
+        np.testing.assert_allclose(s["flux_mean"], ref["flux_mean"], rtol=1e-12, equal_nan=True)
+        np.testing.assert_allclose(s["err_mean"], ref["err_mean"], rtol=1e-12, equal_nan=True)
+        np.testing.assert_array_equal(s["n_contrib"], ref["n_contrib"])
+
+
+def test_flux_min_masks_errors_too():
+    wave = np.linspace(1, 2, 50)
+    spectra = [
+        {"wave": wave, "flux": np.full(50, f), "err": np.full(50, e)}
+        for f, e in [(1.0, 0.1), (1.0, 0.1), (-5.0, 10.0)]
+    ]
+
+    res = compute_mean_spectrum(spectra, wave_grid=wave, flux_min=0.0)
+
+    np.testing.assert_allclose(res["flux_mean"], 1.0)
+    np.testing.assert_allclose(res["err_mean"], 0.1 / np.sqrt(2))
+
+
+def test_no_empty_slice_warnings():
+    wave = np.linspace(1, 2, 50)
+    spectra = [
+        {"wave": wave[:20], "flux": np.ones(20), "err": np.ones(20)},
+        {"wave": wave[:30], "flux": np.ones(30), "err": np.ones(30)},
+    ]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        res = compute_mean_spectrum(spectra, wave_grid=wave)
+
+    assert np.isnan(res["flux_mean"][-1]) and np.isnan(res["err_mean"][-1])
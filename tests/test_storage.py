@@ -0,0 +1,60 @@
+import os
+import zipfile
+
+import pytest
+
+from functions.storage import DirectoryStorage, ZipStorage, open_storage, clear_storage_cache
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for sub in ("a", "b"):
+        (tmp_path / sub).mkdir()
+        (tmp_path / sub / "same.fits").write_bytes(sub.encode())
+    (tmp_path / "a" / "only.fits").write_bytes(b"only")
+    return tmp_path
+
+
+def test_unique_basename_resolves(tree):
+    storage = DirectoryStorage(str(tree))
+
+    assert storage.read_bytes("some/other/path/only.fits") == b"only"
+    assert storage.read_bytes("b/same.fits") == b"b"
+
+
+def test_ambiguous_basename_raises(tree):
+    storage = DirectoryStorage(str(tree))
+
+    with pytest.raises(FileNotFoundError, match="ambiguous"):
+        storage.resolve("elsewhere/same.fits")
+
+
+def test_ambiguous_basename_in_zip(tree, tmp_path):
+    path = str(tmp_path / "spectra.zip")
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("x/s.fits", b"1")
+        zf.writestr("y/s.fits", b"2")
+
+    with ZipStorage(path) as storage:
+        assert storage.read_bytes("y/s.fits") == b"2"
+        with pytest.raises(FileNotFoundError, match="ambiguous"):
+            storage.resolve("s.fits")
+
+
+def test_open_storage_refreshes_changed_folder(tree):
+    clear_storage_cache()
+
+    first = open_storage(str(tree / "a"))
+    assert open_storage(str(tree / "a")) is first
+    assert not first.exists("new.fits")
+
+    (tree / "a" / "new.fits").write_bytes(b"new")
+    st = os.stat(tree / "a")
+    os.utime(tree / "a", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    second = open_storage(str(tree / "a"))
+    assert second is not first
+    assert second.exists("new.fits")
+
+    clear_storage_cache()
+    assert open_storage(str(tree / "a")) is not second
@@ -0,0 +1,49 @@
+import numpy as np
+
+from functions.cube import log_wave_grid
+from functions.synthetic import prism_wave_grid
+from functions.templates import decompose_spectra, decomposition_table, fit_templates
+
+
+def test_nnls_matches_scipy():
+    from scipy.optimize import nnls
+
+    rng = np.random.default_rng(0)
+    T = rng.random((200, 4))
+    flux = rng.random((20, 3)) @ T[:, :3].T - 0.3 * T[:, 3] + 0.01 * rng.standard_normal((20, 200))
+
+    res = fit_templates(flux, None, T, weighted=False)
+
+    for f, c in zip(flux, res["coef"]):
+        np.testing.assert_allclose(c, nnls(T, f)[0], atol=1e-10)
+
+
+def test_dof_counts_native_pixels():
+    # χ² de pixels interpolados: a dispersão segue os pixels nativos
+    rng = np.random.default_rng(1)
+    z = 5.0
+    native = prism_wave_grid() / (1 + z)
+    grid = log_wave_grid(0.15, 0.8)
+
+    templates = {
+        "flat": (grid, np.ones_like(grid)),
+        "red": (grid, grid / 0.5),
+    }
+
+    sigma = 0.05
+    truth = 1.0 + 0.5 * native / 0.5
+    spectra = [
+        {"wave": native, "flux": truth + sigma * rng.standard_normal(len(native)),
+         "err": np.full(len(native), sigma), "file": f"s{i}.fits"}
+        for i in range(500)
+    ]
+
+    res = decompose_spectra(spectra, templates, wave_grid=grid)
+    chi2 = res["chi2"]
+
+    # graus de liberdade de uma χ² com a média e a variância observadas
+    moment_dof = 2 * chi2.mean() ** 2 / chi2.var()
+
+    assert res["dof"][0] < res["n_pix"][0] / 3
+    assert 0.75 < moment_dof / res["dof"][0] < 1.25
+    np.testing.assert_allclose(np.median(res["coef"][:, 1]), 0.5, atol=0.02)
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from functions.units import convert_flux, convert_wave
+
+
+def test_flux_round_trip():
+    wave = np.linspace(0.6, 5.3, 50)
+    flux = np.linspace(0.1, 10, 50)
+    err = 0.1 * flux
+
+    flam, flam_err = convert_flux(flux, wave, "uJy", "flambda", err=err)
+    back, back_err = convert_flux(flam, wave, "flambda", "uJy", err=flam_err)
+
+    np.testing.assert_allclose(back, flux, rtol=1e-12)
+    np.testing.assert_allclose(back_err, err, rtol=1e-12)
+
+
+def test_ab_magnitude_of_one_microjansky():
+    mag, _ = convert_flux(np.array([1.0]), np.array([2.0]), "uJy", "ABmag")
+    assert mag[0] == pytest.approx(23.9, abs=1e-9)
+
+
+def test_flambda_at_one_micron():
+    # 1 μJy a 1 μm = 2.998e-20 erg/s/cm²/Å
+    flam, _ = convert_flux(np.array([1.0]), np.array([1.0]), "uJy", "flambda")
+    assert flam[0] == pytest.approx(2.998e-20, rel=1e-3)
+
+
+def test_wave_conversion():
+    np.testing.assert_allclose(convert_wave(np.array([1.0, 2.0]), "um", "A"), [1e4, 2e4])
@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from functions import viewer
+
+
+def test_loader_kwargs_with_lists_are_cached(sample):
+    folder, spec_info = sample
+    fname, z = spec_info[0]
+    path = os.path.join(folder, fname)
+
+    loader_kwargs = dict(
+        viewer.DEFAULT_LOADER_KWARGS,
+        columns=["wave", "flux", "err"],
+        norm_window=np.array([0.3446, 0.3646]),
+    )
+
+    spec = viewer.get_spectrum(path, z, loader_kwargs)
+    assert viewer.get_spectrum(path, z, loader_kwargs) is spec
+
+    table = pd.DataFrame({
+        "file": [f for f, _ in spec_info],
+        "z": [z for _, z in spec_info],
+        "group": "A",
+    })
+    mean_spec = viewer.group_mean_spectrum(
+        table, "A", base_path=folder, loader_kwargs=loader_kwargs
+    )
+    assert mean_spec is not None
+    assert viewer.group_mean_spectrum(
+        table, "A", base_path=folder, loader_kwargs=loader_kwargs
+    ) is mean_spec